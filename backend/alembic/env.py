@@ -10,6 +10,7 @@ from shared.infrastructure.database import Base
 import auth.infrastructure.models  # noqa: F401
 import collaboration.infrastructure.models  # noqa: F401
 import documents.infrastructure.models  # noqa: F401
+from collaboration.infrastructure.models import UPDATE_PARTITIONS
 
 config = context.config
 if config.config_file_name is not None:
@@ -17,16 +18,31 @@ if config.config_file_name is not None:
 
 target_metadata = Base.metadata
 
+# Hash partitions of document_updates are created by DDL, not declared as models;
+# without this autogenerate would emit a DROP for each of them
+_PARTITIONS = {f"document_updates_p{remainder}" for remainder in range(UPDATE_PARTITIONS)}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (type_ == "table" and reflected and compare_to is None and name in _PARTITIONS)
+
 
 def run_migrations_offline() -> None:
     url = settings.DATABASE_URL
-    context.configure(url=url, target_metadata=target_metadata, literal_binds=True)
+    context.configure(
+        url=url,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        include_object=include_object,
+    )
     with context.begin_transaction():
         context.run_migrations()
 
 
 def do_run_migrations(connection):
-    context.configure(connection=connection, target_metadata=target_metadata)
+    context.configure(
+        connection=connection, target_metadata=target_metadata, include_object=include_object
+    )
     with context.begin_transaction():
         context.run_migrations()
 
@@ -0,0 +1,70 @@
+"""add document update seq counters and unique update_seq
+
+Revision ID: 289b585e3b20
+Revises: 83c9da859503
+Create Date: 2026-10-17 10:12:40.518233
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '289b585e3b20'
+down_revision: Union[str, None] = '83c9da859503'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('document_update_seqs',
+    sa.Column('document_id', sa.Uuid(), nullable=False),
+    sa.Column('last_seq', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['document_id'], ['documents.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('document_id')
+    )
+
+    # Racing writers could previously be handed the same seq. Move every duplicate
+    # past the document's current max; replaying an already-applied Yjs update is a
+    # no-op, so the renumbered rows are safe to apply again after the snapshot.
+    op.execute("""
+        WITH dups AS (
+            SELECT id, document_id,
+                   ROW_NUMBER() OVER (PARTITION BY document_id, update_seq ORDER BY id) AS dup_rank
+            FROM document_updates
+        ),
+        moved AS (
+            SELECT id, document_id,
+                   ROW_NUMBER() OVER (PARTITION BY document_id ORDER BY id) AS offset_seq
+            FROM dups
+            WHERE dup_rank > 1
+        ),
+        maxes AS (
+            SELECT document_id, MAX(update_seq) AS max_seq
+            FROM document_updates
+            GROUP BY document_id
+        )
+        UPDATE document_updates u
+        SET update_seq = maxes.max_seq + moved.offset_seq
+        FROM moved JOIN maxes ON maxes.document_id = moved.document_id
+        WHERE u.id = moved.id
+    """)
+
+    op.execute("""
+        INSERT INTO document_update_seqs (document_id, last_seq)
+        SELECT document_id, MAX(max_seq) FROM (
+            SELECT document_id, MAX(update_seq) AS max_seq FROM document_updates GROUP BY document_id
+            UNION ALL
+            SELECT document_id, MAX(update_seq) AS max_seq FROM document_snapshots GROUP BY document_id
+        ) seqs
+        GROUP BY document_id
+    """)
+
+    op.create_unique_constraint(
+        'uq_document_updates_document_seq', 'document_updates', ['document_id', 'update_seq']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_document_updates_document_seq', 'document_updates', type_='unique')
+    op.drop_table('document_update_seqs')
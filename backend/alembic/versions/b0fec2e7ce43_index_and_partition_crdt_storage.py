@@ -0,0 +1,99 @@
+"""index document_snapshots and hash-partition document_updates
+
+Revision ID: b0fec2e7ce43
+Revises: 289b585e3b20
+Create Date: 2026-10-17 11:03:52.907114
+
+The snapshot index is built CONCURRENTLY so readers and writers are never
+blocked. document_updates can't be partitioned in place, so it is rebuilt as a
+hash-partitioned copy and swapped in. While rows are copied the old table is
+held in EXCLUSIVE mode: sockets can still load documents, and inbound updates
+wait in the write-behind buffer until the swap commits. The table only holds
+the tail since each document's last snapshot, so the copy is short.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+revision: str = 'b0fec2e7ce43'
+down_revision: Union[str, None] = '289b585e3b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UPDATE_PARTITIONS = 16
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_document_snapshots_document_seq "
+            "ON document_snapshots (document_id, update_seq)"
+        )
+
+    op.execute("""
+        CREATE TABLE document_updates_partitioned (
+            id INTEGER NOT NULL DEFAULT nextval('document_updates_id_seq'),
+            document_id UUID NOT NULL,
+            update_data BYTEA NOT NULL,
+            update_seq INTEGER NOT NULL,
+            user_id UUID NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now()
+        ) PARTITION BY HASH (document_id)
+    """)
+    for remainder in range(UPDATE_PARTITIONS):
+        op.execute(
+            f"CREATE TABLE document_updates_p{remainder} PARTITION OF document_updates_partitioned "
+            f"FOR VALUES WITH (MODULUS {UPDATE_PARTITIONS}, REMAINDER {remainder})"
+        )
+
+    op.execute("LOCK TABLE document_updates IN EXCLUSIVE MODE")
+    op.execute("INSERT INTO document_updates_partitioned SELECT * FROM document_updates")
+    op.execute("ALTER SEQUENCE document_updates_id_seq OWNED BY document_updates_partitioned.id")
+    op.execute("DROP TABLE document_updates")
+    op.execute("ALTER TABLE document_updates_partitioned RENAME TO document_updates")
+
+    op.create_primary_key('document_updates_pkey', 'document_updates', ['id', 'document_id'])
+    op.create_unique_constraint(
+        'uq_document_updates_document_seq', 'document_updates', ['document_id', 'update_seq']
+    )
+    op.create_foreign_key(
+        'document_updates_document_id_fkey', 'document_updates', 'documents',
+        ['document_id'], ['id'], ondelete='CASCADE',
+    )
+    op.create_foreign_key(
+        'document_updates_user_id_fkey', 'document_updates', 'users', ['user_id'], ['id'],
+    )
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE TABLE document_updates_plain (
+            id INTEGER NOT NULL DEFAULT nextval('document_updates_id_seq'),
+            document_id UUID NOT NULL,
+            update_data BYTEA NOT NULL,
+            update_seq INTEGER NOT NULL,
+            user_id UUID NOT NULL,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now()
+        )
+    """)
+    op.execute("LOCK TABLE document_updates IN EXCLUSIVE MODE")
+    op.execute("INSERT INTO document_updates_plain SELECT * FROM document_updates")
+    op.execute("ALTER SEQUENCE document_updates_id_seq OWNED BY document_updates_plain.id")
+    op.execute("DROP TABLE document_updates")
+    op.execute("ALTER TABLE document_updates_plain RENAME TO document_updates")
+
+    op.create_primary_key('document_updates_pkey', 'document_updates', ['id'])
+    op.create_unique_constraint(
+        'uq_document_updates_document_seq', 'document_updates', ['document_id', 'update_seq']
+    )
+    op.create_foreign_key(
+        'document_updates_document_id_fkey', 'document_updates', 'documents',
+        ['document_id'], ['id'], ondelete='CASCADE',
+    )
+    op.create_foreign_key(
+        'document_updates_user_id_fkey', 'document_updates', 'users', ['user_id'], ['id'],
+    )
+
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_document_snapshots_document_seq")
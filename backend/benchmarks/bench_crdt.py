@@ -0,0 +1,145 @@
+"""CRDT microbenchmarks — yjs_adapter and load_document_state by document size and update tail.
+
+Documents are generated Text docs from 1 KB to 50 MB, built from random inserts
+and deletes (so they carry tombstones); tails are 0 to 10,000 single-word edits
+on top. Generated data is deterministic and cached per process.
+
+    apply_update               a whole document into a fresh doc
+    encode_state_as_update     a loaded document back to one update
+    merge_updates              a document plus its tail, without a doc (as compaction does)
+    load_document_state        snapshot plus tail replay, from MemoryCrdtStorageRepository
+                               so only the CRDT work is timed
+
+Runs under pytest-benchmark, which stores runs and compares them (from backend/):
+    python -m pytest benchmarks/bench_crdt.py --benchmark-save=baseline
+    python -m pytest benchmarks/bench_crdt.py --benchmark-compare --benchmark-compare-fail=median:15%
+    BENCH_MAX_DOC_BYTES=1048576 BENCH_MAX_TAIL=1000 python -m pytest benchmarks/bench_crdt.py  # quick pass
+    python -m pytest benchmarks/bench_crdt.py -k load_document_state --benchmark-columns=median,iqr
+
+Runs are saved under backend/.benchmarks/, per machine; compare only runs from the
+same machine. --benchmark-compare-fail exits non-zero on a regression past the
+threshold.
+"""
+
+import asyncio
+import os
+import random
+from functools import cache
+from uuid import uuid4
+
+import pytest
+
+from collaboration.application.services import load_document_state
+from collaboration.domain.entities import CrdtSnapshot, CrdtUpdate
+from collaboration.infrastructure.memory_storage_repository import MemoryCrdtStorageRepository
+from collaboration.infrastructure.yjs_adapter import (
+    apply_update,
+    create_doc,
+    encode_state_as_update,
+    encode_state_vector_from_update,
+    get_text,
+    merge_updates,
+)
+
+KB, MB = 1024, 1024 * 1024
+SIZES = [
+    size for size in (1 * KB, 64 * KB, 1 * MB, 10 * MB, 50 * MB)
+    if size <= int(os.environ.get("BENCH_MAX_DOC_BYTES", 50 * MB))
+]
+TAILS = [
+    tail for tail in (0, 100, 1_000, 10_000) if tail <= int(os.environ.get("BENCH_MAX_TAIL", 10_000))
+]
+MAX_INSERTS = 5_000  # a generated document's item count is capped near this
+WORDS = "the quick brown fox jumps over the lazy dog".split()
+
+
+def _size_id(size: int) -> str:
+    return f"{size // MB}MB" if size >= MB else f"{size // KB}KB"
+
+
+def _rounds(size: int) -> int:
+    return max(3, min(100, 2 * MB // size))
+
+
+def _words(rng: random.Random, length: int) -> str:
+    return (" ".join(rng.choices(WORDS, k=length // 4 + 1)) + " ")[:length]
+
+
+@cache
+def _document(size: int) -> bytes:
+    """A Text doc of about ``size`` characters, as one update."""
+    rng = random.Random(size)
+    doc = create_doc()
+    text = doc["content"]
+    chunk = max(size // MAX_INSERTS, 16)
+    while len(text) < size:
+        text.insert(rng.randint(0, len(text)), _words(rng, chunk))
+        if rng.random() < 0.1 and len(text) > chunk:
+            start = rng.randint(0, len(text) - chunk // 2)
+            del text[start:start + chunk // 2]
+    return encode_state_as_update(doc)
+
+
+@cache
+def _tail(size: int) -> tuple[bytes, ...]:
+    """The longest tail for a document; shorter tails are its prefixes."""
+    rng = random.Random(-size)
+    doc = create_doc()
+    apply_update(doc, _document(size))
+    text = doc["content"]
+    updates = []
+    for _ in range(max(TAILS)):
+        before = doc.get_state()
+        text.insert(rng.randint(0, len(text)), rng.choice(WORDS) + " ")
+        updates.append(doc.get_update(before))
+    return tuple(updates)
+
+
+@pytest.fixture(scope="module")
+def runner():
+    with asyncio.Runner() as runner:
+        yield runner
+
+
+@pytest.mark.parametrize("size", SIZES, ids=_size_id)
+def test_apply_update(benchmark, size):
+    update = _document(size)
+    benchmark.pedantic(
+        apply_update, setup=lambda: ((create_doc(), update), {}), rounds=_rounds(size)
+    )
+
+
+@pytest.mark.parametrize("size", SIZES, ids=_size_id)
+def test_encode_state_as_update(benchmark, size):
+    doc = create_doc()
+    apply_update(doc, _document(size))
+    benchmark.pedantic(encode_state_as_update, args=(doc,), rounds=_rounds(size), warmup_rounds=1)
+
+
+@pytest.mark.parametrize("tail", TAILS[1:])
+@pytest.mark.parametrize("size", SIZES, ids=_size_id)
+def test_merge_updates(benchmark, size, tail):
+    updates = [_document(size), *_tail(size)[:tail]]
+    benchmark.pedantic(merge_updates, args=(updates,), rounds=_rounds(size), warmup_rounds=1)
+
+
+@pytest.mark.parametrize("tail", TAILS)
+@pytest.mark.parametrize("size", SIZES, ids=_size_id)
+def test_load_document_state(benchmark, runner, size, tail):
+    repo = MemoryCrdtStorageRepository()
+    document_id, user_id = uuid4(), uuid4()
+    snapshot = _document(size)
+    runner.run(repo.save_snapshot(
+        CrdtSnapshot(document_id, snapshot, encode_state_vector_from_update(snapshot), update_seq=0)
+    ))
+    runner.run(repo.save_updates([
+        CrdtUpdate(document_id, update, update_seq=seq, user_id=user_id)
+        for seq, update in enumerate(_tail(size)[:tail], start=1)
+    ]))
+
+    doc = benchmark.pedantic(
+        lambda: runner.run(load_document_state(repo, document_id)),
+        rounds=_rounds(size),
+        warmup_rounds=1,
+    )
+    assert len(get_text(doc)) >= size
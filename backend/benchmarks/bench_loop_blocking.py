@@ -0,0 +1,123 @@
+"""Event-loop blocking benchmark — how long CRDT work stalls the loop, by execution policy.
+
+Runs each workload against one large live document under each policy and prints
+the loop-lag histogram from LoopMonitor:
+    editing  a typing stream of small updates with a few large pastes,
+    joining  new clients joining, each needing a full SyncStep2 diff,
+    merging  merges of large detached blobs, as compaction and catch-up do.
+
+Policies: everything inline; large work on threads; and threads plus a
+process pool for merges.
+
+Usage (from backend/):
+    PYTHONPATH=src python benchmarks/bench_loop_blocking.py
+    PYTHONPATH=src python benchmarks/bench_loop_blocking.py --seconds 10 --doc-words 1000000
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+from uuid import uuid4
+
+from collaboration.application.doc_registry import DocRegistry
+from collaboration.infrastructure.crdt_executor import CrdtExecutor
+from collaboration.infrastructure.sync_protocol import sync_step2
+from collaboration.infrastructure.yjs_adapter import create_doc, encode_state_as_update
+from shared.infrastructure.loop_monitor import LAG_BUCKETS, LoopMonitor
+
+EMPTY_STATE_VECTOR = b"\x00"
+WORDS = "the quick brown fox jumps over the lazy dog".split()
+
+
+def _document(words: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    doc = create_doc()
+    text = doc["content"]
+    for _ in range(words // 50):
+        text.insert(rng.randint(0, len(text)), " ".join(rng.choice(WORDS) for _ in range(50)) + " ")
+    return encode_state_as_update(doc)
+
+
+def _edit(word: str) -> bytes:
+    doc = create_doc()
+    doc["content"] += word
+    return encode_state_as_update(doc)
+
+
+async def _run(
+    executor: CrdtExecutor, workload: str, base: bytes, pastes: list[bytes], seconds: float
+) -> LoopMonitor:
+    registry = DocRegistry(max_bytes=sys.maxsize, max_docs=10, executor=executor)
+    document_id = uuid4()
+
+    async def load(_):
+        doc = create_doc()
+        doc.apply_update(base)
+        return doc, 0
+
+    live = await registry.acquire(document_id, load)
+    await executor.merge([base, *pastes])  # start the workers outside the measurement
+    monitor = LoopMonitor(interval=0.002, warn_after=float("inf"))
+    monitor.start()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + seconds
+
+    async def editing():
+        # A typing stream, with the pastes spread over it
+        pending = list(pastes)
+        step = seconds / (len(pastes) + 1)
+        next_paste = loop.time() + step
+        while loop.time() < deadline:
+            if pending and loop.time() >= next_paste:
+                await registry.apply_update(document_id, pending.pop())
+                next_paste += step
+            await registry.apply_update(document_id, _edit(random.choice(WORDS)))
+            await asyncio.sleep(0.005)
+
+    async def joining():
+        while loop.time() < deadline:
+            async with live.lock:
+                await executor.run(live.size, sync_step2, live.doc, EMPTY_STATE_VECTOR)
+            await asyncio.sleep(0.05)
+
+    async def merging():
+        while loop.time() < deadline:
+            await executor.merge([base, *pastes])
+            await asyncio.sleep(0.05)
+
+    await {"editing": editing, "joining": joining, "merging": merging}[workload]()
+    await monitor.stop()
+    return monitor
+
+
+async def main(seconds: float, doc_words: int, threshold: int) -> None:
+    base = _document(doc_words, seed=1)
+    pastes = [_document(doc_words // 10, seed=n) for n in range(2, 6)]
+    print(f"document {len(base) / 1024:.0f} KiB, pastes {len(pastes[0]) / 1024:.0f} KiB, "
+          f"{seconds:.0f}s per run; loop lag histogram in ms")
+    bounds = "".join(f"{'<=' + format(b * 1000, 'g'):>8}" for b in LAG_BUCKETS) + f"{'>':>8}"
+
+    policies = {
+        "inline": lambda: CrdtExecutor(inline_max_bytes=sys.maxsize, threads=1),
+        "threads": lambda: CrdtExecutor(inline_max_bytes=threshold, threads=2),
+        "threads+processes": lambda: CrdtExecutor(inline_max_bytes=threshold, threads=2, processes=2),
+    }
+    for workload in ("editing", "joining", "merging"):
+        print(f"\n{workload:<20}{bounds}{'max':>10}{'total':>10}")
+        for name, make in policies.items():
+            executor = make()
+            histogram = (await _run(executor, workload, base, pastes, seconds)).histogram
+            executor.shutdown()
+            cells = "".join(f"{count:>8}" for count in histogram.counts)
+            print(f"{name:<20}{cells}{histogram.max_seconds * 1000:>10.1f}"
+                  f"{histogram.total_seconds * 1000:>10.0f}", flush=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--doc-words", type=int, default=300_000)
+    parser.add_argument("--threshold", type=int, default=64 * 1024)
+    args = parser.parse_args()
+    asyncio.run(main(args.seconds, args.doc_words, args.threshold))
@@ -0,0 +1,122 @@
+"""Replay benchmark — loading a document's pending updates, all at once vs streamed in chunks.
+
+Writes a tail of small edits for one document, then loads it both ways and reports
+time and peak Python memory (tracemalloc):
+
+    all at once  get_updates_since (ORM rows -> dataclasses), then one apply per update
+    streamed     load_document: raw columns over a server-side cursor, each chunk
+                 merged into one update before it is applied
+
+Usage (from backend/, against a scratch database that will be wiped):
+    PYTHONPATH=src python benchmarks/bench_replay.py
+    PYTHONPATH=src python benchmarks/bench_replay.py --updates 2000,20000 --database-url URL
+"""
+
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import auth.infrastructure.models  # noqa: F401
+import collaboration.infrastructure.models  # noqa: F401
+import documents.infrastructure.models  # noqa: F401
+from collaboration.application.services import load_document
+from collaboration.domain.entities import CrdtUpdate
+from collaboration.infrastructure.crdt_storage_repository import DbCrdtStorageRepository
+from collaboration.infrastructure.yjs_adapter import apply_update, create_doc, get_text
+from shared.config import settings
+from shared.infrastructure.database import Base
+
+DEFAULT_UPDATES = "1000,10000,50000"
+WORDS = "the quick brown fox jumps over the lazy dog".split()
+
+
+def _edits(count: int) -> list[bytes]:
+    rng = random.Random(count)
+    doc = create_doc()
+    text_ = doc["content"]
+    updates = []
+    for _ in range(count):
+        before = doc.get_state()
+        text_.insert(rng.randint(0, len(text_)), rng.choice(WORDS) + " ")
+        updates.append(doc.get_update(before))
+    return updates
+
+
+async def _all_at_once(repo: DbCrdtStorageRepository, document_id: uuid.UUID) -> str:
+    doc = create_doc()
+    for update in await repo.get_updates_since(document_id, 0):
+        apply_update(doc, update.update_data)
+    return get_text(doc)
+
+
+async def _streamed(repo: DbCrdtStorageRepository, document_id: uuid.UUID) -> str:
+    doc, _ = await load_document(repo, document_id)
+    return get_text(doc)
+
+
+async def _measure(session_factory, load, document_id: uuid.UUID) -> tuple[float, float, str]:
+    async with session_factory() as session:
+        repo = DbCrdtStorageRepository(session)
+        tracemalloc.start()
+        started = time.perf_counter()
+        result = await load(repo, document_id)
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return elapsed * 1000, peak / 1024 / 1024, result
+
+
+async def main(database_url: str, counts: list[int]) -> None:
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    owner_id = uuid.uuid4()
+    async with session_factory() as session:
+        await session.execute(
+            text("""
+                INSERT INTO users (id, username, email, first_name, last_name, password_hash)
+                VALUES (:id, 'bench', 'bench@example.com', 'Bench', 'User', 'x')
+            """),
+            {"id": owner_id},
+        )
+        await session.commit()
+
+    print(f"{'updates':>8}  {'all at once ms':>15}  {'peak MiB':>9}  {'streamed ms':>12}  {'peak MiB':>9}")
+    for count in counts:
+        document_id = uuid.uuid4()
+        async with session_factory() as session:
+            await session.execute(
+                text("INSERT INTO documents (id, title, owner_id) VALUES (:id, 'bench', :owner)"),
+                {"id": document_id, "owner": owner_id},
+            )
+            await DbCrdtStorageRepository(session).save_updates([
+                CrdtUpdate(document_id, update, update_seq=seq, user_id=owner_id)
+                for seq, update in enumerate(_edits(count), start=1)
+            ])
+
+        eager_ms, eager_peak, eager_text = await _measure(session_factory, _all_at_once, document_id)
+        stream_ms, stream_peak, stream_text = await _measure(session_factory, _streamed, document_id)
+        assert eager_text == stream_text
+        print(
+            f"{count:>8}  {eager_ms:>15.1f}  {eager_peak:>9.2f}  {stream_ms:>12.1f}  {stream_peak:>9.2f}",
+            flush=True,
+        )
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=settings.DATABASE_URL.replace("/cms", "/cms_bench"))
+    parser.add_argument("--updates", default=DEFAULT_UPDATES)
+    args = parser.parse_args()
+    asyncio.run(main(args.database_url, [int(s) for s in args.updates.split(",")]))
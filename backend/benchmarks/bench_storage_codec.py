@@ -0,0 +1,90 @@
+"""Storage codec benchmark — compression ratio and CPU cost of the CRDT blob codec.
+
+Builds long-form documents by simulated editing (typing at random positions, some
+deletions, occasional pasted paragraphs), then measures for snapshots and for the
+individual updates: stored size relative to raw Yjs bytes, and encode/decode time.
+Updates are measured with and without a dictionary trained on other updates.
+
+Usage (from backend/):
+    PYTHONPATH=src python benchmarks/bench_storage_codec.py
+    PYTHONPATH=src python benchmarks/bench_storage_codec.py --edits 20000 --level 6
+"""
+
+import argparse
+import random
+import time
+
+from collaboration.infrastructure.storage_codec import StorageCodec, train_dictionary
+from collaboration.infrastructure.yjs_adapter import create_doc, encode_state_as_update
+
+WORDS = (
+    "the editor reviewed each chapter before publication and the author revised "
+    "several paragraphs about distributed systems consistency latency and storage"
+).split()
+DICTIONARY_SIZE = 16 * 1024
+
+
+def _simulate(edits: int, seed: int) -> tuple[list[bytes], list[bytes]]:
+    """Return (updates, snapshots taken every edits/5 updates) of one edited document."""
+    rng = random.Random(seed)
+    doc = create_doc()
+    updates, snapshots = [], []
+    for n in range(1, edits + 1):
+        before = doc.get_state()
+        text = doc["content"]
+        with doc.transaction():
+            roll = rng.random()
+            if roll < 0.1 and len(text) > 20:
+                start = rng.randrange(len(text) - 10)
+                del text[start : start + rng.randint(1, 10)]
+            elif roll < 0.12:
+                paragraph = " ".join(rng.choice(WORDS) for _ in range(120)) + "\n"
+                text.insert(rng.randint(0, len(text)), paragraph)
+            else:
+                text.insert(rng.randint(0, len(text)), rng.choice(WORDS) + " ")
+        updates.append(doc.get_update(before))
+        if n % max(1, edits // 5) == 0:
+            snapshots.append(encode_state_as_update(doc))
+    return updates, snapshots
+
+
+def _measure(codec: StorageCodec, blobs: list[bytes]) -> tuple[float, float, float]:
+    """Return (stored/raw ratio, encode MB/s, decode MB/s)."""
+    started = time.perf_counter()
+    encoded = [codec.encode(b) for b in blobs]
+    encode_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    for blob in encoded:
+        codec.decode(blob)
+    decode_seconds = time.perf_counter() - started
+
+    raw = sum(map(len, blobs))
+    stored = sum(map(len, encoded))
+    mb = raw / 1_000_000
+    return stored / raw, mb / encode_seconds, mb / decode_seconds
+
+
+def main(edits: int, level: int) -> None:
+    training, _ = _simulate(edits, seed=1)
+    updates, snapshots = _simulate(edits, seed=2)
+    plain = StorageCodec(level=level)
+    with_dict = StorageCodec(level=level, dictionaries=[train_dictionary(training, DICTIONARY_SIZE)])
+
+    print(f"{edits} edits, level {level}; snapshots up to {len(snapshots[-1]) / 1024:.0f} KiB, "
+          f"updates avg {sum(map(len, updates)) / len(updates):.0f} B")
+    print(f"{'':<22}{'stored/raw':>12}{'encode MB/s':>14}{'decode MB/s':>14}")
+    for name, codec, blobs in [
+        ("snapshots", plain, snapshots),
+        ("updates", plain, updates),
+        ("updates + dictionary", with_dict, updates),
+    ]:
+        ratio, encode_rate, decode_rate = _measure(codec, blobs)
+        print(f"{name:<22}{ratio:>12.3f}{encode_rate:>14.1f}{decode_rate:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--edits", type=int, default=5000)
+    parser.add_argument("--level", type=int, default=3)
+    args = parser.parse_args()
+    main(args.edits, args.level)
@@ -0,0 +1,139 @@
+"""Storage query latency benchmark — checks the CRDT storage queries stay flat as tables grow.
+
+Fills document_updates / document_snapshots with background rows spread over many
+documents, then times the repository queries for one document at each table size.
+
+Usage (from backend/, against a scratch database that will be wiped):
+    PYTHONPATH=src python benchmarks/bench_storage_queries.py
+    PYTHONPATH=src python benchmarks/bench_storage_queries.py --sizes 1000,100000 --database-url URL
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+import auth.infrastructure.models  # noqa: F401
+import collaboration.infrastructure.models  # noqa: F401
+import documents.infrastructure.models  # noqa: F401
+from collaboration.domain.entities import CrdtSnapshot, CrdtUpdate
+from collaboration.infrastructure.crdt_storage_repository import DbCrdtStorageRepository
+from shared.config import settings
+from shared.infrastructure.database import Base
+
+DEFAULT_SIZES = "1000,10000,100000,1000000,10000000"
+BACKGROUND_DOCUMENTS = 1000
+TARGET_PENDING_UPDATES = 50
+ITERATIONS = 200
+
+
+async def _fill_background(session: AsyncSession, owner_id: uuid.UUID, current: int, target: int) -> None:
+    """Append background update rows until the table holds `target` rows in total."""
+    missing = target - current
+    if missing <= 0:
+        return
+    await session.execute(
+        text("""
+            INSERT INTO document_updates (document_id, update_data, update_seq, user_id)
+            SELECT d.id, decode(repeat('ab', 64), 'hex'), :start + g, :owner
+            FROM generate_series(1, :missing) AS g
+            JOIN LATERAL (
+                SELECT id FROM documents WHERE title = 'bench-bg-' || (g % :docs)
+            ) d ON true
+        """),
+        {"start": current, "missing": missing, "owner": owner_id, "docs": BACKGROUND_DOCUMENTS},
+    )
+    await session.execute(
+        text("""
+            INSERT INTO document_snapshots (document_id, snapshot, state_vector, update_seq)
+            SELECT id, decode(repeat('cd', 256), 'hex'), '\\x00', :seq FROM documents
+            WHERE title LIKE 'bench-bg-%'
+        """),
+        {"seq": current + missing},
+    )
+    await session.commit()
+    await session.execute(text("ANALYZE document_updates"))
+    await session.execute(text("ANALYZE document_snapshots"))
+
+
+async def _time(call, iterations: int) -> tuple[float, float]:
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await call()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+async def main(database_url: str, sizes: list[int]) -> None:
+    engine = create_async_engine(database_url)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with session_factory() as session:
+        owner_id = uuid.uuid4()
+        target_id = uuid.uuid4()
+        await session.execute(
+            text("""
+                INSERT INTO users (id, username, email, first_name, last_name, password_hash)
+                VALUES (:id, 'bench', 'bench@example.com', 'Bench', 'User', 'x')
+            """),
+            {"id": owner_id},
+        )
+        await session.execute(
+            text("""
+                INSERT INTO documents (title, owner_id)
+                SELECT 'bench-bg-' || g, :owner FROM generate_series(0, :docs - 1) AS g
+            """),
+            {"owner": owner_id, "docs": BACKGROUND_DOCUMENTS},
+        )
+        await session.execute(
+            text("INSERT INTO documents (id, title, owner_id) VALUES (:id, 'bench-target', :owner)"),
+            {"id": target_id, "owner": owner_id},
+        )
+        await session.commit()
+
+        repo = DbCrdtStorageRepository(session)
+        first = await repo.get_next_seq(target_id, TARGET_PENDING_UPDATES + 1)
+        await repo.save_snapshot(CrdtSnapshot(target_id, b"\x00" * 512, b"\x00", update_seq=first))
+        await repo.save_updates([
+            CrdtUpdate(target_id, b"\x00" * 64, update_seq=first + i + 1, user_id=owner_id)
+            for i in range(TARGET_PENDING_UPDATES)
+        ])
+
+        queries = {
+            "get_latest_snapshot": lambda: repo.get_latest_snapshot(target_id),
+            "get_updates_since": lambda: repo.get_updates_since(target_id, first),
+            "get_next_seq": lambda: repo.get_next_seq(target_id),
+            "delete_updates_before": lambda: repo.delete_updates_before(target_id, 0),
+        }
+
+        print(f"{'rows':>10}  " + "  ".join(f"{name:>24}" for name in queries))
+        print(f"{'':>10}  " + "  ".join(f"{'p50 / p99 ms':>24}" for _ in queries))
+        current = 0
+        for size in sizes:
+            await _fill_background(session, owner_id, current, size)
+            current = max(current, size)
+            cells = []
+            for call in queries.values():
+                p50, p99 = await _time(call, ITERATIONS)
+                cells.append(f"{p50:>11.3f} / {p99:>10.3f}")
+            await session.rollback()
+            print(f"{size:>10}  " + "  ".join(f"{cell:>24}" for cell in cells), flush=True)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=settings.DATABASE_URL.replace("/cms", "/cms_bench"))
+    parser.add_argument("--sizes", default=DEFAULT_SIZES)
+    args = parser.parse_args()
+    asyncio.run(main(args.database_url, [int(s) for s in args.sizes.split(",")]))
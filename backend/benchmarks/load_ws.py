@@ -0,0 +1,344 @@
+"""WebSocket load test — synthetic editors typing into /ws/doc/{document_id}.
+
+Every editor is an asyncio client with its own socket and Y.Doc, speaking
+y-protocols like a browser does: it syncs, then types words at --rate edits/s
+(Poisson arrivals). Each edit also stamps the editor's slot in a "probes"
+Y.Map with the wall clock, so every other editor on the document times the
+update's arrival: that is the propagation latency, across sockets and, when
+a document's editors are spread over several --url nodes, across nodes.
+Editors drop their socket and reconnect at --reconnect-rate per second;
+what arrives in the resync after a reconnect is not timed.
+
+Reported at the end: propagation latency percentiles, edits sent and seen,
+and per node, from its /metrics: CPU seconds, peak RSS, and database
+checkouts, persist batches and replication publishes per edit. With
+--redis-url, Redis commands per edit as well (INFO stats).
+
+Targets:
+    --url http://host:port   a running node; repeat for each node. Editors of a document
+                             are spread over the nodes round-robin.
+    --in-process             start the app in this process on a free port, with fakeredis
+                             standing in for Redis. Users and documents stay on Postgres
+                             (DATABASE_URL, or --database-url; tables are created if missing);
+                             CRDT updates go to --storage (postgres, sqlite or memory) and
+                             replicate over --transport (pubsub, streams or local).
+                             CPU and RSS then include the editors themselves.
+
+Usage (from backend/):
+    PYTHONPATH=src python benchmarks/load_ws.py --in-process --documents 10 --editors 5 --seconds 20
+    PYTHONPATH=src python benchmarks/load_ws.py --url http://10.0.0.5:8000 --url http://10.0.0.6:8000 \\
+        --documents 200 --editors 25 --rate 4 --reconnect-rate 0.02 --seconds 120
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import socket
+import time
+import uuid
+from dataclasses import dataclass, field
+
+import httpx
+import websockets
+from prometheus_client.parser import text_string_to_metric_families
+from pycrdt import Doc, Map, Text, YSyncMessageType
+
+from collaboration.infrastructure.sync_protocol import (
+    decode_message,
+    sync_step1,
+    sync_step2,
+    update_message,
+)
+
+WORDS = "the quick brown fox jumps over the lazy dog".split()
+# Scraped from each node's /metrics before and after the run
+COUNTERS = {
+    "db checkouts": "cms_db_pool_checkouts_total",
+    "persist batches": "cms_persist_seconds_count",
+    "publishes": "cms_publish_seconds_count",
+}
+
+
+@dataclass
+class Results:
+    sent: int = 0
+    seen: int = 0
+    reconnects: int = 0
+    failures: int = 0
+    latencies_ms: list[float] = field(default_factory=list)
+
+
+@dataclass
+class NodeUsage:
+    cpu_seconds: float = 0.0
+    peak_rss: float = 0.0
+    counters: dict[str, float] = field(default_factory=dict)
+
+
+class Editor:
+    """One synthetic collaborator on one document."""
+
+    def __init__(self, name: str, url: str, token: str, rate: float, reconnect_rate: float,
+                 results: Results):
+        self.name = name
+        self.url = url
+        self.token = token
+        self.rate = rate
+        self.reconnect_rate = reconnect_rate
+        self.results = results
+        self.doc = Doc()
+        self.text = self.doc.get("content", type=Text)
+        self.probes = self.doc.get("probes", type=Map)
+        self._subscription = self.probes.observe(self._on_probe)
+        self._timing = False
+
+    def _on_probe(self, event) -> None:
+        if not self._timing:
+            return
+        now = time.time_ns()
+        for key, change in event.keys.items():
+            if key != self.name and change["action"] in ("add", "update"):
+                self.results.seen += 1
+                self.results.latencies_ms.append((now - change["newValue"]) / 1e6)
+
+    async def run(self, deadline: float) -> None:
+        loop = asyncio.get_running_loop()
+        while loop.time() < deadline:
+            session = random.expovariate(self.reconnect_rate) if self.reconnect_rate else float("inf")
+            try:
+                await self._session(min(deadline, loop.time() + session))
+            except (OSError, websockets.WebSocketException):
+                self.results.failures += 1
+                await asyncio.sleep(0.5)
+            if loop.time() < deadline:
+                self.results.reconnects += 1
+
+    async def _session(self, until: float) -> None:
+        self._timing = False
+        async with websockets.connect(f"{self.url}?token={self.token}", max_size=None) as ws:
+            await ws.send(sync_step1(self.doc))
+            reader = asyncio.create_task(self._read(ws))
+            try:
+                await self._type(ws, until)
+            finally:
+                reader.cancel()
+                await asyncio.gather(reader, return_exceptions=True)
+
+    async def _read(self, ws) -> None:
+        async for data in ws:
+            message = decode_message(data)
+            if message is None or isinstance(message, list):
+                continue
+            if message.kind == YSyncMessageType.SYNC_STEP1:
+                await ws.send(sync_step2(self.doc, message.payload))
+                continue
+            self.doc.apply_update(message.payload)
+            if message.kind == YSyncMessageType.SYNC_STEP2:
+                self._timing = True  # caught up; whatever comes next is live
+
+    async def _type(self, ws, until: float) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            pause = random.expovariate(self.rate)
+            if loop.time() + pause >= until:
+                await asyncio.sleep(max(until - loop.time(), 0))
+                return
+            await asyncio.sleep(pause)
+            before = self.doc.get_state()
+            with self.doc.transaction():
+                self.text.insert(random.randint(0, len(self.text)), random.choice(WORDS) + " ")
+                self.probes[self.name] = time.time_ns()
+            await ws.send(update_message(self.doc.get_update(before)))
+            self.results.sent += 1
+
+
+async def _setup(base_url: str, documents: int) -> tuple[str, list[str]]:
+    """A throwaway user and its documents; returns (token, document ids)."""
+    tag = uuid.uuid4().hex[:12]
+    credentials = {"email": f"load-{tag}@example.com", "password": "load-test-password"}
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as http:
+        response = await http.post("/api/auth/register", json={
+            **credentials, "username": f"load-{tag}", "first_name": "Load", "last_name": "Test",
+        })
+        response.raise_for_status()
+        response = await http.post("/api/auth/login", json=credentials)
+        response.raise_for_status()
+        token = response.json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        ids = []
+        for n in range(documents):
+            response = await http.post("/api/documents/", json={"title": f"load {n}"}, headers=headers)
+            response.raise_for_status()
+            ids.append(response.json()["id"])
+    return token, ids
+
+
+async def _scrape(http: httpx.AsyncClient, base_url: str) -> dict[str, float]:
+    response = await http.get(f"{base_url}/metrics")
+    response.raise_for_status()
+    samples = {}
+    for family in text_string_to_metric_families(response.text):
+        for sample in family.samples:
+            if not sample.labels:
+                samples[sample.name] = sample.value
+            else:
+                samples[sample.name] = samples.get(sample.name, 0.0) + sample.value
+    return samples
+
+
+async def _watch(base_urls: list[str], usage: dict[str, NodeUsage], stop: asyncio.Event) -> None:
+    """Scrape every node once a second for peak RSS, and diff counters over the run."""
+    async with httpx.AsyncClient(timeout=10) as http:
+        first = {url: await _scrape(http, url) for url in base_urls}
+        last = first
+        while not stop.is_set():
+            last = {url: await _scrape(http, url) for url in base_urls}
+            for url in base_urls:
+                rss = last[url].get("process_resident_memory_bytes", 0.0)
+                usage[url].peak_rss = max(usage[url].peak_rss, rss)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=1)
+            except TimeoutError:
+                pass
+        last = {url: await _scrape(http, url) for url in base_urls}
+    for url in base_urls:
+        before, after = first[url], last[url]
+        usage[url].cpu_seconds = after.get("process_cpu_seconds_total", 0) - before.get(
+            "process_cpu_seconds_total", 0
+        )
+        usage[url].counters = {
+            label: after.get(name, 0) - before.get(name, 0) for label, name in COUNTERS.items()
+        }
+
+
+async def _redis_commands(redis_url: str | None) -> int | None:
+    if not redis_url:
+        return None
+    from redis.asyncio import Redis
+
+    redis = Redis.from_url(redis_url)
+    try:
+        return (await redis.info("stats"))["total_commands_processed"]
+    finally:
+        await redis.aclose()
+
+
+def _free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+async def _serve_in_process(database_url: str | None, storage: str, transport: str):
+    """Run the app on this loop with fakeredis for Redis; returns (base url, stop fn)."""
+    if database_url:
+        os.environ["DATABASE_URL"] = database_url
+    os.environ["CRDT_STORAGE"] = storage
+    os.environ["REPLICATION_TRANSPORT"] = transport
+    import uvicorn
+    from fakeredis import FakeAsyncRedis
+
+    import shared.infrastructure.redis as redis_module
+
+    fake = FakeAsyncRedis()
+    redis_module.get_redis_pool = lambda: fake  # before anything imports it by name
+
+    from main import app
+    from shared.infrastructure.database import Base, engine
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    async def stop():
+        server.should_exit = True
+        await task
+
+    return f"http://127.0.0.1:{port}", stop
+
+
+def _percentile(ordered: list[float], p: float) -> float:
+    return ordered[min(int(len(ordered) * p / 100), len(ordered) - 1)]
+
+
+async def main(args: argparse.Namespace) -> None:
+    stop_server = None
+    base_urls = args.url
+    if args.in_process:
+        base_url, stop_server = await _serve_in_process(
+            args.database_url, args.storage, args.transport
+        )
+        base_urls = [base_url]
+    if not base_urls:
+        raise SystemExit("Give --url for each node, or --in-process")
+
+    documents = args.documents * len(base_urls)
+    token, document_ids = await _setup(base_urls[0], documents)
+    results = Results()
+    editors = [
+        Editor(
+            name=str(n),
+            url=f"{base_urls[(d + n) % len(base_urls)].replace('http', 'ws', 1)}/ws/doc/{document_id}",
+            token=token,
+            rate=args.rate,
+            reconnect_rate=args.reconnect_rate,
+            results=results,
+        )
+        for d, document_id in enumerate(document_ids)
+        for n in range(args.editors)
+    ]
+    print(f"{len(base_urls)} node(s), {documents} documents x {args.editors} editors "
+          f"= {len(editors)} sockets, {args.rate:g} edits/s each, {args.seconds:g}s", flush=True)
+
+    usage = {url: NodeUsage() for url in base_urls}
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(_watch(base_urls, usage, stop))
+    redis_before = await _redis_commands(args.redis_url)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + args.seconds
+    await asyncio.gather(*(editor.run(deadline) for editor in editors))
+    await asyncio.sleep(args.drain)  # let the last edits arrive
+    stop.set()
+    await watcher
+    redis_after = await _redis_commands(args.redis_url)
+    if stop_server is not None:
+        await stop_server()
+
+    latencies = sorted(results.latencies_ms)
+    expected = results.sent * (args.editors - 1)
+    print(f"\nedits sent {results.sent}, seen by peers {results.seen} of {expected} "
+          f"({results.reconnects} reconnects, {results.failures} failed connects)")
+    if latencies:
+        print(f"propagation ms  p50 {_percentile(latencies, 50):.1f}  p90 {_percentile(latencies, 90):.1f}  "
+              f"p99 {_percentile(latencies, 99):.1f}  max {latencies[-1]:.1f}")
+    per_edit = max(results.sent, 1)
+    for url, node in usage.items():
+        counters = "  ".join(f"{label}/edit {value / per_edit:.3f}" for label, value in node.counters.items())
+        print(f"{url}  cpu {node.cpu_seconds:.1f}s  peak rss {node.peak_rss / 2**20:.0f} MiB  {counters}")
+    if redis_before is not None:
+        print(f"redis commands/edit {(redis_after - redis_before) / per_edit:.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", action="append", default=[], help="base URL of a node; repeat per node")
+    parser.add_argument("--in-process", action="store_true")
+    parser.add_argument("--database-url", help="with --in-process; defaults to DATABASE_URL")
+    parser.add_argument("--storage", default="postgres", choices=["postgres", "sqlite", "memory"],
+                        help="with --in-process; where CRDT updates are stored")
+    parser.add_argument("--transport", default="pubsub", choices=["pubsub", "streams", "local"],
+                        help="with --in-process; how updates replicate")
+    parser.add_argument("--redis-url", help="count Redis commands on this server")
+    parser.add_argument("--documents", type=int, default=10, help="documents per node")
+    parser.add_argument("--editors", type=int, default=5, help="editors per document")
+    parser.add_argument("--rate", type=float, default=2, help="edits per second per editor")
+    parser.add_argument("--reconnect-rate", type=float, default=0, help="reconnects per second per editor")
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--drain", type=float, default=1)
+    asyncio.run(main(parser.parse_args()))
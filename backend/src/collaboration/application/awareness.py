@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from uuid import UUID
+
+from collaboration.infrastructure.sync_protocol import AwarenessEntry
+
+logger = logging.getLogger(__name__)
+
+REMOVED = "null"
+
+DeliverAwarenessFn = Callable[[UUID, list[AwarenessEntry]], Awaitable[None]]
+
+
+@dataclass
+class AwarenessStats:
+    broadcasts: int = 0
+    entries_sent: int = 0
+    entries_coalesced: int = 0
+    expired: int = 0
+
+
+@dataclass
+class _Client:
+    clock: int
+    state: str
+    seen: float
+    # The local connection the client talks through; None for clients on other nodes
+    connection_id: int | None
+
+
+@dataclass
+class _Room:
+    clients: dict[int, _Client] = field(default_factory=dict)
+    pending: dict[int, AwarenessEntry] = field(default_factory=dict)
+    last_flush: float = float("-inf")
+    timer: asyncio.Task | None = None
+
+
+class AwarenessBroker:
+    """Holds cursor/presence state per document and rate-limits its broadcast.
+
+    Awareness is ephemeral: it lives here and on the bus, never in storage.
+    Updates from local clients are merged per client id and delivered at most
+    once per ``interval`` per document, so a client streaming cursor moves costs
+    one broadcast per interval however fast it types. Local clients silent for
+    ``timeout`` are broadcast as removed; clients on other nodes are just
+    forgotten, since their own node (or the browsers themselves) time them out.
+    """
+
+    def __init__(self, deliver: DeliverAwarenessFn, interval: float, timeout: float):
+        self.interval = interval
+        self.timeout = timeout
+        self.stats = AwarenessStats()
+        self._deliver = deliver
+        self._rooms: dict[UUID, _Room] = {}
+        self._sweeper: asyncio.Task | None = None
+
+    def states(self, document_id: UUID) -> list[AwarenessEntry]:
+        """Current presence on a document, for a client that just joined."""
+        room = self._rooms.get(document_id)
+        if room is None:
+            return []
+        return [
+            AwarenessEntry(client_id, client.clock, client.state)
+            for client_id, client in room.clients.items()
+            if client.state != REMOVED
+        ]
+
+    def update(
+        self, document_id: UUID, entries: list[AwarenessEntry], connection_id: int
+    ) -> None:
+        """Take an update from a local client; it goes out on the next flush."""
+        room = self._room(document_id)
+        for entry in entries:
+            if self._accept(room, entry, connection_id):
+                self._queue(room, entry)
+        self._schedule(document_id, room)
+
+    def apply_remote(self, document_id: UUID, entries: list[AwarenessEntry]) -> None:
+        """Record an update another node has already broadcast."""
+        room = self._room(document_id)
+        for entry in entries:
+            self._accept(room, entry, None)
+
+    def disconnect(self, document_id: UUID, connection_id: int) -> None:
+        """Broadcast the clients behind a closed connection as removed."""
+        room = self._rooms.get(document_id)
+        if room is None:
+            return
+        for client_id, client in list(room.clients.items()):
+            if client.connection_id == connection_id and client.state != REMOVED:
+                self._remove(room, client_id, client)
+        self._schedule(document_id, room)
+
+    async def stop(self) -> None:
+        tasks = [room.timer for room in self._rooms.values() if room.timer is not None]
+        if self._sweeper is not None:
+            tasks.append(self._sweeper)
+            self._sweeper = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _room(self, document_id: UUID) -> _Room:
+        room = self._rooms.get(document_id)
+        if room is None:
+            room = self._rooms[document_id] = _Room()
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+        return room
+
+    def _accept(self, room: _Room, entry: AwarenessEntry, connection_id: int | None) -> bool:
+        # Same ordering rule as y-protocols: a newer clock wins, and a removal
+        # also wins at an equal clock
+        current = room.clients.get(entry.client_id)
+        removed = entry.state == REMOVED
+        if current is None:
+            if removed:
+                return False
+        elif entry.clock < current.clock or (
+            entry.clock == current.clock and (not removed or current.state == REMOVED)
+        ):
+            return False
+        room.clients[entry.client_id] = _Client(
+            entry.clock, entry.state, time.monotonic(), connection_id
+        )
+        return True
+
+    def _remove(self, room: _Room, client_id: int, client: _Client) -> None:
+        client.clock += 1
+        client.state = REMOVED
+        client.seen = time.monotonic()
+        self._queue(room, AwarenessEntry(client_id, client.clock, REMOVED))
+
+    def _queue(self, room: _Room, entry: AwarenessEntry) -> None:
+        if entry.client_id in room.pending:
+            self.stats.entries_coalesced += 1
+        room.pending[entry.client_id] = entry
+
+    def _schedule(self, document_id: UUID, room: _Room) -> None:
+        if room.timer is not None or not room.pending:
+            return
+        delay = max(0.0, room.last_flush + self.interval - time.monotonic())
+        room.timer = asyncio.create_task(self._flush_later(document_id, room, delay))
+
+    async def _flush_later(self, document_id: UUID, room: _Room, delay: float) -> None:
+        await asyncio.sleep(delay)
+        entries = list(room.pending.values())
+        room.pending.clear()
+        room.last_flush = time.monotonic()
+        try:
+            await self._deliver(document_id, entries)
+            self.stats.broadcasts += 1
+            self.stats.entries_sent += len(entries)
+        except Exception:
+            logger.exception("Awareness broadcast failed for document %s", document_id)
+        finally:
+            room.timer = None
+        # Whatever arrived while we were delivering waits for the next interval
+        self._schedule(document_id, room)
+
+    async def _sweep_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.timeout / 10)
+            self._sweep()
+
+    def _sweep(self) -> None:
+        cutoff = time.monotonic() - self.timeout
+        for document_id, room in list(self._rooms.items()):
+            for client_id, client in list(room.clients.items()):
+                if client.seen > cutoff:
+                    continue
+                if client.state == REMOVED or client.connection_id is None:
+                    del room.clients[client_id]
+                else:
+                    self.stats.expired += 1
+                    self._remove(room, client_id, client)
+            self._schedule(document_id, room)
+            if not room.clients and room.timer is None:
+                del self._rooms[document_id]
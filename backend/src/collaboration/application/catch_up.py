@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from uuid import UUID
+
+from collaboration.application.doc_registry import DocRegistry
+from collaboration.domain.entities import CrdtSnapshot, CrdtUpdate
+from collaboration.infrastructure.crdt_executor import CrdtExecutor, default_executor
+
+logger = logging.getLogger(__name__)
+
+FetchMissingFn = Callable[[UUID, int], Awaitable[tuple[CrdtSnapshot | None, list[CrdtUpdate]]]]
+DeliverFn = Callable[[UUID, bytes], Awaitable[None]]
+
+
+@dataclass
+class CatchUpStats:
+    catch_ups: int = 0
+    updates_recovered: int = 0
+
+
+class GapFiller:
+    """Reads updates a live doc missed on the bus back from storage.
+
+    Updates from different nodes routinely arrive out of seq order, so a gap is
+    only acted on if it is still open after ``grace`` seconds. Recovered updates
+    are applied to the live doc and delivered to its local sockets as one merge.
+    The same read brings a stale doc, one that sat idle with no subscription,
+    back up to date before it is served again.
+    """
+
+    def __init__(
+        self,
+        registry: DocRegistry,
+        fetch_missing: FetchMissingFn,
+        deliver: DeliverFn,
+        grace: float,
+        executor: CrdtExecutor = default_executor,
+    ):
+        self.grace = grace
+        self._executor = executor
+        self.stats = CatchUpStats()
+        self._registry = registry
+        self._fetch_missing = fetch_missing
+        self._deliver = deliver
+        self._timers: dict[UUID, asyncio.Task] = {}
+
+    def check(self, document_id: UUID) -> None:
+        live = self._registry.get(document_id)
+        if live is None or not live.has_gap or document_id in self._timers:
+            return
+        self._timers[document_id] = asyncio.create_task(self._fill_later(document_id))
+
+    async def stop(self) -> None:
+        timers = list(self._timers.values())
+        for timer in timers:
+            timer.cancel()
+        await asyncio.gather(*timers, return_exceptions=True)
+
+    async def _fill_later(self, document_id: UUID) -> None:
+        try:
+            await asyncio.sleep(self.grace)
+            await self.fill(document_id)
+        except Exception:
+            logger.exception("Catch-up failed for document %s", document_id)
+        finally:
+            self._timers.pop(document_id, None)
+
+    async def fill(self, document_id: UUID) -> None:
+        live = self._registry.get(document_id)
+        if live is None or not live.has_gap:
+            return
+        await self._recover(document_id, live.seq)
+
+    async def refresh(self, document_id: UUID) -> None:
+        """Catch up a stale doc with whatever was persisted while nobody here had it open."""
+        live = self._registry.get(document_id)
+        if live is None or not live.stale:
+            return
+        # Cleared first so sockets joining meanwhile don't read the same updates again;
+        # they already get the recovered merge through deliver
+        live.stale = False
+        try:
+            await self._recover(document_id, live.seq)
+        except BaseException:
+            live.stale = True
+            raise
+
+    async def _recover(self, document_id: UUID, since_seq: int) -> None:
+        snapshot, updates = await self._fetch_missing(document_id, since_seq)
+
+        recovered = []
+        if snapshot is not None:
+            recovered.append(snapshot.snapshot)
+        recovered.extend(u.update_data for u in updates)
+        if not recovered:
+            return
+        merged = await self._executor.merge(recovered)
+
+        # The doc may have been evicted while we were reading
+        live = self._registry.get(document_id)
+        if live is None:
+            return
+        await self._registry.apply_update(document_id, merged)
+        if snapshot is not None:
+            live.mark_applied_through(snapshot.update_seq)
+        for update in updates:
+            live.mark_applied(update.update_seq, update.update_seq)
+
+        self.stats.catch_ups += 1
+        self.stats.updates_recovered += len(updates)
+        await self._deliver(document_id, merged)
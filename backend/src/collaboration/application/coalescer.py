@@ -0,0 +1,101 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import Any
+from uuid import UUID
+
+from collaboration.infrastructure.crdt_executor import CrdtExecutor, default_executor
+from shared.infrastructure.metrics import COALESCE_BATCH_SIZE, COALESCE_DELAY_SECONDS
+from shared.infrastructure.tracing import TraceContext
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CoalescerStats:
+    batches: int = 0
+    updates: int = 0
+    last_delay_seconds: float = 0.0
+    max_delay_seconds: float = 0.0  # longest an update was held back before going out
+
+    @property
+    def batching_ratio(self) -> float:
+        return self.updates / self.batches if self.batches else 0.0
+
+
+DeliverFn = Callable[..., Awaitable[None]]
+
+
+class UpdateCoalescer:
+    """Merges a document's outbound updates over a short window into one send.
+
+    With a ``window`` of zero every update is delivered as it comes, skipping
+    the socket it came from. Otherwise updates are held for up to ``window``
+    seconds, merged into a single Yjs update and delivered to every socket
+    including their senders, as y-websocket does; applying an update twice is
+    a no-op for a Yjs client. A merged update carries the trace of the first
+    sampled update in it.
+    """
+
+    def __init__(self, deliver: DeliverFn, window: float, executor: CrdtExecutor = default_executor):
+        self.window = window
+        self._executor = executor
+        self.stats = CoalescerStats()
+        self._deliver = deliver
+        self._pending: dict[UUID, tuple[float, list[bytes]]] = {}
+        self._timers: dict[UUID, asyncio.Task] = {}
+        self._traces: dict[UUID, TraceContext] = {}
+
+    async def add(
+        self, document_id: UUID, update: bytes, origin: Any = None, trace: TraceContext | None = None
+    ) -> None:
+        if self.window <= 0:
+            self.stats.batches += 1
+            self.stats.updates += 1
+            COALESCE_BATCH_SIZE.observe(1)
+            COALESCE_DELAY_SECONDS.observe(0)
+            await self._deliver(document_id, update, exclude=origin, trace=trace)
+            return
+        _, updates = self._pending.setdefault(document_id, (time.monotonic(), []))
+        updates.append(update)
+        if trace is not None:
+            self._traces.setdefault(document_id, trace)
+        if document_id not in self._timers:
+            self._timers[document_id] = asyncio.create_task(self._flush_later(document_id))
+
+    async def flush(self, document_id: UUID) -> None:
+        pending = self._pending.pop(document_id, None)
+        if pending is None:
+            return
+        started, updates = pending
+        trace = self._traces.pop(document_id, None)
+        merged = await self._executor.merge(updates)
+
+        delay = time.monotonic() - started
+        self.stats.batches += 1
+        self.stats.updates += len(updates)
+        self.stats.last_delay_seconds = delay
+        self.stats.max_delay_seconds = max(self.stats.max_delay_seconds, delay)
+        COALESCE_BATCH_SIZE.observe(len(updates))
+        COALESCE_DELAY_SECONDS.observe(delay)
+        await self._deliver(document_id, merged, trace=trace)
+
+    async def stop(self) -> None:
+        """Deliver whatever is still held back."""
+        timers = list(self._timers.values())
+        for timer in timers:
+            timer.cancel()
+        await asyncio.gather(*timers, return_exceptions=True)
+        self._timers.clear()
+        for document_id in list(self._pending):
+            await self.flush(document_id)
+
+    async def _flush_later(self, document_id: UUID) -> None:
+        try:
+            await asyncio.sleep(self.window)
+            del self._timers[document_id]
+            await self.flush(document_id)
+        except Exception:
+            logger.exception("Outbound flush failed for document %s", document_id)
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CompactionStats:
+    runs: int = 0
+    failures: int = 0
+    last_run_seconds: float = 0.0
+    max_run_seconds: float = 0.0
+
+
+CompactFn = Callable[[UUID], Awaitable[object]]
+
+
+class CompactionScheduler:
+    """Runs snapshot compaction in the background with bounded concurrency.
+
+    A document is queued at most once. Requests that arrive while its compaction
+    is running are folded into a single follow-up run, so a burst of boundary
+    crossings never produces more than one pending job per document.
+    """
+
+    def __init__(self, compact: CompactFn, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self.stats = CompactionStats()
+        self._compact = compact
+        self._queue: asyncio.Queue[UUID] = asyncio.Queue()
+        self._queued: set[UUID] = set()
+        self._running: set[UUID] = set()
+        self._rerun: set[UUID] = set()
+        self._workers: list[asyncio.Task] = []
+
+    @property
+    def backlog(self) -> int:
+        return len(self._queued) + len(self._rerun)
+
+    def request(self, document_id: UUID) -> None:
+        if document_id in self._queued:
+            return
+        if document_id in self._running:
+            self._rerun.add(document_id)
+            return
+        self._queued.add(document_id)
+        self._queue.put_nowait(document_id)
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._work()) for _ in range(self.max_concurrency)
+            ]
+
+    async def join(self) -> None:
+        """Wait until every queued compaction has run."""
+        await self._queue.join()
+
+    async def stop(self) -> None:
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _work(self) -> None:
+        while True:
+            document_id = await self._queue.get()
+            self._queued.discard(document_id)
+            self._running.add(document_id)
+            started = time.monotonic()
+            try:
+                await self._compact(document_id)
+            except Exception:
+                self.stats.failures += 1
+                logger.exception("Compaction failed for document %s", document_id)
+            finally:
+                elapsed = time.monotonic() - started
+                self.stats.runs += 1
+                self.stats.last_run_seconds = elapsed
+                self.stats.max_run_seconds = max(self.stats.max_run_seconds, elapsed)
+                self._running.discard(document_id)
+                if document_id in self._rerun:
+                    self._rerun.discard(document_id)
+                    self.request(document_id)
+                self._queue.task_done()
@@ -0,0 +1,153 @@
+import asyncio
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+from uuid import UUID
+
+from pycrdt import Doc
+
+from collaboration.infrastructure.crdt_executor import CrdtExecutor, default_executor
+from collaboration.infrastructure.yjs_adapter import apply_update, encode_state_as_update
+
+DocLoader = Callable[[UUID], Awaitable[tuple[Doc, int]]]  # (doc, last seq it covers)
+
+
+class _LoadAbandoned(Exception):
+    """The caller loading a document was cancelled; whoever waited on it loads it again."""
+
+
+@dataclass
+class LiveDoc:
+    document_id: UUID
+    doc: Doc
+    size: int  # approximate resident bytes: encoded state at load + updates applied since
+    seq: int = field(default=0)  # every update_seq up to this one has been applied
+    ahead: set[int] = field(default_factory=set)  # applied seqs past a gap
+    refs: int = field(default=0)
+    # Set when the last socket leaves: with no subscription, updates from other nodes
+    # stop arriving, so the doc must be caught up from storage before it is served again
+    stale: bool = field(default=False)
+    # Held while the doc is read or written, since that may happen on a worker thread
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    @property
+    def has_gap(self) -> bool:
+        return bool(self.ahead)
+
+    def mark_applied(self, first_seq: int, last_seq: int) -> None:
+        """Record that updates first_seq..last_seq are in the doc."""
+        if last_seq <= self.seq:
+            return
+        self.ahead.update(range(max(first_seq, self.seq + 1), last_seq + 1))
+        self._advance()
+
+    def mark_applied_through(self, seq: int) -> None:
+        """Record that everything up to seq is in the doc, e.g. after applying a snapshot."""
+        if seq <= self.seq:
+            return
+        self.seq = seq
+        self.ahead = {s for s in self.ahead if s > seq}
+        self._advance()
+
+    def _advance(self) -> None:
+        while self.seq + 1 in self.ahead:
+            self.seq += 1
+            self.ahead.remove(self.seq)
+
+
+class DocRegistry:
+    """Per-process cache of live Y.Docs shared by every socket on the same document.
+
+    Concurrent cold loads of one document are collapsed into a single loader call;
+    if the caller making it is cancelled, one of the others takes the load over.
+    Documents with no open sockets stay resident until the byte or count budget is
+    exceeded, then the least recently used idle ones are evicted. An idle doc is
+    marked stale; whoever acquires it again catches it up (GapFiller.refresh).
+    """
+
+    def __init__(self, max_bytes: int, max_docs: int, executor: CrdtExecutor = default_executor):
+        self.max_bytes = max_bytes
+        self.max_docs = max_docs
+        self._executor = executor
+        self._docs: OrderedDict[UUID, LiveDoc] = OrderedDict()
+        self._loading: dict[UUID, asyncio.Future[LiveDoc]] = {}
+        self._total_bytes = 0
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, document_id: UUID) -> bool:
+        return document_id in self._docs
+
+    def get(self, document_id: UUID) -> LiveDoc | None:
+        return self._docs.get(document_id)
+
+    async def acquire(self, document_id: UUID, loader: DocLoader) -> LiveDoc:
+        """Return the live doc, loading it at most once however many callers race."""
+        live = self._docs.get(document_id)
+        while live is None:
+            pending = self._loading.get(document_id)
+            if pending is None:
+                pending = asyncio.get_running_loop().create_future()
+                self._loading[document_id] = pending
+                try:
+                    doc, seq = await loader(document_id)
+                    size = len(await self._executor.offload(encode_state_as_update, doc))
+                except BaseException as exc:
+                    # Cancelling the future would cancel every waiter with it
+                    error = exc if isinstance(exc, Exception) else _LoadAbandoned()
+                    pending.set_exception(error)
+                    # Mark retrieved so an unobserved failure doesn't log a warning
+                    pending.exception()
+                    raise
+                finally:
+                    del self._loading[document_id]
+                live = LiveDoc(document_id, doc, size, seq=seq)
+                pending.set_result(live)
+            else:
+                try:
+                    live = await asyncio.shield(pending)
+                except _LoadAbandoned:
+                    live = self._docs.get(document_id)
+
+        if document_id not in self._docs:
+            self._docs[document_id] = live
+            self._total_bytes += live.size
+        self._docs.move_to_end(document_id)
+        live.refs += 1
+        self._evict()
+        return live
+
+    def release(self, document_id: UUID) -> None:
+        live = self._docs.get(document_id)
+        if live is None:
+            return
+        live.refs = max(live.refs - 1, 0)
+        if live.refs == 0:
+            live.stale = True
+        self._evict()
+
+    async def apply_update(self, document_id: UUID, update: bytes) -> bool:
+        """Apply an update to the resident doc. Returns False if it isn't loaded."""
+        live = self._docs.get(document_id)
+        if live is None:
+            return False
+        async with live.lock:
+            await self._executor.run(len(update), apply_update, live.doc, update)
+        live.size += len(update)
+        if self._docs.get(document_id) is live:  # not evicted while the update was applied
+            self._total_bytes += len(update)
+        return True
+
+    def _evict(self) -> None:
+        for document_id in list(self._docs):
+            if self._total_bytes <= self.max_bytes and len(self._docs) <= self.max_docs:
+                return
+            live = self._docs[document_id]
+            if live.refs == 0:
+                del self._docs[document_id]
+                self._total_bytes -= live.size
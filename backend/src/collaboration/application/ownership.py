@@ -0,0 +1,36 @@
+import bisect
+import hashlib
+from collections.abc import Iterable
+from uuid import UUID
+
+# Points per node; enough to keep each node's share of documents within a few percent
+RING_REPLICAS = 128
+
+
+def _point(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Consistent-hash ring mapping documents to the node that owns them.
+
+    Each node is placed at ``replicas`` points on the ring and a document
+    belongs to the first point at or after its own hash. A node joining or
+    leaving only moves the documents on its own arcs.
+    """
+
+    def __init__(self, nodes: Iterable[UUID] = (), replicas: int = RING_REPLICAS):
+        self.nodes = frozenset(nodes)
+        points = sorted(
+            (_point(node.bytes + i.to_bytes(4, "big")), node)
+            for node in self.nodes
+            for i in range(replicas)
+        )
+        self._points = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def owner(self, document_id: UUID) -> UUID | None:
+        if not self._points:
+            return None
+        i = bisect.bisect_left(self._points, _point(document_id.bytes))
+        return self._owners[i % len(self._owners)]
@@ -1,34 +1,90 @@
+import time
 from uuid import UUID
 
 from pycrdt import Doc
 
+from collaboration.application.snapshot_policy import SnapshotPolicy
 from collaboration.domain.entities import CrdtSnapshot, CrdtUpdate
 from collaboration.domain.repository import CrdtStorageRepository
+from collaboration.infrastructure.crdt_executor import CrdtExecutor, default_executor
 from collaboration.infrastructure.yjs_adapter import (
     apply_update,
     create_doc,
-    encode_state_as_update,
-    encode_state_vector,
+    encode_state_vector_from_update,
+    merge_updates,
+)
+from shared.infrastructure.metrics import (
+    LOAD_SECONDS,
+    PERSIST_BATCH_SIZE,
+    PERSIST_SECONDS,
+    REPLAY_BYTES,
+    REPLAY_UPDATES,
+    SNAPSHOT_SECONDS,
 )
 
-SNAPSHOT_INTERVAL = 50  # create a snapshot every N updates
+REPLAY_CHUNK_SIZE = 500  # pending updates fetched and merged per step when loading
 
 
 async def load_document_state(repo: CrdtStorageRepository, document_id: UUID) -> Doc:
     """Load the latest CRDT state from snapshot + pending updates."""
+    doc, _ = await load_document(repo, document_id)
+    return doc
+
+
+async def load_document(
+    repo: CrdtStorageRepository,
+    document_id: UUID,
+    policy: SnapshotPolicy | None = None,
+    executor: CrdtExecutor = default_executor,
+) -> tuple[Doc, int]:
+    """Like load_document_state, also returning the last update_seq the doc covers.
+
+    The policy, if given, is told how long replaying the update tail took.
+    """
+    started = time.perf_counter()
     doc = create_doc()
 
     snapshot = await repo.get_latest_snapshot(document_id)
     since_seq = 0
     if snapshot:
-        apply_update(doc, snapshot.snapshot)
+        await executor.run(len(snapshot.snapshot), apply_update, doc, snapshot.snapshot)
         since_seq = snapshot.update_seq
 
-    updates = await repo.get_updates_since(document_id, since_seq)
-    for update in updates:
-        apply_update(doc, update.update_data)
-
-    return doc
+    # Stream the tail in chunks, merging each into one update before applying it,
+    # so a long uncompacted tail never sits in memory all at once
+    last_seq, replayed, replayed_bytes, replay_seconds = since_seq, 0, 0, 0.0
+    async for chunk in repo.stream_updates_since(document_id, since_seq, REPLAY_CHUNK_SIZE):
+        applying = time.perf_counter()
+        blobs = [data for _, data in chunk]
+        merged = await executor.merge(blobs)
+        await executor.run(len(merged), apply_update, doc, merged)
+        replay_seconds += time.perf_counter() - applying
+        last_seq = chunk[-1][0]
+        replayed += len(blobs)
+        replayed_bytes += sum(map(len, blobs))
+    REPLAY_UPDATES.observe(replayed)
+    REPLAY_BYTES.observe(replayed_bytes)
+    LOAD_SECONDS.observe(time.perf_counter() - started)
+    if policy is not None:
+        policy.loaded(document_id, replayed, replayed_bytes, replay_seconds)
+
+    return doc, last_seq
+
+
+async def load_missing(
+    repo: CrdtStorageRepository, document_id: UUID, since_seq: int
+) -> tuple[CrdtSnapshot | None, list[CrdtUpdate]]:
+    """Fetch what a replica that has everything up to since_seq is missing.
+
+    The snapshot is only returned when it covers updates past since_seq, since
+    those may already have been pruned from the update log.
+    """
+    snapshot = await repo.get_latest_snapshot(document_id)
+    if snapshot and snapshot.update_seq > since_seq:
+        since_seq = snapshot.update_seq
+    else:
+        snapshot = None
+    return snapshot, await repo.get_updates_since(document_id, since_seq)
 
 
 async def persist_update(
@@ -37,33 +93,49 @@ async def persist_update(
     user_id: UUID,
     update_data: bytes,
 ) -> CrdtUpdate:
-    """Save an incremental CRDT update and trigger snapshot if needed."""
-    seq = await repo.get_next_seq(document_id)
-
-    update = CrdtUpdate(
-        document_id=document_id,
-        update_data=update_data,
-        update_seq=seq,
-        user_id=user_id,
-    )
-    saved = await repo.save_update(update)
+    """Save an incremental CRDT update. Compaction is left to the caller (see SnapshotPolicy)."""
+    started = time.perf_counter()
+    [saved] = await repo.append_updates(document_id, [(user_id, update_data)])
+    PERSIST_SECONDS.observe(time.perf_counter() - started)
+    PERSIST_BATCH_SIZE.observe(1)
+    return saved
 
-    if seq % SNAPSHOT_INTERVAL == 0:
-        await create_snapshot(repo, document_id)
 
+async def persist_updates(
+    repo: CrdtStorageRepository,
+    document_id: UUID,
+    batch: list[tuple[UUID, bytes]],
+) -> list[CrdtUpdate]:
+    """Save a batch of (user_id, update_data) in one insert, with consecutive seqs."""
+    if not batch:
+        return []
+    started = time.perf_counter()
+    saved = await repo.append_updates(document_id, batch)
+    PERSIST_SECONDS.observe(time.perf_counter() - started)
+    PERSIST_BATCH_SIZE.observe(len(saved))
     return saved
 
 
-async def create_snapshot(repo: CrdtStorageRepository, document_id: UUID) -> CrdtSnapshot:
-    """Rebuild the full doc state and persist a snapshot, then prune old updates."""
-    doc = await load_document_state(repo, document_id)
+async def create_snapshot(
+    repo: CrdtStorageRepository, document_id: UUID, executor: CrdtExecutor = default_executor
+) -> CrdtSnapshot:
+    """Fold the updates since the last snapshot into a new one, then prune them."""
+    started = time.perf_counter()
+    # Read the covered seq before loading: anything committed in between is replayed
+    # into the snapshot too, which is harmless, whereas the reverse would prune it
+    current_seq = await repo.get_current_seq(document_id)
 
-    snapshot_data = encode_state_as_update(doc)
-    state_vector = encode_state_vector(doc)
+    previous = await repo.get_latest_snapshot(document_id)
+    since_seq = previous.update_seq if previous else 0
+    updates = await repo.get_updates_since(document_id, since_seq)
 
-    # Get the current max seq to record what this snapshot covers
-    next_seq = await repo.get_next_seq(document_id)
-    current_seq = next_seq - 1
+    # Merging blobs avoids rebuilding the document, so the cost follows the delta
+    # rather than the whole history
+    blobs = ([previous.snapshot] if previous else []) + [u.update_data for u in updates]
+    snapshot_data = await executor.merge(blobs) if blobs else merge_updates([])
+    state_vector = await executor.run(
+        len(snapshot_data), encode_state_vector_from_update, snapshot_data
+    )
 
     snapshot = CrdtSnapshot(
         document_id=document_id,
@@ -75,5 +147,7 @@ async def create_snapshot(repo: CrdtStorageRepository, document_id: UUID) -> Crd
 
     # Prune updates that are now covered by the snapshot
     await repo.delete_updates_before(document_id, current_seq)
+    SNAPSHOT_SECONDS.observe(time.perf_counter() - started)
 
     return saved
+
@@ -0,0 +1,150 @@
+import logging
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Sequence
+from dataclasses import dataclass
+from enum import StrEnum
+from uuid import UUID
+
+from collaboration.domain.entities import CrdtUpdate
+
+logger = logging.getLogger(__name__)
+
+# Replay rate assumed until a load has been measured (pycrdt, small text edits)
+DEFAULT_REPLAY_BYTES_PER_SECOND = 5_000_000
+# How fast the process-wide rate follows new measurements
+_RATE_SMOOTHING = 0.2
+# How fast a document's time between opens follows new ones
+_INTERVAL_SMOOTHING = 0.5
+MAX_TRACKED_DOCS = 10_000
+
+
+class SnapshotReason(StrEnum):
+    REPLAY_BUDGET = "replay_budget"  # replaying the tail would take longer than the budget
+    PENDING_BYTES = "pending_bytes"  # hard cap on the tail's size
+    PENDING_UPDATES = "pending_updates"  # hard cap on the tail's row count
+
+
+@dataclass
+class _DocState:
+    pending_bytes: int = 0
+    pending_updates: int = 0
+    seconds_per_byte: float | None = None  # measured the last time this doc was loaded
+    last_opened: float | None = None
+    open_interval: float | None = None  # smoothed time between opens; None until reopened
+
+
+class SnapshotPolicy:
+    """Decides when a document's update tail is worth folding into a snapshot.
+
+    It tracks each document's pending (unsnapshotted) bytes and estimates what
+    replaying them would cost from the replay time measured when the document
+    was last loaded. A snapshot is due once that estimate passes the budget,
+    or a hard cap on the tail is hit. The budget doubles for every
+    ``idle_backoff`` seconds between opens of the document, up to
+    ``max_backoff`` times, so documents that are rarely opened, and so rarely
+    replayed, are compacted less often. A long session counts as one open.
+
+    The tail includes updates other nodes persisted (``observe``). Every node
+    sees the same updates, so the one whose write takes the tail over the
+    limit snapshots it while the others just start their count over.
+    """
+
+    def __init__(
+        self,
+        replay_budget: float,
+        max_pending_bytes: int,
+        max_pending_updates: int,
+        idle_backoff: float,
+        max_backoff: int,
+    ):
+        self.replay_budget = replay_budget
+        self.max_pending_bytes = max_pending_bytes
+        self.max_pending_updates = max_pending_updates
+        self.idle_backoff = idle_backoff
+        self.max_backoff = max_backoff
+        self.reasons: Counter[SnapshotReason] = Counter()
+        self._seconds_per_byte = 1 / DEFAULT_REPLAY_BYTES_PER_SECOND
+        self._docs: OrderedDict[UUID, _DocState] = OrderedDict()
+
+    def opened(self, document_id: UUID) -> None:
+        state, now = self._state(document_id), time.monotonic()
+        if state.last_opened is not None:
+            gap = now - state.last_opened
+            if state.open_interval is None:
+                state.open_interval = gap
+            else:
+                state.open_interval += _INTERVAL_SMOOTHING * (gap - state.open_interval)
+        state.last_opened = now
+
+    def loaded(self, document_id: UUID, updates: int, nbytes: int, seconds: float) -> None:
+        """Record a load from storage: the tail it replayed and how long that took."""
+        state = self._state(document_id)
+        state.pending_bytes = nbytes
+        state.pending_updates = updates
+        if state.pending_bytes:
+            state.seconds_per_byte = seconds / state.pending_bytes
+            self._seconds_per_byte += _RATE_SMOOTHING * (state.seconds_per_byte - self._seconds_per_byte)
+
+    def estimated_replay(self, document_id: UUID) -> float:
+        state = self._state(document_id)
+        rate = state.seconds_per_byte if state.seconds_per_byte is not None else self._seconds_per_byte
+        return state.pending_bytes * rate
+
+    def budget(self, document_id: UUID) -> float:
+        interval = self._state(document_id).open_interval
+        if interval is None:
+            return self.replay_budget
+        return self.replay_budget * min(2 ** int(interval / self.idle_backoff), self.max_backoff)
+
+    def record(self, document_id: UUID, saved: Sequence[CrdtUpdate]) -> SnapshotReason | None:
+        """Add updates this node saved to the tail; return why a snapshot is due, if it is.
+
+        A due snapshot is assumed to be taken, so the tail starts over from empty.
+        """
+        state = self._state(document_id)
+        reason = self._grow(document_id, state, sum(len(u.update_data) for u in saved), len(saved))
+        if reason is None:
+            return None
+
+        logger.info(
+            "Snapshot due for document %s (%s): %d pending updates, %d bytes, ~%.1f ms replay",
+            document_id,
+            reason,
+            state.pending_updates,
+            state.pending_bytes,
+            self.estimated_replay(document_id) * 1000,
+        )
+        self.reasons[reason] += 1
+        state.pending_bytes = state.pending_updates = 0
+        return reason
+
+    def observe(self, document_id: UUID, nbytes: int, updates: int) -> None:
+        """Add updates another node saved to the tail; that node snapshots them if due."""
+        state = self._state(document_id)
+        if self._grow(document_id, state, nbytes, updates) is not None:
+            state.pending_bytes = state.pending_updates = 0
+
+    def _grow(
+        self, document_id: UUID, state: _DocState, nbytes: int, updates: int
+    ) -> SnapshotReason | None:
+        state.pending_bytes += nbytes
+        state.pending_updates += updates
+        if state.pending_bytes >= self.max_pending_bytes:
+            return SnapshotReason.PENDING_BYTES
+        if state.pending_updates >= self.max_pending_updates:
+            return SnapshotReason.PENDING_UPDATES
+        if self.estimated_replay(document_id) >= self.budget(document_id):
+            return SnapshotReason.REPLAY_BUDGET
+        return None
+
+    def _state(self, document_id: UUID) -> _DocState:
+        state = self._docs.get(document_id)
+        if state is None:
+            state = self._docs[document_id] = _DocState()
+            if len(self._docs) > MAX_TRACKED_DOCS:
+                # Forgetting a doc only loses its estimate; its next load measures it again
+                self._docs.popitem(last=False)
+        else:
+            self._docs.move_to_end(document_id)
+        return state
@@ -0,0 +1,166 @@
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from uuid import UUID
+
+from shared.infrastructure.tracing import TraceContext
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PendingUpdate:
+    user_id: UUID
+    update_data: bytes
+    connection_id: int = 0
+    enqueued_at: float = field(default_factory=time.monotonic)
+    trace: TraceContext | None = None
+    relayed_by: UUID | None = None  # node that relayed it here in ownership mode
+
+
+@dataclass
+class WriteBehindStats:
+    flushes: int = 0
+    updates_flushed: int = 0
+    failed_flushes: int = 0
+    last_flush_seconds: float = 0.0
+    max_flush_seconds: float = 0.0
+    max_wait_seconds: float = 0.0  # longest time an update sat in memory before it was durable
+
+
+FlushFn = Callable[[UUID, list[PendingUpdate]], Awaitable[None]]
+
+
+class WriteBehindBuffer:
+    """Per-document buffer that groups CRDT updates into one write.
+
+    A document's buffer is flushed once its oldest update has waited ``window``
+    seconds or it holds ``max_batch`` updates, whichever comes first. Flushes of
+    the same document are serialised so sequence numbers stay in arrival order.
+    A failed flush puts its batch back at the head of the queue. Once stopped it
+    takes no more updates; their clients send them again when they reconnect.
+    """
+
+    def __init__(self, flush: FlushFn, window: float, max_batch: int):
+        self.window = window
+        self.max_batch = max_batch
+        self.stats = WriteBehindStats()
+        self._flush = flush
+        self._pending: dict[UUID, list[PendingUpdate]] = {}
+        self._timers: dict[UUID, asyncio.Task] = {}
+        self._locks: dict[UUID, tuple[asyncio.Lock, int]] = {}
+        self._stopped = False
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(len(batch) for batch in self._pending.values())
+
+    def depth(self, document_id: UUID) -> int:
+        return len(self._pending.get(document_id, ()))
+
+    async def enqueue(
+        self,
+        document_id: UUID,
+        user_id: UUID,
+        update_data: bytes,
+        connection_id: int = 0,
+        trace: TraceContext | None = None,
+        relayed_by: UUID | None = None,
+    ) -> None:
+        if self._stopped:
+            logger.warning("Write-behind stopped; dropping an update for document %s", document_id)
+            return
+        batch = self._pending.setdefault(document_id, [])
+        batch.append(
+            PendingUpdate(user_id, update_data, connection_id, trace=trace, relayed_by=relayed_by)
+        )
+        if len(batch) >= self.max_batch:
+            await self.flush_or_retry(document_id)
+        elif document_id not in self._timers:
+            self._schedule(document_id)
+
+    async def flush(self, document_id: UUID) -> None:
+        timer = self._timers.pop(document_id, None)
+        if timer is not None and timer is not asyncio.current_task():
+            timer.cancel()
+
+        async with self._document_lock(document_id):
+            batch = self._pending.pop(document_id, None)
+            if not batch:
+                return
+            started = time.monotonic()
+            try:
+                await self._flush(document_id, batch)
+            except Exception:
+                self.stats.failed_flushes += 1
+                self._pending[document_id] = batch + self._pending.get(document_id, [])
+                raise
+            finished = time.monotonic()
+
+        elapsed = finished - started
+        self.stats.flushes += 1
+        self.stats.updates_flushed += len(batch)
+        self.stats.last_flush_seconds = elapsed
+        self.stats.max_flush_seconds = max(self.stats.max_flush_seconds, elapsed)
+        self.stats.max_wait_seconds = max(
+            self.stats.max_wait_seconds, finished - batch[0].enqueued_at
+        )
+
+    async def flush_all(self) -> None:
+        """Flush every document; one failing does not keep the others from being written."""
+        for document_id in list(self._pending):
+            try:
+                await self.flush(document_id)
+            except Exception:
+                logger.exception("Write-behind flush failed for document %s", document_id)
+
+    async def stop(self) -> None:
+        """Stop taking updates and write out what is buffered, before storage goes away."""
+        self._stopped = True
+        # Timers still in _timers are sleeping; one that woke has already removed itself
+        timers = list(self._timers.values())
+        self._timers.clear()
+        for timer in timers:
+            timer.cancel()
+        await asyncio.gather(*timers, return_exceptions=True)
+        # Wait out flushes already under way, then write the rest
+        for document_id in list(self._locks):
+            async with self._document_lock(document_id):
+                pass
+        await self.flush_all()
+
+    def _schedule(self, document_id: UUID) -> None:
+        if self._stopped:
+            return
+        self._timers[document_id] = asyncio.create_task(self._flush_later(document_id))
+
+    async def _flush_later(self, document_id: UUID) -> None:
+        await asyncio.sleep(self.window)
+        await self.flush_or_retry(document_id)
+
+    async def flush_or_retry(self, document_id: UUID) -> None:
+        """Flush now; if that fails, keep the batch and retry after the window."""
+        try:
+            await self.flush(document_id)
+        except Exception:
+            logger.exception("Write-behind flush failed for document %s", document_id)
+            # Keep the batch and retry on the next window rather than dropping it
+            if document_id in self._pending and document_id not in self._timers:
+                self._schedule(document_id)
+
+    @asynccontextmanager
+    async def _document_lock(self, document_id: UUID) -> AsyncIterator[None]:
+        lock, users = self._locks.get(document_id, (asyncio.Lock(), 0))
+        self._locks[document_id] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[document_id]
+            if users == 1:
+                del self._locks[document_id]
+            else:
+                self._locks[document_id] = (lock, users - 1)
@@ -1,3 +1,4 @@
+from collections.abc import AsyncIterator
 from typing import Protocol
 from uuid import UUID
 
@@ -9,10 +10,26 @@ class CrdtStorageRepository(Protocol):
 
     async def get_updates_since(self, document_id: UUID, since_seq: int) -> list[CrdtUpdate]: ...
 
+    # (update_seq, update_data) rows past since_seq, in seq order, at most chunk_size at a time
+    def stream_updates_since(
+        self, document_id: UUID, since_seq: int, chunk_size: int
+    ) -> AsyncIterator[list[tuple[int, bytes]]]: ...
+
     async def save_update(self, update: CrdtUpdate) -> CrdtUpdate: ...
 
+    async def save_updates(self, updates: list[CrdtUpdate]) -> list[CrdtUpdate]: ...
+
+    # Reserves seqs for (user_id, update_data) and saves them as one transaction, so
+    # get_current_seq never covers a seq whose update is not written yet
+    async def append_updates(
+        self, document_id: UUID, batch: list[tuple[UUID, bytes]]
+    ) -> list[CrdtUpdate]: ...
+
     async def save_snapshot(self, snapshot: CrdtSnapshot) -> CrdtSnapshot: ...
 
     async def delete_updates_before(self, document_id: UUID, up_to_seq: int) -> None: ...
 
-    async def get_next_seq(self, document_id: UUID) -> int: ...
+    # Reserves `count` consecutive seqs and returns the first one
+    async def get_next_seq(self, document_id: UUID, count: int = 1) -> int: ...
+
+    async def get_current_seq(self, document_id: UUID) -> int: ...
@@ -0,0 +1,68 @@
+import asyncio
+import hashlib
+import mmap
+import os
+import tempfile
+from pathlib import Path
+from typing import Protocol
+
+
+class BlobStore(Protocol):
+    """Content-addressed storage for large snapshots; the key is the blob's SHA-256."""
+
+    async def put(self, data: bytes) -> str: ...
+
+    async def get(self, key: str) -> bytes: ...
+
+
+def blob_key(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class LocalBlobStore:
+    """Blobs as files under root, fanned out by the first two hex digits of their key.
+
+    Identical snapshots, from any document or fork, land on the same file and
+    are written once. Files are never rewritten, so readers can map them
+    without locking.
+    """
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def path_of(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    async def put(self, data: bytes) -> str:
+        return await asyncio.to_thread(self._put, data)
+
+    async def get(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._get, key)
+
+    def _put(self, data: bytes) -> str:
+        key = blob_key(data)
+        path = self.path_of(key)
+        if path.exists():
+            return key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write aside and rename, so a crash never leaves a truncated blob under its key
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+        return key
+
+    def _get(self, key: str) -> bytes:
+        with open(self.path_of(key), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            # pycrdt's apply_update only takes bytes, so the page cache is copied
+            # exactly once, straight into the object the doc is built from
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return mapped[:]
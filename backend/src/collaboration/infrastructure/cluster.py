@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+from uuid import UUID
+
+from redis.asyncio import Redis
+from redis.exceptions import WatchError
+
+from collaboration.application.ownership import HashRing
+
+logger = logging.getLogger(__name__)
+
+_NODES_KEY = "cluster:nodes"  # sorted set: node id -> lease expiry (ms)
+_ADDRESSES_KEY = "cluster:node_addresses"  # hash: node id -> routable address
+
+
+def _lease_key(document_id: UUID) -> str:
+    return f"doc:{document_id}:owner"
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class ClusterMembership:
+    """Live-node membership and per-document write leases, kept in Redis.
+
+    Every node renews its own membership lease in a sorted set; the ones that
+    have not expired make up the hash ring. A document is written by whoever
+    holds its lease. The lease goes to the ring owner when it is free, is
+    renewed on every write, and lapses once the document has been idle for
+    ``lease_ttl`` seconds, so ownership never moves in the middle of a burst.
+    """
+
+    def __init__(self, redis: Redis, node_id: UUID, address: str, lease_ttl: float):
+        self.node_id = node_id
+        self.address = address
+        self.lease_ttl = lease_ttl
+        self.ring = HashRing([node_id])
+        self._redis = redis
+        self._heartbeat: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        await self.refresh()
+        self._heartbeat = asyncio.create_task(self._beat_forever())
+
+    async def stop(self) -> None:
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            await asyncio.gather(self._heartbeat, return_exceptions=True)
+            self._heartbeat = None
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.zrem(_NODES_KEY, str(self.node_id))
+            pipe.hdel(_ADDRESSES_KEY, str(self.node_id))
+            await pipe.execute()
+
+    async def refresh(self) -> None:
+        """Renew this node's membership and reload the ring."""
+        now = _now_ms()
+        node = str(self.node_id)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            pipe.zadd(_NODES_KEY, {node: now + int(self.lease_ttl * 1000)})
+            pipe.hset(_ADDRESSES_KEY, node, self.address)
+            pipe.zremrangebyscore(_NODES_KEY, "-inf", now)
+            pipe.zrange(_NODES_KEY, 0, -1)
+            *_, members = await pipe.execute()
+        self.ring = HashRing(UUID(member.decode()) for member in members)
+
+    async def owner(self, document_id: UUID) -> UUID:
+        """The node that writes the document now, or will once it is next written."""
+        holder = await self._lease_holder(document_id)
+        return holder or self.ring.owner(document_id) or self.node_id
+
+    async def address_of(self, node_id: UUID) -> str | None:
+        address = await self._redis.hget(_ADDRESSES_KEY, str(node_id))
+        return address.decode() if address is not None else None
+
+    async def hold(self, document_id: UUID, claim: bool = False) -> UUID:
+        """Take or renew the document's write lease.
+
+        Returns the node that holds it afterwards. A free lease is only taken
+        by the ring owner, unless ``claim`` is set: a node that updates were
+        relayed to takes it regardless, so two nodes with briefly different
+        rings cannot pass updates back and forth.
+        """
+        key = _lease_key(document_id)
+        ttl_ms = int(self.lease_ttl * 1000)
+        holder = await self._lease_holder(document_id)
+        if holder == self.node_id:
+            await self._redis.pexpire(key, ttl_ms)
+            return self.node_id
+        if holder is not None:
+            return holder
+        if not claim and self.ring.owner(document_id) not in (self.node_id, None):
+            return self.ring.owner(document_id)
+        # Also replaces a lease left behind by a node that has dropped out of the ring,
+        # but only if nobody else got there first
+        async with self._redis.pipeline() as pipe:
+            try:
+                await pipe.watch(key)
+                if self._live_holder(await pipe.get(key)) is not None:
+                    raise WatchError
+                pipe.multi()
+                pipe.set(key, str(self.node_id), px=ttl_ms)
+                await pipe.execute()
+                return self.node_id
+            except WatchError:
+                return await self._lease_holder(document_id) or self.node_id
+
+    async def _lease_holder(self, document_id: UUID) -> UUID | None:
+        return self._live_holder(await self._redis.get(_lease_key(document_id)))
+
+    def _live_holder(self, value: bytes | None) -> UUID | None:
+        if value is None:
+            return None
+        holder = UUID(value.decode())
+        # A lease held by a node that is no longer alive counts as free
+        return holder if holder in self.ring.nodes else None
+
+    async def _beat_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Cluster heartbeat failed")
@@ -0,0 +1,90 @@
+import asyncio
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import TypeVar
+
+from collaboration.infrastructure.yjs_adapter import merge_updates
+from shared.config import settings
+
+T = TypeVar("T")
+
+
+@dataclass
+class CrdtExecutorStats:
+    inline: int = 0
+    threaded: int = 0
+    processed: int = 0
+
+
+class CrdtExecutor:
+    """Decides where pycrdt work runs, by the size of what it touches.
+
+    Below ``inline_max_bytes`` work stays on the event loop, where a hop to a
+    worker would cost more than the work itself. Larger work on a live doc goes
+    to a thread pool. pycrdt holds the GIL while it runs, so a thread only
+    bounds a stall to one call instead of a run of them; merges of detached
+    blobs, which need no shared doc, go to a process pool when ``processes``
+    is set and really leave the loop free.
+
+    Callers that touch a live doc must hold its lock, because a worker may be
+    using the doc while the loop moves on.
+    """
+
+    def __init__(self, inline_max_bytes: int, threads: int, processes: int = 0):
+        self.inline_max_bytes = inline_max_bytes
+        self.threads = threads
+        self.processes = processes
+        self.stats = CrdtExecutorStats()
+        self._thread_pool: ThreadPoolExecutor | None = None
+        self._process_pool: ProcessPoolExecutor | None = None
+
+    async def run(self, size: int, fn: Callable[..., T], *args) -> T:
+        """Run fn(*args) inline if size is small, otherwise on the thread pool."""
+        if size < self.inline_max_bytes:
+            self.stats.inline += 1
+            return fn(*args)
+        return await self.offload(fn, *args)
+
+    async def offload(self, fn: Callable[..., T], *args) -> T:
+        """Run fn(*args) on the thread pool whatever its size."""
+        self.stats.threaded += 1
+        return await asyncio.get_running_loop().run_in_executor(self._threads(), fn, *args)
+
+    async def merge(self, updates: list[bytes]) -> bytes:
+        """merge_updates, on the process pool when the blobs are large and one is configured."""
+        if len(updates) == 1:
+            return updates[0]
+        size = sum(map(len, updates))
+        if size < self.inline_max_bytes or not self.processes:
+            return await self.run(size, merge_updates, updates)
+        self.stats.processed += 1
+        return await asyncio.get_running_loop().run_in_executor(self._processes(), merge_updates, updates)
+
+    def shutdown(self) -> None:
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._thread_pool = self._process_pool = None
+
+    def _threads(self) -> Executor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(self.threads, thread_name_prefix="crdt")
+        return self._thread_pool
+
+    def _processes(self) -> Executor:
+        if self._process_pool is None:
+            # Not fork: the parent has an event loop and worker threads running
+            self._process_pool = ProcessPoolExecutor(
+                self.processes, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._process_pool
+
+
+# Shared by everything that touches CRDT state in this process
+default_executor = CrdtExecutor(
+    inline_max_bytes=settings.CRDT_INLINE_MAX_BYTES,
+    threads=settings.CRDT_WORKER_THREADS,
+    processes=settings.CRDT_MERGE_PROCESSES,
+)
@@ -1,15 +1,58 @@
+from collections.abc import AsyncIterator
 from uuid import UUID
 
-from sqlalchemy import delete, func, select
+from sqlalchemy import delete, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from collaboration.domain.entities import CrdtSnapshot, CrdtUpdate
-from collaboration.infrastructure.models import CrdtSnapshotModel, CrdtUpdateModel
+from collaboration.infrastructure.blob_store import BlobStore, LocalBlobStore
+from collaboration.infrastructure.crdt_executor import CrdtExecutor, default_executor
+from collaboration.infrastructure.models import (
+    CrdtSeqCounterModel,
+    CrdtSnapshotModel,
+    CrdtUpdateModel,
+)
+from collaboration.infrastructure.storage_codec import StorageCodec, load_dictionaries
+from shared.config import settings
+
+# Update and snapshot blobs are compressed on the way in and decoded on the way out
+default_codec = StorageCodec(
+    level=settings.CRDT_COMPRESSION_LEVEL,
+    dictionaries=load_dictionaries(settings.CRDT_ZSTD_DICTIONARIES),
+)
+# Large snapshots are kept out of the row, which only holds their key
+default_blob_store = LocalBlobStore(settings.SNAPSHOT_BLOB_DIR) if settings.SNAPSHOT_BLOB_DIR else None
+
+
+async def encode_blobs(codec: StorageCodec, executor: CrdtExecutor, blobs: list[bytes]) -> list[bytes]:
+    """codec.encode over blobs; off the loop once they add up to a large payload."""
+    return await executor.run(sum(map(len, blobs)), _map, codec.encode, blobs)
+
+
+async def decode_blobs(codec: StorageCodec, executor: CrdtExecutor, blobs: list[bytes]) -> list[bytes]:
+    """codec.decode over blobs; off the loop once they decode to a large payload."""
+    return await executor.run(sum(map(codec.decoded_size, blobs)), _map, codec.decode, blobs)
+
+
+def _map(fn, items: list[bytes]) -> list[bytes]:
+    return [fn(item) for item in items]
 
 
 class DbCrdtStorageRepository:
-    def __init__(self, session: AsyncSession):
+    def __init__(
+        self,
+        session: AsyncSession,
+        codec: StorageCodec = default_codec,
+        blob_store: BlobStore | None = default_blob_store,
+        blob_threshold: int = settings.SNAPSHOT_BLOB_THRESHOLD,
+        executor: CrdtExecutor = default_executor,
+    ):
         self.session = session
+        self.codec = codec
+        self.blob_store = blob_store
+        self.blob_threshold = blob_threshold
+        self.executor = executor
 
     async def get_latest_snapshot(self, document_id: UUID) -> CrdtSnapshot | None:
         result = await self.session.execute(
@@ -19,7 +62,17 @@ class DbCrdtStorageRepository:
             .limit(1)
         )
         model = result.scalar_one_or_none()
-        return _snapshot_to_entity(model) if model else None
+        if model is None:
+            return None
+        if model.snapshot_ref is None:
+            (snapshot,) = await decode_blobs(self.codec, self.executor, [model.snapshot])
+            return _snapshot_to_entity(model, snapshot)
+        if self.blob_store is None:
+            raise ValueError(
+                f"Snapshot {model.id} is in the blob store, but no blob store is configured"
+            )
+        # Stored uncompressed: the mapped file is the Yjs update itself
+        return _snapshot_to_entity(model, await self.blob_store.get(model.snapshot_ref))
 
     async def get_updates_since(self, document_id: UUID, since_seq: int) -> list[CrdtUpdate]:
         result = await self.session.execute(
@@ -30,31 +83,86 @@ class DbCrdtStorageRepository:
             )
             .order_by(CrdtUpdateModel.update_seq.asc())
         )
-        return [_update_to_entity(m) for m in result.scalars().all()]
+        models = result.scalars().all()
+        data = await decode_blobs(self.codec, self.executor, [m.update_data for m in models])
+        return [_update_to_entity(m, d) for m, d in zip(models, data)]
+
+    async def stream_updates_since(
+        self, document_id: UUID, since_seq: int, chunk_size: int
+    ) -> AsyncIterator[list[tuple[int, bytes]]]:
+        # Server-side cursor over two plain columns: no ORM objects, and only one
+        # chunk of rows is held in memory at a time
+        result = await self.session.stream(
+            select(CrdtUpdateModel.update_seq, CrdtUpdateModel.update_data)
+            .where(
+                CrdtUpdateModel.document_id == document_id,
+                CrdtUpdateModel.update_seq > since_seq,
+            )
+            .order_by(CrdtUpdateModel.update_seq.asc())
+            .execution_options(yield_per=chunk_size)
+        )
+        async for rows in result.partitions():
+            data = await decode_blobs(self.codec, self.executor, [row[1] for row in rows])
+            yield [(row[0], d) for row, d in zip(rows, data)]
 
     async def save_update(self, update: CrdtUpdate) -> CrdtUpdate:
+        (encoded,) = await encode_blobs(self.codec, self.executor, [update.update_data])
         model = CrdtUpdateModel(
             document_id=update.document_id,
-            update_data=update.update_data,
+            update_data=encoded,
             update_seq=update.update_seq,
             user_id=update.user_id,
         )
         self.session.add(model)
         await self.session.commit()
         await self.session.refresh(model)
-        return _update_to_entity(model)
+        return _update_to_entity(model, update.update_data)
+
+    async def save_updates(self, updates: list[CrdtUpdate]) -> list[CrdtUpdate]:
+        if not updates:
+            return []
+        encoded = await encode_blobs(self.codec, self.executor, [u.update_data for u in updates])
+        # One multi-row INSERT ... RETURNING for the whole batch
+        result = await self.session.scalars(
+            insert(CrdtUpdateModel).returning(CrdtUpdateModel, sort_by_parameter_order=True),
+            [
+                {
+                    "document_id": u.document_id,
+                    "update_data": data,
+                    "update_seq": u.update_seq,
+                    "user_id": u.user_id,
+                }
+                for u, data in zip(updates, encoded)
+            ],
+        )
+        models = result.all()
+        await self.session.commit()
+        return [_update_to_entity(m, u.update_data) for m, u in zip(models, updates)]
+
+    async def append_updates(
+        self, document_id: UUID, batch: list[tuple[UUID, bytes]]
+    ) -> list[CrdtUpdate]:
+        # The counter row stays locked until save_updates commits the inserts with it
+        first_seq = await self.get_next_seq(document_id, len(batch))
+        return await self.save_updates(_numbered(document_id, first_seq, batch))
 
     async def save_snapshot(self, snapshot: CrdtSnapshot) -> CrdtSnapshot:
+        if self.blob_store is not None and len(snapshot.snapshot) >= self.blob_threshold:
+            inline, ref = None, await self.blob_store.put(snapshot.snapshot)
+        else:
+            (inline,) = await encode_blobs(self.codec, self.executor, [snapshot.snapshot])
+            ref = None
         model = CrdtSnapshotModel(
             document_id=snapshot.document_id,
-            snapshot=snapshot.snapshot,
+            snapshot=inline,
+            snapshot_ref=ref,
             state_vector=snapshot.state_vector,
             update_seq=snapshot.update_seq,
         )
         self.session.add(model)
         await self.session.commit()
         await self.session.refresh(model)
-        return _snapshot_to_entity(model)
+        return _snapshot_to_entity(model, snapshot.snapshot)
 
     async def delete_updates_before(self, document_id: UUID, up_to_seq: int) -> None:
         await self.session.execute(
@@ -65,35 +173,47 @@ class DbCrdtStorageRepository:
         )
         await self.session.commit()
 
-    async def get_next_seq(self, document_id: UUID) -> int:
-        # Consider both updates and snapshots to avoid seq collision after pruning
-        update_max = await self.session.execute(
-            select(func.coalesce(func.max(CrdtUpdateModel.update_seq), 0))
-            .where(CrdtUpdateModel.document_id == document_id)
-        )
-        snapshot_max = await self.session.execute(
-            select(func.coalesce(func.max(CrdtSnapshotModel.update_seq), 0))
-            .where(CrdtSnapshotModel.document_id == document_id)
+    async def get_next_seq(self, document_id: UUID, count: int = 1) -> int:
+        # Single upsert on the per-document counter row. The row lock is held until the
+        # caller commits, so concurrent writers can never be handed the same seq.
+        stmt = pg_insert(CrdtSeqCounterModel).values(document_id=document_id, last_seq=count)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CrdtSeqCounterModel.document_id],
+            set_={"last_seq": CrdtSeqCounterModel.last_seq + count},
+        ).returning(CrdtSeqCounterModel.last_seq)
+        result = await self.session.execute(stmt)
+        return result.scalar_one() - count + 1
+
+    async def get_current_seq(self, document_id: UUID) -> int:
+        result = await self.session.execute(
+            select(CrdtSeqCounterModel.last_seq).where(CrdtSeqCounterModel.document_id == document_id)
         )
-        return max(update_max.scalar_one(), snapshot_max.scalar_one()) + 1
+        return result.scalar_one_or_none() or 0
+
+
+def _numbered(document_id: UUID, first_seq: int, batch: list[tuple[UUID, bytes]]) -> list[CrdtUpdate]:
+    return [
+        CrdtUpdate(document_id=document_id, update_data=data, update_seq=first_seq + i, user_id=user_id)
+        for i, (user_id, data) in enumerate(batch)
+    ]
 
 
-def _snapshot_to_entity(model: CrdtSnapshotModel) -> CrdtSnapshot:
+def _snapshot_to_entity(model: CrdtSnapshotModel, snapshot: bytes) -> CrdtSnapshot:
     return CrdtSnapshot(
         id=model.id,
         document_id=model.document_id,
-        snapshot=model.snapshot,
+        snapshot=snapshot,
         state_vector=model.state_vector,
         update_seq=model.update_seq,
         created_at=model.created_at,
     )
 
 
-def _update_to_entity(model: CrdtUpdateModel) -> CrdtUpdate:
+def _update_to_entity(model: CrdtUpdateModel, update_data: bytes) -> CrdtUpdate:
     return CrdtUpdate(
         id=model.id,
         document_id=model.document_id,
-        update_data=model.update_data,
+        update_data=update_data,
         update_seq=model.update_seq,
         user_id=model.user_id,
         created_at=model.created_at,
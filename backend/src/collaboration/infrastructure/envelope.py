@@ -0,0 +1,138 @@
+import struct
+from dataclasses import dataclass
+from uuid import UUID
+
+from shared.infrastructure.tracing import TraceContext
+
+ENVELOPE_VERSION = 2
+
+_UPDATE = 0
+_AWARENESS = 1
+_RELAY = 2
+# An update carrying a trace context; nodes that predate it drop it and catch up from storage
+_TRACED_UPDATE = 3
+# An update the owner persisted for another node, which carries that node's id; likewise
+_RELAYED_UPDATE = 4
+_RELAYED_TRACED_UPDATE = 5
+
+# version, kind, origin node id
+_HEADER = struct.Struct(">BB16s")
+# origin connection id, first seq, last seq
+_SEQ_RANGE = struct.Struct(">III")
+# document id, origin connection id, user id
+_RELAY_FIELDS = struct.Struct(">16sI16s")
+# trace id, root span id, origin wall clock in ns
+_TRACE_FIELDS = struct.Struct(">16s8sQ")
+# node the update was relayed from
+_RELAYED_FIELDS = struct.Struct(">16s")
+
+
+@dataclass(frozen=True)
+class UpdateEnvelope:
+    """A persisted Yjs update as it travels between nodes.
+
+    ``first_seq``..``last_seq`` is the range of update_seq values the payload
+    covers, so a receiver can tell when it has missed something. ``trace`` is
+    set when an update in the payload was sampled for tracing. ``relayed_by`` is
+    the node the updates were relayed from in ownership mode; its sockets
+    already have them.
+    """
+
+    origin_node: UUID
+    origin_connection: int
+    first_seq: int
+    last_seq: int
+    payload: bytes
+    trace: TraceContext | None = None
+    relayed_by: UUID | None = None
+
+
+@dataclass(frozen=True)
+class AwarenessEnvelope:
+    """An encoded awareness update. Never persisted, so it carries no seqs."""
+
+    origin_node: UUID
+    payload: bytes
+
+
+@dataclass(frozen=True)
+class RelayEnvelope:
+    """An update a node received but does not own, on its way to the owner's inbox."""
+
+    origin_node: UUID
+    document_id: UUID
+    origin_connection: int
+    user_id: UUID
+    payload: bytes
+
+
+Envelope = UpdateEnvelope | AwarenessEnvelope | RelayEnvelope
+
+# Update kinds by (relayed, traced), and back
+_UPDATE_KINDS = {
+    (False, False): _UPDATE,
+    (False, True): _TRACED_UPDATE,
+    (True, False): _RELAYED_UPDATE,
+    (True, True): _RELAYED_TRACED_UPDATE,
+}
+_UPDATE_FIELDS = {kind: fields for fields, kind in _UPDATE_KINDS.items()}
+
+
+def encode_envelope(envelope: Envelope) -> bytes:
+    if isinstance(envelope, RelayEnvelope):
+        header = _HEADER.pack(ENVELOPE_VERSION, _RELAY, envelope.origin_node.bytes)
+        fields = _RELAY_FIELDS.pack(
+            envelope.document_id.bytes, envelope.origin_connection, envelope.user_id.bytes
+        )
+        return header + fields + envelope.payload
+    if isinstance(envelope, AwarenessEnvelope):
+        header = _HEADER.pack(ENVELOPE_VERSION, _AWARENESS, envelope.origin_node.bytes)
+        return header + envelope.payload
+    fields = _SEQ_RANGE.pack(envelope.origin_connection, envelope.first_seq, envelope.last_seq)
+    trace, relayed_by = envelope.trace, envelope.relayed_by
+    if relayed_by is not None:
+        fields += _RELAYED_FIELDS.pack(relayed_by.bytes)
+    if trace is not None:
+        fields += _TRACE_FIELDS.pack(trace.trace_id, trace.span_id, trace.origin_ns)
+    kind = _UPDATE_KINDS[relayed_by is not None, trace is not None]
+    return _HEADER.pack(ENVELOPE_VERSION, kind, envelope.origin_node.bytes) + fields + envelope.payload
+
+
+def decode_envelope(data: bytes) -> Envelope:
+    if len(data) < _HEADER.size:
+        raise ValueError("Truncated envelope")
+    version, kind, node = _HEADER.unpack_from(data)
+    if version != ENVELOPE_VERSION:
+        raise ValueError(f"Unsupported envelope version: {version}")
+    origin_node = UUID(bytes=node)
+
+    if kind == _AWARENESS:
+        return AwarenessEnvelope(origin_node, data[_HEADER.size:])
+    if kind == _RELAY:
+        end = _HEADER.size + _RELAY_FIELDS.size
+        if len(data) < end:
+            raise ValueError("Truncated relay envelope")
+        document_id, connection, user_id = _RELAY_FIELDS.unpack_from(data, _HEADER.size)
+        return RelayEnvelope(
+            origin_node, UUID(bytes=document_id), connection, UUID(bytes=user_id), data[end:]
+        )
+    if kind not in _UPDATE_FIELDS:
+        raise ValueError(f"Unknown envelope kind: {kind}")
+    relayed, traced = _UPDATE_FIELDS[kind]
+    end = _HEADER.size + _SEQ_RANGE.size
+    end += _RELAYED_FIELDS.size * relayed + _TRACE_FIELDS.size * traced
+    if len(data) < end:
+        raise ValueError("Truncated update envelope")
+    connection, first_seq, last_seq = _SEQ_RANGE.unpack_from(data, _HEADER.size)
+    offset = _HEADER.size + _SEQ_RANGE.size
+    relayed_by = trace = None
+    if relayed:
+        (relayer,) = _RELAYED_FIELDS.unpack_from(data, offset)
+        relayed_by = UUID(bytes=relayer)
+        offset += _RELAYED_FIELDS.size
+    if traced:
+        trace_id, span_id, origin_ns = _TRACE_FIELDS.unpack_from(data, offset)
+        trace = TraceContext(trace_id, span_id, origin_ns, remote=True)
+    return UpdateEnvelope(
+        origin_node, connection, first_seq, last_seq, data[end:], trace, relayed_by
+    )
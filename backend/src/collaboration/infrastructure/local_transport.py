@@ -0,0 +1,51 @@
+import asyncio
+from collections.abc import Callable, Coroutine
+from typing import Any
+from uuid import UUID
+
+from shared.infrastructure.metrics import PUBLISH_SECONDS
+
+
+class LocalTransport:
+    """Replication between the hubs of one process, for single-node installs without Redis.
+
+    Messages are handed to every subscription on the topic as they are: no
+    socket, no copy, no serialisation. Each subscription drains its own queue
+    in a task, so callbacks run in publish order without holding up the
+    publisher, and cancelling the task unsubscribes, as with Redis.
+    """
+
+    # Messages never leave the process, so publishers may pass envelope objects
+    local = True
+
+    def __init__(self):
+        self._queues: dict[UUID, set[asyncio.Queue]] = {}
+
+    async def publish(self, document_id: UUID, messages: list[bytes]) -> int:
+        with PUBLISH_SECONDS.labels("local").time():
+            queues = self._queues.get(document_id, ())
+            for queue in queues:
+                for message in messages:
+                    queue.put_nowait(message)
+            return len(queues)
+
+    async def subscribe(
+        self, document_id: UUID, callback: Callable[[bytes], Coroutine[Any, Any, None]]
+    ) -> asyncio.Task:
+        # Registered before returning, so nothing published after this call is missed
+        queue: asyncio.Queue = asyncio.Queue()
+        self._queues.setdefault(document_id, set()).add(queue)
+
+        async def _listen():
+            try:
+                while True:
+                    await callback(await queue.get())
+            except asyncio.CancelledError:
+                pass
+            finally:
+                queues = self._queues[document_id]
+                queues.discard(queue)
+                if not queues:
+                    del self._queues[document_id]
+
+        return asyncio.create_task(_listen())
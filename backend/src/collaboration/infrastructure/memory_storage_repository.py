@@ -0,0 +1,121 @@
+import itertools
+from bisect import bisect_left, bisect_right, insort
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field, replace
+from datetime import UTC, datetime
+from uuid import UUID
+
+from collaboration.domain.entities import CrdtSnapshot, CrdtUpdate
+from shared.exceptions import ConflictError
+
+
+def _seq(item: CrdtUpdate | CrdtSnapshot) -> int:
+    return item.update_seq
+
+
+@dataclass
+class _DocumentLog:
+    # Both kept in update_seq order. Writers append; only a seq block reserved
+    # before another but saved after it has to be inserted further back.
+    updates: list[CrdtUpdate] = field(default_factory=list)
+    snapshots: list[CrdtSnapshot] = field(default_factory=list)
+    last_seq: int = 0
+
+
+class MemoryCrdtStorageRepository:
+    """CrdtStorageRepository held in process memory, for tests, benchmarks and throwaway nodes.
+
+    Nothing here awaits, so every method runs to completion on the event loop
+    without interleaving and needs no lock. Blobs are kept as given: there is
+    no codec or blob store, and nothing survives a restart.
+    """
+
+    def __init__(self):
+        self._documents: dict[UUID, _DocumentLog] = {}
+        self._ids = itertools.count(1)
+
+    def _log(self, document_id: UUID) -> _DocumentLog:
+        log = self._documents.get(document_id)
+        if log is None:
+            log = self._documents[document_id] = _DocumentLog()
+        return log
+
+    async def get_latest_snapshot(self, document_id: UUID) -> CrdtSnapshot | None:
+        log = self._documents.get(document_id)
+        return log.snapshots[-1] if log and log.snapshots else None
+
+    async def get_updates_since(self, document_id: UUID, since_seq: int) -> list[CrdtUpdate]:
+        log = self._documents.get(document_id)
+        if log is None:
+            return []
+        return log.updates[bisect_right(log.updates, since_seq, key=_seq):]
+
+    async def stream_updates_since(
+        self, document_id: UUID, since_seq: int, chunk_size: int
+    ) -> AsyncIterator[list[tuple[int, bytes]]]:
+        # Found again from the last seq each chunk, so pruning in between is harmless
+        while (log := self._documents.get(document_id)) is not None:
+            start = bisect_right(log.updates, since_seq, key=_seq)
+            chunk = log.updates[start:start + chunk_size]
+            if not chunk:
+                return
+            yield [(u.update_seq, u.update_data) for u in chunk]
+            since_seq = chunk[-1].update_seq
+
+    async def save_update(self, update: CrdtUpdate) -> CrdtUpdate:
+        return (await self.save_updates([update]))[0]
+
+    async def save_updates(self, updates: list[CrdtUpdate]) -> list[CrdtUpdate]:
+        # All or nothing, like the multi-row insert it stands in for
+        seen = set()
+        for u in updates:
+            key = (u.document_id, u.update_seq)
+            if key in seen or self._has_update(*key):
+                raise ConflictError(
+                    f"Update {u.update_seq} of document {u.document_id} already exists"
+                )
+            seen.add(key)
+        now = datetime.now(UTC)
+        saved = [replace(u, id=next(self._ids), created_at=now) for u in updates]
+        for u in saved:
+            log = self._log(u.document_id)
+            if not log.updates or log.updates[-1].update_seq < u.update_seq:
+                log.updates.append(u)
+            else:
+                insort(log.updates, u, key=_seq)
+        return saved
+
+    async def append_updates(
+        self, document_id: UUID, batch: list[tuple[UUID, bytes]]
+    ) -> list[CrdtUpdate]:
+        first_seq = await self.get_next_seq(document_id, len(batch))
+        return await self.save_updates([
+            CrdtUpdate(document_id, data, first_seq + i, user_id)
+            for i, (user_id, data) in enumerate(batch)
+        ])
+
+    async def save_snapshot(self, snapshot: CrdtSnapshot) -> CrdtSnapshot:
+        saved = replace(snapshot, id=next(self._ids), created_at=datetime.now(UTC))
+        insort(self._log(snapshot.document_id).snapshots, saved, key=_seq)
+        return saved
+
+    async def delete_updates_before(self, document_id: UUID, up_to_seq: int) -> None:
+        log = self._documents.get(document_id)
+        if log is not None:
+            del log.updates[:bisect_right(log.updates, up_to_seq, key=_seq)]
+
+    async def get_next_seq(self, document_id: UUID, count: int = 1) -> int:
+        log = self._log(document_id)
+        log.last_seq += count
+        return log.last_seq - count + 1
+
+    async def get_current_seq(self, document_id: UUID) -> int:
+        log = self._documents.get(document_id)
+        return log.last_seq if log else 0
+
+    def _has_update(self, document_id: UUID, seq: int) -> bool:
+        log = self._documents.get(document_id)
+        if log is None:
+            return False
+        i = bisect_left(log.updates, seq, key=_seq)
+        return i < len(log.updates) and log.updates[i].update_seq == seq
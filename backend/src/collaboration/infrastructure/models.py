@@ -1,18 +1,39 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import ForeignKey, Integer, LargeBinary, func
+from sqlalchemy import (
+    DDL,
+    CheckConstraint,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    UniqueConstraint,
+    event,
+    func,
+)
 from sqlalchemy.orm import Mapped, mapped_column
 
 from shared.infrastructure.database import Base
 
+UPDATE_PARTITIONS = 16  # hash partitions of document_updates by document_id
+
 
 class CrdtSnapshotModel(Base):
     __tablename__ = "document_snapshots"
+    __table_args__ = (
+        Index("ix_document_snapshots_document_seq", "document_id", "update_seq"),
+        CheckConstraint(
+            "(snapshot IS NULL) <> (snapshot_ref IS NULL)", name="ck_document_snapshots_one_source"
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
     document_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
-    snapshot: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    # Inline blob, or the blob store key of a large one; exactly one is set
+    snapshot: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    snapshot_ref: Mapped[str | None] = mapped_column(String(64), nullable=True)
     state_vector: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
     update_seq: Mapped[int] = mapped_column(Integer, nullable=False)
     created_at: Mapped[datetime] = mapped_column(server_default=func.now())
@@ -20,10 +41,39 @@ class CrdtSnapshotModel(Base):
 
 class CrdtUpdateModel(Base):
     __tablename__ = "document_updates"
+    __table_args__ = (
+        UniqueConstraint("document_id", "update_seq", name="uq_document_updates_document_seq"),
+        {"postgresql_partition_by": "HASH (document_id)"},
+    )
 
+    # The partition key has to be part of the primary key
     id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
-    document_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("documents.id", ondelete="CASCADE"), nullable=False)
+    document_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True
+    )
     update_data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
     update_seq: Mapped[int] = mapped_column(Integer, nullable=False)
     user_id: Mapped[uuid.UUID] = mapped_column(ForeignKey("users.id"), nullable=False)
     created_at: Mapped[datetime] = mapped_column(server_default=func.now())
+
+
+for _remainder in range(UPDATE_PARTITIONS):
+    event.listen(
+        CrdtUpdateModel.__table__,
+        "after_create",
+        DDL(
+            f"CREATE TABLE document_updates_p{_remainder} PARTITION OF document_updates "
+            f"FOR VALUES WITH (MODULUS {UPDATE_PARTITIONS}, REMAINDER {_remainder})"
+        ),
+    )
+
+
+class CrdtSeqCounterModel(Base):
+    """Last allocated update_seq per document, bumped atomically with UPDATE ... RETURNING."""
+
+    __tablename__ = "document_update_seqs"
+
+    document_id: Mapped[uuid.UUID] = mapped_column(
+        ForeignKey("documents.id", ondelete="CASCADE"), primary_key=True
+    )
+    last_seq: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -5,6 +5,8 @@ from uuid import UUID
 
 from redis.asyncio import Redis
 
+from shared.infrastructure.metrics import PUBLISH_SECONDS
+
 
 def _channel_name(document_id: UUID) -> str:
     return f"doc:{document_id}:updates"
@@ -14,6 +16,17 @@ async def publish_update(redis: Redis, document_id: UUID, data: bytes) -> None:
     await redis.publish(_channel_name(document_id), data)
 
 
+async def publish_updates(redis: Redis, document_id: UUID, messages: list[bytes]) -> int:
+    """Publish several messages in one round trip, preserving their order.
+
+    Returns the fewest subscribers any of them reached.
+    """
+    async with redis.pipeline(transaction=False) as pipe:
+        for data in messages:
+            pipe.publish(_channel_name(document_id), data)
+        return min(await pipe.execute(), default=0)
+
+
 async def subscribe(
     redis: Redis,
     document_id: UUID,
@@ -35,3 +48,21 @@ async def subscribe(
             await pubsub.aclose()
 
     return asyncio.create_task(_listen())
+
+
+class RedisPubSubTransport:
+    """Fire-and-forget replication: a node that is disconnected misses what is sent meanwhile."""
+
+    local = False
+
+    def __init__(self, redis: Redis):
+        self._redis = redis
+
+    async def publish(self, document_id: UUID, messages: list[bytes]) -> int:
+        with PUBLISH_SECONDS.labels("pubsub").time():
+            return await publish_updates(self._redis, document_id, messages)
+
+    async def subscribe(
+        self, document_id: UUID, callback: Callable[[bytes], Coroutine[Any, Any, None]]
+    ) -> asyncio.Task:
+        return await subscribe(self._redis, document_id, callback)
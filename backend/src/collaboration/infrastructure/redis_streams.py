@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from collections.abc import Callable, Coroutine
+from typing import Any
+from uuid import UUID
+
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError, TimeoutError
+
+from shared.infrastructure.metrics import PUBLISH_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_FIELD = b"m"
+_BLOCK_MS = 5_000
+_READ_COUNT = 500
+# Streams of documents nobody edits any more go away on their own
+_STREAM_TTL_SECONDS = 24 * 60 * 60
+_RETRY_MIN_SECONDS = 0.1
+_RETRY_MAX_SECONDS = 5.0
+
+
+def _stream_key(document_id: UUID) -> str:
+    return f"doc:{document_id}:stream"
+
+
+class RedisStreamTransport:
+    """Replication over one capped Redis stream per document.
+
+    Each subscriber remembers the last entry ID it has seen and reads on from
+    there, so after a dropped connection it picks up what it missed instead of
+    losing it. Streams are trimmed to roughly ``maxlen`` entries; a node gone
+    for longer than that still sees a seq gap and recovers from storage.
+    """
+
+    local = False
+
+    def __init__(self, redis: Redis, maxlen: int):
+        self.maxlen = maxlen
+        self._redis = redis
+
+    async def publish(self, document_id: UUID, messages: list[bytes]) -> None:
+        # Entries wait in the stream for whoever reads it, so there is no receiver count
+        key = _stream_key(document_id)
+        with PUBLISH_SECONDS.labels("streams").time():
+            async with self._redis.pipeline(transaction=False) as pipe:
+                for data in messages:
+                    pipe.xadd(key, {_FIELD: data}, maxlen=self.maxlen, approximate=True)
+                pipe.expire(key, _STREAM_TTL_SECONDS)
+                await pipe.execute()
+
+    async def subscribe(
+        self, document_id: UUID, callback: Callable[[bytes], Coroutine[Any, Any, None]]
+    ) -> asyncio.Task:
+        """Deliver entries added from now on. Cancel the returned task to unsubscribe."""
+        key = _stream_key(document_id)
+        latest = await self._redis.xrevrange(key, count=1)
+        last_id = latest[0][0] if latest else b"0-0"
+
+        async def _listen():
+            nonlocal last_id
+            retry = _RETRY_MIN_SECONDS
+            while True:
+                try:
+                    response = await self._redis.xread(
+                        {key: last_id}, count=_READ_COUNT, block=_BLOCK_MS
+                    )
+                except (ConnectionError, TimeoutError):
+                    logger.warning("Lost Redis reading %s, resuming after %s", key, last_id)
+                    await asyncio.sleep(retry)
+                    retry = min(retry * 2, _RETRY_MAX_SECONDS)
+                    continue
+                retry = _RETRY_MIN_SECONDS
+                for _, entries in response:
+                    for entry_id, fields in entries:
+                        last_id = entry_id
+                        try:
+                            await callback(fields[_FIELD])
+                        except Exception:
+                            logger.exception("Handling %s entry %s failed", key, entry_id)
+
+        return asyncio.create_task(_listen())
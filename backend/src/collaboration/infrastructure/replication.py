@@ -0,0 +1,38 @@
+import asyncio
+from collections.abc import Callable, Coroutine
+from typing import Any, Protocol
+from uuid import UUID
+
+from redis.asyncio import Redis
+
+from collaboration.infrastructure.local_transport import LocalTransport
+from collaboration.infrastructure.redis_pubsub import RedisPubSubTransport
+from collaboration.infrastructure.redis_streams import RedisStreamTransport
+
+MessageCallback = Callable[[bytes], Coroutine[Any, Any, None]]
+
+
+class ReplicationTransport(Protocol):
+    """Carries encoded envelopes between the nodes serving a document."""
+
+    # True if messages stay in this process and are delivered as published, so
+    # they may be envelope objects rather than encoded bytes
+    local: bool
+
+    async def publish(self, document_id: UUID, messages: list[bytes]) -> int | None:
+        """Send messages in order; returns how many subscribers got them, None if unknown."""
+        ...
+
+    async def subscribe(self, document_id: UUID, callback: MessageCallback) -> asyncio.Task:
+        """Deliver the document's messages to callback until the returned task is cancelled."""
+        ...
+
+
+def create_transport(name: str, redis: Redis, stream_maxlen: int) -> ReplicationTransport:
+    if name == "local":
+        return LocalTransport()
+    if name == "pubsub":
+        return RedisPubSubTransport(redis)
+    if name == "streams":
+        return RedisStreamTransport(redis, maxlen=stream_maxlen)
+    raise ValueError(f"Unknown replication transport: {name}")
@@ -0,0 +1,273 @@
+import asyncio
+import sqlite3
+from collections.abc import AsyncIterator, Callable
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import TypeVar
+from uuid import UUID
+
+from collaboration.domain.entities import CrdtSnapshot, CrdtUpdate
+from collaboration.infrastructure.blob_store import BlobStore
+from collaboration.infrastructure.crdt_executor import CrdtExecutor, default_executor
+from collaboration.infrastructure.crdt_storage_repository import (
+    decode_blobs,
+    default_blob_store,
+    default_codec,
+    encode_blobs,
+)
+from collaboration.infrastructure.storage_codec import StorageCodec
+from shared.config import settings
+from shared.exceptions import ConflictError
+
+T = TypeVar("T")
+
+# The PostgreSQL tables, minus partitioning and the foreign keys into users and documents
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS document_updates (
+    id INTEGER PRIMARY KEY,
+    document_id BLOB NOT NULL,
+    update_data BLOB NOT NULL,
+    update_seq INTEGER NOT NULL,
+    user_id BLOB NOT NULL,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (document_id, update_seq)
+);
+CREATE TABLE IF NOT EXISTS document_snapshots (
+    id INTEGER PRIMARY KEY,
+    document_id BLOB NOT NULL,
+    snapshot BLOB,
+    snapshot_ref TEXT,
+    state_vector BLOB NOT NULL,
+    update_seq INTEGER NOT NULL,
+    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CHECK ((snapshot IS NULL) <> (snapshot_ref IS NULL))
+);
+CREATE INDEX IF NOT EXISTS ix_document_snapshots_document_seq
+    ON document_snapshots (document_id, update_seq);
+CREATE TABLE IF NOT EXISTS document_update_seqs (
+    document_id BLOB PRIMARY KEY,
+    last_seq INTEGER NOT NULL
+);
+"""
+
+_RESERVE_SEQS = (
+    "INSERT INTO document_update_seqs (document_id, last_seq) VALUES (?, ?)"
+    " ON CONFLICT (document_id) DO UPDATE SET last_seq = last_seq + excluded.last_seq"
+    " RETURNING last_seq"
+)
+_INSERT_UPDATE = (
+    "INSERT INTO document_updates (document_id, update_data, update_seq, user_id)"
+    " VALUES (?, ?, ?, ?) RETURNING id, created_at"
+)
+
+
+class SqliteCrdtStorageRepository:
+    """CrdtStorageRepository on a SQLite file in WAL mode, for a single node.
+
+    Only the update log and snapshots move here; users and documents stay in
+    PostgreSQL. One connection on one worker thread runs every statement, so they are
+    serialised without locks and never block the event loop. Blobs go
+    through the same codec and blob store as on PostgreSQL. Unlike
+    DbCrdtStorageRepository it is long-lived: share one per file.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        codec: StorageCodec = default_codec,
+        blob_store: BlobStore | None = default_blob_store,
+        blob_threshold: int = settings.SNAPSHOT_BLOB_THRESHOLD,
+        executor: CrdtExecutor = default_executor,
+    ):
+        self.path = path
+        self.codec = codec
+        self.blob_store = blob_store
+        self.blob_threshold = blob_threshold
+        self.executor = executor
+        self._worker = ThreadPoolExecutor(1, thread_name_prefix="sqlite")
+        self._conn: sqlite3.Connection | None = None
+
+    async def get_latest_snapshot(self, document_id: UUID) -> CrdtSnapshot | None:
+        row = await self._run(
+            self._fetch_one,
+            "SELECT id, snapshot, snapshot_ref, state_vector, update_seq, created_at"
+            " FROM document_snapshots WHERE document_id = ? ORDER BY update_seq DESC LIMIT 1",
+            (document_id.bytes,),
+        )
+        if row is None:
+            return None
+        id_, inline, ref, state_vector, seq, created_at = row
+        if ref is None:
+            (snapshot,) = await decode_blobs(self.codec, self.executor, [inline])
+        elif self.blob_store is None:
+            raise ValueError(f"Snapshot {id_} is in the blob store, but no blob store is configured")
+        else:
+            snapshot = await self.blob_store.get(ref)
+        return CrdtSnapshot(
+            document_id, snapshot, state_vector, seq, id=id_, created_at=_timestamp(created_at)
+        )
+
+    async def get_updates_since(self, document_id: UUID, since_seq: int) -> list[CrdtUpdate]:
+        rows = await self._run(
+            self._fetch_all,
+            "SELECT id, update_data, update_seq, user_id, created_at FROM document_updates"
+            " WHERE document_id = ? AND update_seq > ? ORDER BY update_seq",
+            (document_id.bytes, since_seq),
+        )
+        decoded = await decode_blobs(self.codec, self.executor, [row[1] for row in rows])
+        return [
+            CrdtUpdate(
+                document_id, data, seq, UUID(bytes=user_id),
+                id=id_, created_at=_timestamp(created_at),
+            )
+            for (id_, _, seq, user_id, created_at), data in zip(rows, decoded)
+        ]
+
+    async def stream_updates_since(
+        self, document_id: UUID, since_seq: int, chunk_size: int
+    ) -> AsyncIterator[list[tuple[int, bytes]]]:
+        # One short query per chunk, resuming after the last seq, so writes can run in between
+        while True:
+            rows = await self._run(
+                self._fetch_all,
+                "SELECT update_seq, update_data FROM document_updates"
+                " WHERE document_id = ? AND update_seq > ? ORDER BY update_seq LIMIT ?",
+                (document_id.bytes, since_seq, chunk_size),
+            )
+            if not rows:
+                return
+            decoded = await decode_blobs(self.codec, self.executor, [row[1] for row in rows])
+            yield [(row[0], data) for row, data in zip(rows, decoded)]
+            since_seq = rows[-1][0]
+
+    async def save_update(self, update: CrdtUpdate) -> CrdtUpdate:
+        return (await self.save_updates([update]))[0]
+
+    async def save_updates(self, updates: list[CrdtUpdate]) -> list[CrdtUpdate]:
+        if not updates:
+            return []
+        encoded = await encode_blobs(self.codec, self.executor, [u.update_data for u in updates])
+        rows = [
+            (u.document_id.bytes, data, u.update_seq, u.user_id.bytes)
+            for u, data in zip(updates, encoded)
+        ]
+        try:
+            saved = await self._run(self._insert_updates, rows)
+        except sqlite3.IntegrityError as exc:
+            raise ConflictError(f"Update seq already exists: {exc}") from exc
+        return [
+            CrdtUpdate(
+                u.document_id, u.update_data, u.update_seq, u.user_id,
+                id=id_, created_at=_timestamp(created_at),
+            )
+            for u, (id_, created_at) in zip(updates, saved)
+        ]
+
+    async def append_updates(
+        self, document_id: UUID, batch: list[tuple[UUID, bytes]]
+    ) -> list[CrdtUpdate]:
+        if not batch:
+            return []
+        # Reserving in a separate commit would let get_current_seq, and so a snapshot,
+        # cover seqs whose rows are still being encoded
+        encoded = await encode_blobs(self.codec, self.executor, [data for _, data in batch])
+        rows = [(data, user_id.bytes) for (user_id, _), data in zip(batch, encoded)]
+        try:
+            first_seq, saved = await self._run(self._append_updates, document_id.bytes, rows)
+        except sqlite3.IntegrityError as exc:
+            raise ConflictError(f"Update seq already exists: {exc}") from exc
+        return [
+            CrdtUpdate(
+                document_id, data, first_seq + i, user_id,
+                id=id_, created_at=_timestamp(created_at),
+            )
+            for i, ((user_id, data), (id_, created_at)) in enumerate(zip(batch, saved))
+        ]
+
+    async def save_snapshot(self, snapshot: CrdtSnapshot) -> CrdtSnapshot:
+        if self.blob_store is not None and len(snapshot.snapshot) >= self.blob_threshold:
+            inline, ref = None, await self.blob_store.put(snapshot.snapshot)
+        else:
+            (inline,) = await encode_blobs(self.codec, self.executor, [snapshot.snapshot])
+            ref = None
+        id_, created_at = await self._run(
+            self._write_one,
+            "INSERT INTO document_snapshots (document_id, snapshot, snapshot_ref, state_vector,"
+            " update_seq) VALUES (?, ?, ?, ?, ?) RETURNING id, created_at",
+            (snapshot.document_id.bytes, inline, ref, snapshot.state_vector, snapshot.update_seq),
+        )
+        return CrdtSnapshot(
+            snapshot.document_id, snapshot.snapshot, snapshot.state_vector, snapshot.update_seq,
+            id=id_, created_at=_timestamp(created_at),
+        )
+
+    async def delete_updates_before(self, document_id: UUID, up_to_seq: int) -> None:
+        await self._run(
+            self._write_one,
+            "DELETE FROM document_updates WHERE document_id = ? AND update_seq <= ?",
+            (document_id.bytes, up_to_seq),
+        )
+
+    async def get_next_seq(self, document_id: UUID, count: int = 1) -> int:
+        (last_seq,) = await self._run(self._write_one, _RESERVE_SEQS, (document_id.bytes, count))
+        return last_seq - count + 1
+
+    async def get_current_seq(self, document_id: UUID) -> int:
+        row = await self._run(
+            self._fetch_one,
+            "SELECT last_seq FROM document_update_seqs WHERE document_id = ?",
+            (document_id.bytes,),
+        )
+        return row[0] if row else 0
+
+    def close(self) -> None:
+        """Close the connection, waiting for statements already queued."""
+        if self._conn is not None:
+            self._worker.submit(self._conn.close).result()
+            self._conn = None
+        self._worker.shutdown()
+
+    async def _run(self, fn: Callable[..., T], *args) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._worker, fn, *args)
+
+    # Everything below runs on the worker thread
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Durable at each checkpoint rather than each commit; WAL keeps the file consistent
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _fetch_one(self, sql: str, params: tuple) -> tuple | None:
+        return self._connection().execute(sql, params).fetchone()
+
+    def _fetch_all(self, sql: str, params: tuple) -> list[tuple]:
+        return self._connection().execute(sql, params).fetchall()
+
+    def _write_one(self, sql: str, params: tuple) -> tuple | None:
+        conn = self._connection()
+        with conn:
+            return conn.execute(sql, params).fetchone()
+
+    def _insert_updates(self, rows: list[tuple]) -> list[tuple]:
+        conn = self._connection()
+        with conn:
+            return [conn.execute(_INSERT_UPDATE, row).fetchone() for row in rows]
+
+    def _append_updates(self, document_id: bytes, rows: list[tuple]) -> tuple[int, list[tuple]]:
+        conn = self._connection()
+        with conn:
+            (last_seq,) = conn.execute(_RESERVE_SEQS, (document_id, len(rows))).fetchone()
+            first_seq = last_seq - len(rows) + 1
+            return first_seq, [
+                conn.execute(_INSERT_UPDATE, (document_id, data, first_seq + i, user_id)).fetchone()
+                for i, (data, user_id) in enumerate(rows)
+            ]
+
+
+def _timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value)
@@ -0,0 +1,38 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from collaboration.domain.repository import CrdtStorageRepository
+from collaboration.infrastructure.crdt_storage_repository import DbCrdtStorageRepository
+from collaboration.infrastructure.memory_storage_repository import MemoryCrdtStorageRepository
+from collaboration.infrastructure.sqlite_storage_repository import SqliteCrdtStorageRepository
+from shared.config import settings
+from shared.infrastructure.database import async_session
+
+
+def create_repository(name: str, sqlite_path: str) -> CrdtStorageRepository | None:
+    """The process-wide repository for a storage backend; None for PostgreSQL, opened per session."""
+    if name == "postgres":
+        return None
+    if name == "sqlite":
+        return SqliteCrdtStorageRepository(sqlite_path)
+    if name == "memory":
+        return MemoryCrdtStorageRepository()
+    raise ValueError(f"Unknown CRDT storage: {name}")
+
+
+_shared = create_repository(settings.CRDT_STORAGE, settings.CRDT_SQLITE_PATH)
+
+
+@asynccontextmanager
+async def crdt_repository() -> AsyncIterator[CrdtStorageRepository]:
+    """The configured CRDT storage, for the length of one unit of work."""
+    if _shared is not None:
+        yield _shared
+        return
+    async with async_session() as db:
+        yield DbCrdtStorageRepository(db)
+
+
+def close_repository() -> None:
+    if isinstance(_shared, SqliteCrdtStorageRepository):
+        _shared.close()
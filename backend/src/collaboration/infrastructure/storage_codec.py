@@ -0,0 +1,103 @@
+import threading
+from collections.abc import Sequence
+from pathlib import Path
+
+import zstandard
+
+# Stored blobs start with MAGIC + version + codec. Anything else is a raw Yjs
+# update from before the codec existed: a v1 update only begins with 0xFE "YC"
+# if it carries changes from exactly 11518 clients.
+MAGIC = b"\xfeYC"
+FORMAT_VERSION = 1
+
+RAW = 0
+ZSTD = 1
+
+_HEADER_SIZE = len(MAGIC) + 2
+# Without a dictionary, the frame overhead eats the savings below this
+MIN_COMPRESS_SIZE = 64
+
+
+class StorageCodec:
+    """Encodes CRDT blobs for storage: a small versioned header, then zstd.
+
+    An optional trained dictionary makes small updates compress too; frames
+    record the id of the dictionary they were written with, so blobs written
+    without one, or with an older one that is still loaded, stay readable.
+    Blobs without a header are returned as is.
+    """
+
+    def __init__(self, level: int = 3, dictionaries: Sequence[bytes] = ()):
+        self.level = level
+        self._dicts = {}
+        for data in dictionaries:
+            d = zstandard.ZstdCompressionDict(data)
+            self._dicts[d.dict_id()] = d
+        # The first dictionary is the one new blobs are written with
+        self._write_dict = zstandard.ZstdCompressionDict(dictionaries[0]) if dictionaries else None
+        self._local = threading.local()  # zstd contexts must not be shared between threads
+
+    def encode(self, data: bytes) -> bytes:
+        if len(data) < MIN_COMPRESS_SIZE and self._write_dict is None:
+            return self._header(RAW) + data
+        compressed = self._compressor().compress(data)
+        if len(compressed) >= len(data):
+            return self._header(RAW) + data
+        return self._header(ZSTD) + compressed
+
+    def decode(self, blob: bytes) -> bytes:
+        if len(blob) < _HEADER_SIZE or blob[: len(MAGIC)] != MAGIC:
+            return bytes(blob)
+        version, codec = blob[len(MAGIC)], blob[len(MAGIC) + 1]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported storage format version: {version}")
+        body = blob[_HEADER_SIZE:]
+        if codec == RAW:
+            return bytes(body)
+        if codec == ZSTD:
+            return self._decompressor(zstandard.get_frame_parameters(body).dict_id).decompress(body)
+        raise ValueError(f"Unknown storage codec: {codec}")
+
+    def decoded_size(self, blob: bytes) -> int:
+        """What decode will return, in bytes, read from the frame header; len(blob) if unknown."""
+        if len(blob) < _HEADER_SIZE or blob[: len(MAGIC)] != MAGIC or blob[len(MAGIC) + 1] != ZSTD:
+            return len(blob)
+        try:
+            size = zstandard.get_frame_parameters(blob[_HEADER_SIZE:]).content_size
+        except zstandard.ZstdError:
+            return len(blob)
+        return size if size != zstandard.CONTENTSIZE_UNKNOWN else len(blob)
+
+    def _header(self, codec: int) -> bytes:
+        return MAGIC + bytes((FORMAT_VERSION, codec))
+
+    def _compressor(self) -> zstandard.ZstdCompressor:
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(
+                level=self.level, dict_data=self._write_dict
+            )
+        return compressor
+
+    def _decompressor(self, dict_id: int) -> zstandard.ZstdDecompressor:
+        cache = getattr(self._local, "decompressors", None)
+        if cache is None:
+            cache = self._local.decompressors = {}
+        decompressor = cache.get(dict_id)
+        if decompressor is None:
+            if dict_id and dict_id not in self._dicts:
+                raise ValueError(f"Blob needs zstd dictionary {dict_id}, which is not loaded")
+            decompressor = cache[dict_id] = zstandard.ZstdDecompressor(
+                dict_data=self._dicts.get(dict_id)
+            )
+        return decompressor
+
+
+def train_dictionary(samples: list[bytes], size: int = 16 * 1024) -> bytes:
+    """Train a zstd dictionary from sample updates, e.g. a recent slice of document_updates."""
+    return zstandard.train_dictionary(size, samples).as_bytes()
+
+
+def load_dictionaries(paths: str) -> list[bytes]:
+    """Read dictionaries from a comma-separated list of files, newest first."""
+    return [Path(p.strip()).read_bytes() for p in paths.split(",") if p.strip()]
@@ -0,0 +1,221 @@
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import replace
+from typing import Protocol
+from uuid import UUID, uuid4
+
+from collaboration.infrastructure.envelope import (
+    AwarenessEnvelope,
+    Envelope,
+    RelayEnvelope,
+    UpdateEnvelope,
+    decode_envelope,
+    encode_envelope,
+)
+from collaboration.infrastructure.replication import ReplicationTransport
+from shared.infrastructure.metrics import FANOUT_SECONDS, REPLICATION_MESSAGE_FAILURES
+from shared.infrastructure.tracing import TraceContext
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber(Protocol):
+    async def send_update(self, update: bytes, trace: TraceContext | None = None) -> None: ...
+
+    async def send_awareness(self, update: bytes) -> None: ...
+
+
+RemoteHandler = Callable[[UUID, UpdateEnvelope], Awaitable[None]]
+RemoteAwarenessHandler = Callable[[UUID, bytes], Awaitable[None]]
+RelayHandler = Callable[[RelayEnvelope], Awaitable[None]]
+
+
+def _handed_over(envelope: Envelope) -> Envelope:
+    """An envelope passed in process as decode_envelope would have returned it."""
+    if isinstance(envelope, UpdateEnvelope) and envelope.trace is not None:
+        return replace(envelope, trace=replace(envelope.trace, remote=True))
+    return envelope
+
+
+class SubscriptionHub:
+    """Shares one replication subscription per document between every local socket.
+
+    Local updates are fanned out to the other local sockets directly, and
+    published to the other nodes once they are persisted, wrapped in an envelope tagged
+    with this process's node id. Envelopes carrying our own node id are dropped
+    on the way back in, as are the sockets' share of those the owner persisted for
+    us, so every socket sees each update exactly once and never its own. A message
+    whose handling fails is logged and skipped; the subscription carries on. Awareness updates take the same path, minus the persistence.
+    Over a local transport envelopes are passed as objects, never encoded.
+    Joins and leaves are serialised per document, so a slow subscribe holds up
+    only the sockets waiting on that document.
+    """
+
+    def __init__(
+        self,
+        transport: ReplicationTransport,
+        on_remote: RemoteHandler | None = None,
+        on_remote_awareness: RemoteAwarenessHandler | None = None,
+        on_relay: RelayHandler | None = None,
+    ):
+        self.node_id = uuid4()
+        self._transport = transport
+        if transport.local:
+            self._encode, self._decode = lambda envelope: envelope, _handed_over
+        else:
+            self._encode, self._decode = encode_envelope, decode_envelope
+        self._on_remote = on_remote
+        self._on_remote_awareness = on_remote_awareness
+        self._on_relay = on_relay
+        self._inbox: asyncio.Task | None = None
+        self._subscribers: dict[UUID, set[Subscriber]] = {}
+        self._tasks: dict[UUID, asyncio.Task] = {}
+        self._locks: dict[UUID, tuple[asyncio.Lock, int]] = {}
+
+    def subscriber_count(self, document_id: UUID) -> int:
+        return len(self._subscribers.get(document_id, ()))
+
+    async def join(self, document_id: UUID, subscriber: Subscriber) -> None:
+        async with self._document_lock(document_id):
+            # Registered only once subscribed, so a failed subscribe leaves nothing behind
+            if document_id not in self._tasks:
+                self._tasks[document_id] = await self._transport.subscribe(
+                    document_id, lambda data: self._on_message(document_id, data)
+                )
+            self._subscribers.setdefault(document_id, set()).add(subscriber)
+
+    async def leave(self, document_id: UUID, subscriber: Subscriber) -> None:
+        """Remove a socket; the subscription goes with the last one."""
+        async with self._document_lock(document_id):
+            subscribers = self._subscribers.get(document_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscriber)
+            if subscribers:
+                return
+            del self._subscribers[document_id]
+            task = self._tasks.pop(document_id)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def fan_out(
+        self,
+        document_id: UUID,
+        update: bytes,
+        exclude: Subscriber | None = None,
+        trace: TraceContext | None = None,
+    ) -> None:
+        """Send an update to the local sockets on a document."""
+        with FANOUT_SECONDS.time():
+            for subscriber in list(self._subscribers.get(document_id, ())):
+                if subscriber is exclude:
+                    continue
+                try:
+                    await subscriber.send_update(update, trace)
+                except Exception:
+                    pass
+
+    async def fan_out_awareness(
+        self, document_id: UUID, update: bytes, exclude: Subscriber | None = None
+    ) -> None:
+        """Send an awareness update to the local sockets on a document."""
+        for subscriber in list(self._subscribers.get(document_id, ())):
+            if subscriber is exclude:
+                continue
+            try:
+                await subscriber.send_awareness(update)
+            except Exception:
+                pass
+
+    async def publish(self, document_id: UUID, envelopes: list[UpdateEnvelope]) -> None:
+        """Publish persisted updates to the other nodes."""
+        if envelopes:
+            await self._transport.publish(document_id, [self._encode(e) for e in envelopes])
+
+    async def publish_awareness(self, document_id: UUID, update: bytes) -> None:
+        """Publish an awareness update to the other nodes."""
+        await self._transport.publish(
+            document_id, [self._encode(AwarenessEnvelope(self.node_id, update))]
+        )
+
+    async def open_inbox(self) -> None:
+        """Start taking updates other nodes relay to this one.
+
+        The inbox is an ordinary transport topic, keyed by this node's id
+        instead of a document id.
+        """
+        self._inbox = await self._transport.subscribe(self.node_id, self._on_inbox_message)
+
+    async def close_inbox(self) -> None:
+        if self._inbox is not None:
+            self._inbox.cancel()
+            await asyncio.gather(self._inbox, return_exceptions=True)
+            self._inbox = None
+
+    async def relay(self, owner: UUID, envelopes: list[RelayEnvelope]) -> bool:
+        """Send updates to the inbox of the node that owns their document.
+
+        Returns False if the transport saw nobody on the inbox, e.g. the owner
+        died before its lease expired; the caller still holds the updates.
+        """
+        if not envelopes:
+            return True
+        return await self._transport.publish(owner, [self._encode(e) for e in envelopes]) != 0
+
+    async def _on_inbox_message(self, message: bytes) -> None:
+        try:
+            envelope = self._decode(message)
+        except ValueError:
+            return
+        if isinstance(envelope, RelayEnvelope) and self._on_relay is not None:
+            try:
+                await self._on_relay(envelope)
+            except Exception:
+                REPLICATION_MESSAGE_FAILURES.inc()
+                logger.exception("Handling a relay for document %s failed", envelope.document_id)
+
+    async def _on_message(self, document_id: UUID, message: bytes) -> None:
+        try:
+            envelope = self._decode(message)
+        except ValueError:
+            return
+        # An exception here would end the transport's listener, and the document's
+        # subscription with it, until every local socket has left
+        try:
+            await self._dispatch(document_id, envelope)
+        except Exception:
+            REPLICATION_MESSAGE_FAILURES.inc()
+            logger.exception("Handling a message for document %s failed", document_id)
+
+    async def _dispatch(self, document_id: UUID, envelope: Envelope) -> None:
+        if envelope.origin_node == self.node_id:
+            return
+        if isinstance(envelope, AwarenessEnvelope):
+            if self._on_remote_awareness is not None:
+                await self._on_remote_awareness(document_id, envelope.payload)
+            await self.fan_out_awareness(document_id, envelope.payload)
+            return
+        if self._on_remote is not None:
+            await self._on_remote(document_id, envelope)
+        # Relayed from here: the local sockets got these updates when they arrived
+        if envelope.relayed_by != self.node_id:
+            await self.fan_out(document_id, envelope.payload, trace=envelope.trace)
+
+    @asynccontextmanager
+    async def _document_lock(self, document_id: UUID) -> AsyncIterator[None]:
+        lock, users = self._locks.get(document_id, (asyncio.Lock(), 0))
+        self._locks[document_id] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[document_id]
+            if users == 1:
+                del self._locks[document_id]
+            else:
+                self._locks[document_id] = (lock, users - 1)
@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+
+from pycrdt import (
+    Decoder,
+    Doc,
+    Encoder,
+    YMessageType,
+    YSyncMessageType,
+    create_sync_message,
+    create_update_message,
+    write_message,
+)
+
+# What a Yjs client sends when it has nothing to add
+EMPTY_UPDATE = b"\x00\x00"
+
+
+@dataclass(frozen=True)
+class SyncMessage:
+    """A decoded y-protocols sync message: a state vector for SYNC_STEP1, an update otherwise."""
+
+    kind: YSyncMessageType
+    payload: bytes
+
+
+@dataclass(frozen=True)
+class AwarenessEntry:
+    """One client's presence. ``state`` is the client's JSON, kept opaque; "null" once it has left."""
+
+    client_id: int
+    clock: int
+    state: str
+
+    @property
+    def removed(self) -> bool:
+        return self.state == "null"
+
+
+def sync_step1(doc: Doc) -> bytes:
+    """Ask the peer for everything missing from doc."""
+    return create_sync_message(doc)
+
+
+def sync_step2(doc: Doc, state_vector: bytes) -> bytes:
+    """Answer a SYNC_STEP1 with only the changes its state vector has not seen."""
+    header = bytes((YMessageType.SYNC, YSyncMessageType.SYNC_STEP2))
+    return header + write_message(doc.get_update(state_vector))
+
+
+def update_message(update: bytes) -> bytes:
+    return create_update_message(update)
+
+
+def encode_awareness_update(entries: list[AwarenessEntry]) -> bytes:
+    encoder = Encoder()
+    encoder.write_var_uint(len(entries))
+    for entry in entries:
+        encoder.write_var_uint(entry.client_id)
+        encoder.write_var_uint(entry.clock)
+        encoder.write_var_string(entry.state)
+    return encoder.to_bytes()
+
+
+def decode_awareness_update(update: bytes) -> list[AwarenessEntry]:
+    decoder = Decoder(update)
+    try:
+        entries = [
+            AwarenessEntry(decoder.read_var_uint(), decoder.read_var_uint(), decoder.read_var_string())
+            for _ in range(decoder.read_var_uint())
+        ]
+    except (IndexError, RuntimeError, UnicodeDecodeError) as e:
+        raise ValueError("Malformed awareness update") from e
+    if decoder.length != 0:
+        raise ValueError("Malformed awareness update")
+    return entries
+
+
+def awareness_message(update: bytes) -> bytes:
+    return bytes((YMessageType.AWARENESS,)) + write_message(update)
+
+
+def decode_message(data: bytes) -> SyncMessage | list[AwarenessEntry] | None:
+    """Decode a sync or awareness message. Returns None for other y-protocols message types."""
+    if len(data) < 2:
+        raise ValueError("Truncated y-protocols message")
+    if data[0] == YMessageType.AWARENESS:
+        return decode_awareness_update(_read_payload(data[1:]))
+    if data[0] != YMessageType.SYNC:
+        return None
+    try:
+        kind = YSyncMessageType(data[1])
+    except ValueError as e:
+        raise ValueError("Unknown y-protocols sync message type") from e
+    return SyncMessage(kind, _read_payload(data[2:]))
+
+
+def _read_payload(data: bytes) -> bytes:
+    try:
+        decoder = Decoder(data)
+        payload = decoder.read_message()
+    except (IndexError, RuntimeError) as e:
+        raise ValueError("Malformed y-protocols message") from e
+    # Exactly one length-prefixed payload, neither truncated nor followed by junk
+    if payload is None or decoder.length != 0:
+        raise ValueError("Malformed y-protocols message")
+    return payload
@@ -1,3 +1,4 @@
+import pycrdt
 from pycrdt import Doc, Text
 
 
@@ -24,8 +25,11 @@ def get_text(doc: Doc) -> str:
 
 
 def merge_updates(updates: list[bytes]) -> bytes:
-    """Apply multiple updates to a fresh doc and return the merged state."""
-    doc = create_doc()
-    for update in updates:
-        doc.apply_update(update)
-    return doc.get_update()
+    """Merge update blobs into one without integrating them into a doc."""
+    if not updates:
+        return encode_state_as_update(create_doc())
+    return pycrdt.merge_updates(*updates)
+
+
+def encode_state_vector_from_update(update: bytes) -> bytes:
+    return pycrdt.get_state(update)
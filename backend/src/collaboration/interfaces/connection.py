@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from collaboration.infrastructure.sync_protocol import awareness_message, update_message
+from shared.infrastructure.metrics import WS_DROPPED_MESSAGES
+from shared.infrastructure.tracing import TraceContext, update_tracing
+
+logger = logging.getLogger(__name__)
+
+# A Yjs state vector with no clients in it: "I have nothing"
+EMPTY_STATE_VECTOR = b"\x00"
+
+SendFn = Callable[[bytes], Awaitable[None]]
+# Builds a message that brings a client holding the given state vector up to date
+ResyncFn = Callable[[bytes], Awaitable[bytes | None]]
+# Closes the socket, so its receive loop ends and the handler cleans up
+AbortFn = Callable[[], Awaitable[None]]
+
+_RESYNC = object()
+
+
+@dataclass
+class _Traced:
+    """A queued message carrying a sampled update, timed from queue to socket."""
+
+    message: bytes
+    trace: TraceContext
+    queued_ns: int
+
+
+@dataclass
+class ConnectionStats:
+    sent: int = 0
+    dropped: int = 0
+    overflows: int = 0
+    max_depth: int = 0
+
+
+class ClientConnection:
+    """One socket's outbound side: a bounded queue drained by its own writer task.
+
+    Enqueueing never waits, so a stalled client cannot hold up the hub or its
+    other sockets. When the queue overflows, everything pending is dropped and
+    replaced by a single resync, built when the writer gets to it from the
+    last state vector the client announced. If that resync cannot be built the
+    client can no longer be brought up to date, so the socket is aborted.
+    """
+
+    def __init__(
+        self, send: SendFn, max_queue: int, resync: ResyncFn, abort: AbortFn | None = None
+    ):
+        self.stats = ConnectionStats()
+        # Updated whenever the client sends a SyncStep1
+        self.state_vector = EMPTY_STATE_VECTOR
+        self._send = send
+        self._resync = resync
+        self._abort = abort
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._writer: asyncio.Task | None = None
+        self._closed = False
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        self._writer = asyncio.create_task(self._write())
+
+    async def close(self) -> None:
+        self._closed = True
+        if self._writer is not None:
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        if self.stats.dropped:
+            logger.info(
+                "Connection closed after dropping %d messages in %d overflows",
+                self.stats.dropped,
+                self.stats.overflows,
+            )
+
+    def send(self, message: bytes, trace: TraceContext | None = None) -> None:
+        if self._closed:
+            return
+        if trace is not None:
+            message = _Traced(message, trace, time.time_ns())
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self._overflow()
+        self.stats.max_depth = max(self.stats.max_depth, self._queue.qsize())
+
+    async def send_update(self, update: bytes, trace: TraceContext | None = None) -> None:
+        self.send(update_message(update), trace)
+
+    async def send_awareness(self, update: bytes) -> None:
+        self.send(awareness_message(update))
+
+    def _overflow(self) -> None:
+        self.stats.overflows += 1
+        dropped = 1  # the update that overflowed; the resync covers it
+        while not self._queue.empty():
+            if self._queue.get_nowait() is not _RESYNC:
+                dropped += 1
+        self.stats.dropped += dropped
+        WS_DROPPED_MESSAGES.inc(dropped)
+        self._queue.put_nowait(_RESYNC)
+
+    async def _write(self) -> None:
+        while True:
+            message = await self._queue.get()
+            traced = None
+            if isinstance(message, _Traced):
+                traced, message = message, message.message
+            try:
+                if message is _RESYNC:
+                    message = await self._resync(self.state_vector)
+                    if message is None:
+                        continue
+            except Exception:
+                logger.exception("Resync failed; closing the connection")
+                self._closed = True
+                if self._abort is not None:
+                    try:
+                        await self._abort()
+                    except Exception:
+                        pass
+                return
+            try:
+                await self._send(message)
+            except Exception:
+                # The receive loop notices the closed socket and cleans up
+                self._closed = True
+                return
+            self.stats.sent += 1
+            if traced is not None:
+                update_tracing.delivered(traced.trace, traced.queued_ns)
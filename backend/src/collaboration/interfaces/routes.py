@@ -0,0 +1,17 @@
+from uuid import UUID
+
+from fastapi import APIRouter, Depends
+
+from auth.domain.entities import User
+from collaboration.interfaces.schemas import DocumentOwnerResponse
+from collaboration.interfaces.ws_handler import document_owner
+from shared.dependencies import get_current_user
+
+router = APIRouter(prefix="/api/collaboration", tags=["collaboration"])
+
+
+# Where a client should open /ws/doc/{id}; node ids stay internal
+@router.get("/documents/{document_id}/owner", response_model=DocumentOwnerResponse)
+async def get_owner(document_id: UUID, _: User = Depends(get_current_user)):
+    _, address = await document_owner(document_id)
+    return DocumentOwnerResponse(document_id=document_id, address=address)
@@ -0,0 +1,8 @@
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class DocumentOwnerResponse(BaseModel):
+    document_id: UUID
+    address: str
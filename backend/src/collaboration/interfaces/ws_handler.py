@@ -1,21 +1,302 @@
-import asyncio
+import itertools
+import logging
+import time
 from uuid import UUID
 
 import jwt
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.websockets import WebSocketState
+from pycrdt import Doc, YSyncMessageType
 
-from collaboration.application.services import load_document_state, persist_update
-from collaboration.infrastructure.crdt_storage_repository import DbCrdtStorageRepository
-from collaboration.infrastructure.redis_pubsub import publish_update, subscribe
-from collaboration.infrastructure.yjs_adapter import encode_state_as_update
+from collaboration.application.awareness import AwarenessBroker
+from collaboration.application.catch_up import GapFiller
+from collaboration.application.coalescer import UpdateCoalescer
+from collaboration.application.compaction import CompactionScheduler
+from collaboration.application.doc_registry import DocRegistry, LiveDoc
+from collaboration.application.services import (
+    create_snapshot,
+    load_document,
+    load_missing,
+    persist_updates,
+)
+from collaboration.application.snapshot_policy import SnapshotPolicy
+from collaboration.application.write_behind import PendingUpdate, WriteBehindBuffer
+from collaboration.domain.entities import CrdtSnapshot, CrdtUpdate
+from collaboration.infrastructure.cluster import ClusterMembership
+from collaboration.infrastructure.crdt_executor import default_executor
+from collaboration.infrastructure.envelope import RelayEnvelope, UpdateEnvelope
+from collaboration.infrastructure.replication import create_transport
+from collaboration.infrastructure.storage import close_repository, crdt_repository
+from collaboration.infrastructure.subscription_hub import SubscriptionHub
+from collaboration.infrastructure.sync_protocol import (
+    EMPTY_UPDATE,
+    AwarenessEntry,
+    decode_awareness_update,
+    decode_message,
+    encode_awareness_update,
+    sync_step1,
+    sync_step2,
+)
+from collaboration.interfaces.connection import ClientConnection
 from shared.config import settings
-from shared.infrastructure.database import async_session
+from shared.infrastructure import metrics
 from shared.infrastructure.redis import get_redis_pool
+from shared.infrastructure.tracing import update_tracing
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-# In-memory set of connected websockets per document
-_connections: dict[UUID, set[WebSocket]] = {}
+# Live Y.Docs shared by every socket on this process
+_registry = DocRegistry(
+    max_bytes=settings.DOC_CACHE_MAX_BYTES,
+    max_docs=settings.DOC_CACHE_MAX_DOCS,
+)
+
+_connection_ids = itertools.count(1)
+
+
+async def _on_remote_update(document_id: UUID, envelope: UpdateEnvelope) -> None:
+    live = _registry.get(document_id)
+    if live is None:
+        return
+    received = time.time_ns()
+    # Also applied if relayed from here: a no-op unless the doc was reloaded since
+    await _registry.apply_update(document_id, envelope.payload)
+    metrics.UPDATES_RECEIVED.labels("remote").inc()
+    _snapshot_policy.observe(
+        document_id, len(envelope.payload), envelope.last_seq - envelope.first_seq + 1
+    )
+    live.mark_applied(envelope.first_seq, envelope.last_seq)
+    if envelope.trace is not None:
+        update_tracing.stage(
+            envelope.trace, "update.remote_receive", received, last_seq=envelope.last_seq
+        )
+    _gap_filler.check(document_id)
+
+
+async def _on_relay(envelope: RelayEnvelope) -> None:
+    """Take an update from a node that does not own the document."""
+    document_id = envelope.document_id
+    _relayed_here.add(document_id)
+    await _registry.apply_update(document_id, envelope.payload)
+    metrics.UPDATES_RECEIVED.labels("relay").inc()
+    await _coalescer.add(document_id, envelope.payload)
+    await _write_buffer.enqueue(
+        document_id,
+        envelope.user_id,
+        envelope.payload,
+        envelope.origin_connection,
+        relayed_by=envelope.origin_node,
+    )
+
+
+async def _on_remote_awareness(document_id: UUID, update: bytes) -> None:
+    try:
+        _awareness.apply_remote(document_id, decode_awareness_update(update))
+    except ValueError:
+        logger.warning("Dropping malformed awareness update on document %s", document_id)
+
+
+# One replication subscription per document, shared by every local socket
+_hub = SubscriptionHub(
+    create_transport(
+        settings.REPLICATION_TRANSPORT,
+        get_redis_pool(),
+        stream_maxlen=settings.REPLICATION_STREAM_MAXLEN,
+    ),
+    on_remote=_on_remote_update,
+    on_remote_awareness=_on_remote_awareness,
+    on_relay=_on_relay,
+)
+
+# In ownership mode only a document's owner persists and compacts it; other nodes relay
+_cluster = (
+    ClusterMembership(
+        get_redis_pool(),
+        _hub.node_id,
+        address=settings.NODE_ADDRESS,
+        lease_ttl=settings.OWNERSHIP_LEASE_MS / 1000,
+    )
+    if settings.OWNERSHIP_ENABLED
+    else None
+)
+
+# Documents with updates relayed to this node since its last flush
+_relayed_here: set[UUID] = set()
+
+
+async def _broadcast_awareness(document_id: UUID, entries: list[AwarenessEntry]) -> None:
+    update = encode_awareness_update(entries)
+    await _hub.fan_out_awareness(document_id, update)
+    await _hub.publish_awareness(document_id, update)
+
+
+# Cursors and presence: relayed and throttled, never written to PostgreSQL
+_awareness = AwarenessBroker(
+    _broadcast_awareness,
+    interval=settings.AWARENESS_THROTTLE_MS / 1000,
+    timeout=settings.AWARENESS_TIMEOUT_MS / 1000,
+)
+
+
+async def _fetch_missing(
+    document_id: UUID, since_seq: int
+) -> tuple[CrdtSnapshot | None, list[CrdtUpdate]]:
+    async with crdt_repository() as repo:
+        return await load_missing(repo, document_id, since_seq)
+
+
+# Recovers updates missed on the bus from storage instead of waiting for a client resync
+_gap_filler = GapFiller(
+    _registry,
+    _fetch_missing,
+    deliver=_hub.fan_out,
+    grace=settings.GAP_CATCHUP_GRACE_MS / 1000,
+)
+
+
+async def _compact(document_id: UUID) -> None:
+    async with crdt_repository() as repo:
+        await create_snapshot(repo, document_id)
+
+
+# Snapshotting runs in the background, never on the path of an editor's update
+_compactor = CompactionScheduler(_compact, max_concurrency=settings.COMPACTION_CONCURRENCY)
+
+# Snapshots when replaying a document's update tail would get too slow
+_snapshot_policy = SnapshotPolicy(
+    replay_budget=settings.SNAPSHOT_REPLAY_BUDGET_MS / 1000,
+    max_pending_bytes=settings.SNAPSHOT_MAX_PENDING_BYTES,
+    max_pending_updates=settings.SNAPSHOT_MAX_PENDING_UPDATES,
+    idle_backoff=settings.SNAPSHOT_IDLE_BACKOFF_S,
+    max_backoff=settings.SNAPSHOT_MAX_BACKOFF,
+)
+
+
+async def _flush_updates(document_id: UUID, batch: list[PendingUpdate]) -> None:
+    traced = [pending.trace for pending in batch if pending.trace is not None]
+    if _cluster is not None:
+        owner = await _cluster.hold(document_id, claim=document_id in _relayed_here)
+        _relayed_here.discard(document_id)
+        if owner != _hub.node_id:
+            # Traces end here; relay envelopes do not carry them to the owner
+            relaying = time.time_ns()
+            relayed = await _hub.relay(
+                owner,
+                [
+                    RelayEnvelope(
+                        origin_node=_hub.node_id,
+                        document_id=document_id,
+                        origin_connection=p.connection_id,
+                        user_id=p.user_id,
+                        payload=p.update_data,
+                    )
+                    for p in batch
+                ],
+            )
+            if relayed:
+                for trace in traced:
+                    update_tracing.stage(trace, "update.relay", relaying, batch=len(batch))
+                return
+            # Nobody on the owner's inbox: write the batch here rather than lose it
+            metrics.RELAY_FALLBACKS.inc()
+            logger.warning(
+                "Owner %s of document %s did not receive a relay; persisting locally",
+                owner, document_id,
+            )
+
+    persisting = time.time_ns()
+    async with crdt_repository() as repo:
+        saved = await persist_updates(
+            repo, document_id, [(p.user_id, p.update_data) for p in batch]
+        )
+    for trace in traced:
+        update_tracing.stage(trace, "update.persist", persisting, batch=len(batch))
+    reason = _snapshot_policy.record(document_id, saved)
+    if reason is not None:
+        metrics.SNAPSHOTS.labels(reason).inc()
+        _compactor.request(document_id)
+
+    live = _registry.get(document_id)
+    if live is not None:
+        live.mark_applied(saved[0].update_seq, saved[-1].update_seq)
+
+    # Other nodes only hear about updates once they are durable. A failed publish must
+    # not fail the flush (the batch would be written twice); receivers notice the seq
+    # gap and read the updates back from storage.
+    if _coalescer.window > 0:
+        # One merge per run of updates from the same node, so each run's relayer can skip it
+        envelopes = []
+        for relayed_by, run in itertools.groupby(
+            zip(batch, saved), key=lambda pair: pair[0].relayed_by
+        ):
+            run = list(run)
+            connections = {pending.connection_id for pending, _ in run}
+            run_traces = [pending.trace for pending, _ in run if pending.trace is not None]
+            envelopes.append(
+                UpdateEnvelope(
+                    origin_node=_hub.node_id,
+                    origin_connection=connections.pop() if len(connections) == 1 else 0,
+                    first_seq=run[0][1].update_seq,
+                    last_seq=run[-1][1].update_seq,
+                    payload=await default_executor.merge([update.update_data for _, update in run]),
+                    trace=run_traces[0] if run_traces else None,
+                    relayed_by=relayed_by,
+                )
+            )
+    else:
+        envelopes = [
+            UpdateEnvelope(
+                origin_node=_hub.node_id,
+                origin_connection=pending.connection_id,
+                first_seq=update.update_seq,
+                last_seq=update.update_seq,
+                payload=update.update_data,
+                trace=pending.trace,
+                relayed_by=pending.relayed_by,
+            )
+            for pending, update in zip(batch, saved)
+        ]
+    publishing = time.time_ns()
+    try:
+        await _hub.publish(document_id, envelopes)
+        for trace in traced:
+            update_tracing.stage(trace, "update.publish", publishing, envelopes=len(envelopes))
+    except Exception:
+        metrics.PUBLISH_FAILURES.inc()
+        logger.exception("Publishing updates failed for document %s", document_id)
+
+
+# Opt-in merging of outbound updates; the Redis side merges each write-behind batch
+_coalescer = UpdateCoalescer(_hub.fan_out, window=settings.OUTBOUND_COALESCE_MS / 1000)
+
+
+# Buffered persistence of inbound updates, flushed per document
+_write_buffer = WriteBehindBuffer(
+    _flush_updates,
+    window=settings.WRITE_BEHIND_WINDOW_MS / 1000,
+    max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+)
+
+# Read on every scrape
+metrics.LIVE_DOCUMENTS.set_function(lambda: len(_registry))
+metrics.LIVE_DOCUMENT_BYTES.set_function(lambda: _registry.total_bytes)
+metrics.WRITE_BEHIND_DEPTH.set_function(lambda: _write_buffer.queue_depth)
+metrics.COMPACTION_BACKLOG.set_function(lambda: _compactor.backlog)
+
+
+async def _diff(live: LiveDoc, state_vector: bytes) -> bytes:
+    """SyncStep2 for a client at state_vector; off the loop if the doc is large."""
+    async with live.lock:
+        return await default_executor.run(live.size, sync_step2, live.doc, state_vector)
+
+
+async def _resync(document_id: UUID, state_vector: bytes) -> bytes | None:
+    live = _registry.get(document_id)
+    if live is None:
+        return None  # not loaded yet; the handshake brings the client up to date
+    return await _diff(live, state_vector)
 
 
 def _authenticate(token: str) -> str | None:
@@ -27,6 +308,40 @@ def _authenticate(token: str) -> str | None:
         return None
 
 
+async def _load_document(document_id: UUID) -> tuple[Doc, int]:
+    async with crdt_repository() as repo:
+        return await load_document(repo, document_id, _snapshot_policy)
+
+
+async def document_owner(document_id: UUID) -> tuple[UUID, str]:
+    """The node a document's sockets should be routed to, and its address."""
+    if _cluster is None:
+        return _hub.node_id, settings.NODE_ADDRESS
+    owner = await _cluster.owner(document_id)
+    return owner, await _cluster.address_of(owner) or ""
+
+
+async def startup() -> None:
+    """Join the cluster when documents are owned by a single node."""
+    if _cluster is not None:
+        await _cluster.start()
+        await _hub.open_inbox()
+
+
+async def shutdown() -> None:
+    """Flush every buffered update before the process exits."""
+    await _write_buffer.stop()
+    if _cluster is not None:
+        await _hub.close_inbox()
+        await _cluster.stop()
+    await _coalescer.stop()
+    await _gap_filler.stop()
+    await _awareness.stop()
+    await _compactor.stop()
+    default_executor.shutdown()
+    close_repository()
+
+
 @router.websocket("/ws/doc/{document_id}")
 async def websocket_endpoint(websocket: WebSocket, document_id: UUID):
     # Authenticate via query param: ?token=xxx
@@ -41,54 +356,81 @@ async def websocket_endpoint(websocket: WebSocket, document_id: UUID):
         return
 
     await websocket.accept()
+    connection_id = next(_connection_ids)
+    client = ClientConnection(
+        websocket.send_bytes,
+        max_queue=settings.CONNECTION_SEND_QUEUE,
+        resync=lambda state_vector: _resync(document_id, state_vector),
+        abort=lambda: websocket.close(code=1011),
+    )
+    metrics.WS_CONNECTIONS.inc()
+    acquired = False
 
-    # Track connection
-    if document_id not in _connections:
-        _connections[document_id] = set()
-    _connections[document_id].add(websocket)
-
-    redis = get_redis_pool()
-
-    # Subscribe to Redis pub/sub for this document
-    async def on_redis_message(data: bytes):
-        """Forward updates from other servers/connections to this client."""
-        for ws in _connections.get(document_id, set()):
-            if ws != websocket:
-                try:
-                    await ws.send_bytes(data)
-                except Exception:
-                    pass
+    try:
+        client.start()
+        # Join the local hub before loading so no update slips in between
+        await _hub.join(document_id, client)
+        _snapshot_policy.opened(document_id)
+        metrics.DOCUMENT_SOCKETS.observe(_hub.subscriber_count(document_id))
 
-    sub_task = await subscribe(redis, document_id, on_redis_message)
+        # Served from memory when the doc is hot. Ask the client for whatever it has
+        # that we don't; its own SyncStep1 gets back only what it is missing.
+        live = await _registry.acquire(document_id, _load_document)
+        acquired = True
+        await _gap_filler.refresh(document_id)
+        async with live.lock:
+            client.send(sync_step1(live.doc))
+        present = _awareness.states(document_id)
+        if present:
+            await client.send_awareness(encode_awareness_update(present))
 
-    try:
-        # Send current document state on connect
-        async with async_session() as db:
-            repo = DbCrdtStorageRepository(db)
-            doc = await load_document_state(repo, document_id)
-            state = encode_state_as_update(doc)
-            await websocket.send_bytes(state)
-
-        # Listen for updates from this client
-        while True:
+        # A failed send from the writer task marks the socket disconnected
+        while websocket.application_state == WebSocketState.CONNECTED:
             data = await websocket.receive_bytes()
+            try:
+                message = decode_message(data)
+            except ValueError:
+                logger.warning("Dropping malformed message on document %s", document_id)
+                continue
+            if message is None:
+                continue
+            if isinstance(message, list):
+                _awareness.update(document_id, message, connection_id)
+                continue
+
+            if message.kind == YSyncMessageType.SYNC_STEP1:
+                try:
+                    step2 = await _diff(live, message.payload)
+                except ValueError:
+                    logger.warning("Dropping malformed state vector on document %s", document_id)
+                    continue
+                client.state_vector = message.payload
+                client.send(step2)
+                continue
 
-            # Persist the update
-            async with async_session() as db:
-                repo = DbCrdtStorageRepository(db)
-                await persist_update(repo, document_id, UUID(user_id), data)
+            # SyncStep2 and live updates both carry an update; an up-to-date client sends an empty one
+            update = message.payload
+            if update == EMPTY_UPDATE:
+                continue
+            trace = update_tracing.sample()
+            await _registry.apply_update(document_id, update)
+            metrics.UPDATES_RECEIVED.labels("client").inc()
+            metrics.UPDATE_BYTES.observe(len(update))
+            if trace is not None:
+                update_tracing.stage(trace, "update.receive", trace.origin_ns, bytes=len(update))
+            await _coalescer.add(document_id, update, origin=client, trace=trace)
 
-            # Broadcast via Redis (reaches other servers + local on_redis_message)
-            await publish_update(redis, document_id, data)
+            # Persisted in batches, then published to the other servers
+            await _write_buffer.enqueue(document_id, UUID(user_id), update, connection_id, trace)
 
     except WebSocketDisconnect:
         pass
     finally:
-        _connections[document_id].discard(websocket)
-        if not _connections[document_id]:
-            del _connections[document_id]
-        sub_task.cancel()
-        try:
-            await sub_task
-        except asyncio.CancelledError:
-            pass
+        _awareness.disconnect(document_id, connection_id)
+        if acquired:
+            _registry.release(document_id)
+        await _hub.leave(document_id, client)
+        metrics.WS_CONNECTIONS.dec()
+        await client.close()
+        if not _hub.subscriber_count(document_id):
+            await _write_buffer.flush_or_retry(document_id)
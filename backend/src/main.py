@@ -2,7 +2,8 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST
 
 from shared.exceptions import (
     AppError,
@@ -12,12 +13,20 @@ from shared.exceptions import (
     NotFoundError,
 )
 from shared.infrastructure.database import engine
+from shared.infrastructure.loop_monitor import loop_monitor
+from shared.infrastructure.metrics import instrument_engine, instrument_loop, render
 from shared.infrastructure.redis import get_redis_pool
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    instrument_engine(engine)
+    instrument_loop(loop_monitor)
+    loop_monitor.start()
+    await startup_collaboration()
     yield
+    await shutdown_collaboration()
+    await loop_monitor.stop()
     await engine.dispose()
     redis = get_redis_pool()
     await redis.aclose()
@@ -64,14 +73,23 @@ async def app_error_handler(request, exc: AppError):
 
 
 from auth.interfaces.routes import router as auth_router
+from collaboration.interfaces.routes import router as collaboration_router
 from collaboration.interfaces.ws_handler import router as ws_router
+from collaboration.interfaces.ws_handler import shutdown as shutdown_collaboration
+from collaboration.interfaces.ws_handler import startup as startup_collaboration
 from documents.interfaces.routes import router as documents_router
 
 app.include_router(auth_router)
 app.include_router(documents_router)
+app.include_router(collaboration_router)
 app.include_router(ws_router)
 
 
 @app.get("/health")
 async def health_check():
     return {"status": "ok"}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(render(), media_type=CONTENT_TYPE_LATEST)
@@ -1,3 +1,5 @@
+from typing import Literal
+
 from pydantic_settings import BaseSettings
 
 
@@ -8,6 +10,77 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRATION_MINUTES: int = 60
 
+    # Live Y.Doc cache per process
+    DOC_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+    DOC_CACHE_MAX_DOCS: int = 1000
+
+    # Write-behind buffering of CRDT updates
+    WRITE_BEHIND_WINDOW_MS: int = 50
+    WRITE_BEHIND_MAX_BATCH: int = 100
+
+    # Compression of stored CRDT blobs; dictionaries are comma-separated file paths, newest first
+    CRDT_COMPRESSION_LEVEL: int = 3
+    CRDT_ZSTD_DICTIONARIES: str = ""
+
+    # Snapshots at least this large go to a content-addressed blob store; empty dir keeps them in the DB
+    SNAPSHOT_BLOB_DIR: str = ""
+    SNAPSHOT_BLOB_THRESHOLD: int = 1024 * 1024
+
+    # Where CRDT work runs: payloads below the threshold stay on the event loop, larger ones
+    # go to worker threads; merges of detached blobs use processes if MERGE_PROCESSES > 0
+    CRDT_INLINE_MAX_BYTES: int = 64 * 1024
+    CRDT_WORKER_THREADS: int = 2
+    CRDT_MERGE_PROCESSES: int = 0
+
+    # Event-loop stall monitoring: probe interval, and the stall that gets logged
+    LOOP_MONITOR_INTERVAL_MS: int = 10
+    LOOP_STALL_WARN_MS: int = 100
+
+    # Per-update latency tracing: the share of client updates traced end to end, and where
+    # their stage spans go ("none", or "otel" through the OpenTelemetry API if it is installed)
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_EXPORTER: Literal["none", "otel"] = "none"
+
+    # Background snapshot compaction
+    COMPACTION_CONCURRENCY: int = 2
+
+    # When to snapshot: once replaying the update tail would pass the budget, or a cap is hit.
+    # The budget doubles per idle period since the doc was last opened, up to MAX_BACKOFF times.
+    SNAPSHOT_REPLAY_BUDGET_MS: int = 25
+    SNAPSHOT_MAX_PENDING_BYTES: int = 8 * 1024 * 1024
+    SNAPSHOT_MAX_PENDING_UPDATES: int = 10_000
+    SNAPSHOT_IDLE_BACKOFF_S: int = 3600
+    SNAPSHOT_MAX_BACKOFF: int = 8
+
+    # Where CRDT updates and snapshots live: "postgres" (DATABASE_URL), "sqlite" (one WAL-mode
+    # file on a single node) or "memory" (lost on restart; tests and benchmarks). Users and
+    # documents stay in DATABASE_URL whichever is chosen, so PostgreSQL is always required.
+    CRDT_STORAGE: Literal["postgres", "sqlite", "memory"] = "postgres"
+    CRDT_SQLITE_PATH: str = "crdt.sqlite3"
+
+    # How updates reach the other nodes: "pubsub" (fire-and-forget), "streams" (resumable),
+    # or "local" (within this process only; for a single node without Redis)
+    REPLICATION_TRANSPORT: Literal["pubsub", "streams", "local"] = "pubsub"
+    REPLICATION_STREAM_MAXLEN: int = 1000
+
+    # Single-owner mode: each document is written by one node picked by a consistent-hash ring
+    OWNERSHIP_ENABLED: bool = False
+    OWNERSHIP_LEASE_MS: int = 10_000
+    NODE_ADDRESS: str = ""  # where a load balancer can reach this node, e.g. "10.0.0.5:8000"
+
+    # How long a seq gap on the update bus may stay open before reading it from storage
+    GAP_CATCHUP_GRACE_MS: int = 500
+
+    # Merge outbound updates over this window before sending them; 0 sends each one as it arrives
+    OUTBOUND_COALESCE_MS: int = 0
+
+    # Outbound messages a slow client may have pending before it is dropped to a resync
+    CONNECTION_SEND_QUEUE: int = 256
+
+    # Awareness (cursors/presence): never persisted, batched per document, expired when silent
+    AWARENESS_THROTTLE_MS: int = 100
+    AWARENESS_TIMEOUT_MS: int = 30_000
+
     model_config = {"env_file": ".env", "extra": "ignore"}
 
 
@@ -0,0 +1,73 @@
+import asyncio
+import bisect
+import logging
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+
+from shared.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the lag histogram buckets; the last bucket is open-ended
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+@dataclass
+class LoopLagHistogram:
+    counts: list[int] = field(default_factory=lambda: [0] * (len(LAG_BUCKETS) + 1))
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    @property
+    def samples(self) -> int:
+        return sum(self.counts)
+
+    def observe(self, lag: float) -> None:
+        self.counts[bisect.bisect_left(LAG_BUCKETS, lag)] += 1
+        self.total_seconds += lag
+        self.max_seconds = max(self.max_seconds, lag)
+
+
+class LoopMonitor:
+    """Measures how long the event loop is blocked.
+
+    A probe sleeps ``interval`` seconds at a time; however much later than
+    that it wakes up is time the loop spent running something else without
+    yielding. Lags go into a histogram, and single stalls of at least
+    ``warn_after`` seconds are logged.
+    """
+
+    def __init__(self, interval: float, warn_after: float):
+        self.interval = interval
+        self.warn_after = warn_after
+        self.histogram = LoopLagHistogram()
+        self.on_lag: Callable[[float], None] | None = None  # e.g. a metrics histogram
+        self._probe: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._probe is None:
+            self._probe = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._probe is not None:
+            self._probe.cancel()
+            await asyncio.gather(self._probe, return_exceptions=True)
+            self._probe = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - started - self.interval, 0.0)
+            self.histogram.observe(lag)
+            if self.on_lag is not None:
+                self.on_lag(lag)
+            if lag >= self.warn_after:
+                logger.warning("Event loop was blocked for %.0f ms", lag * 1000)
+
+
+loop_monitor = LoopMonitor(
+    interval=settings.LOOP_MONITOR_INTERVAL_MS / 1000,
+    warn_after=settings.LOOP_STALL_WARN_MS / 1000,
+)
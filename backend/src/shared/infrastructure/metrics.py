@@ -0,0 +1,113 @@
+from prometheus_client import Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from shared.infrastructure.loop_monitor import LAG_BUCKETS, LoopMonitor
+
+# Prometheus metrics, served at /metrics. Labels only take values from small fixed
+# sets (an update's source, a transport, a snapshot reason), never document or user
+# ids, so the number of series stays bounded however many documents are open.
+
+# Seconds; from sub-millisecond Redis round trips to multi-second snapshots
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000, 10000)
+
+# Sockets and documents
+WS_CONNECTIONS = Gauge("cms_ws_connections", "Open collaboration WebSockets")
+DOCUMENT_SOCKETS = Histogram(
+    "cms_document_sockets",
+    "Sockets open on a document, sampled each time one joins",
+    buckets=COUNT_BUCKETS,
+)
+LIVE_DOCUMENTS = Gauge("cms_live_documents", "Y.Docs resident in this process")
+LIVE_DOCUMENT_BYTES = Gauge("cms_live_document_bytes", "Approximate bytes held by resident Y.Docs")
+WS_DROPPED_MESSAGES = Counter(
+    "cms_ws_dropped_messages", "Outbound messages dropped for a resync because a socket fell behind"
+)
+
+# Updates
+# source is "client", "remote" (another node's persisted update) or "relay" (sent to us as owner)
+UPDATES_RECEIVED = Counter("cms_updates_received", "CRDT updates applied to live documents", ["source"])
+UPDATE_BYTES = Histogram("cms_update_bytes", "Size of updates received from clients", buckets=SIZE_BUCKETS)
+# Outbound coalescing (OUTBOUND_COALESCE_MS); the batch size's sum over its count is
+# the batching ratio
+COALESCE_DELAY_SECONDS = Histogram(
+    "cms_coalesce_delay_seconds", "How long an outbound batch was held back before going out",
+    buckets=LATENCY_BUCKETS,
+)
+COALESCE_BATCH_SIZE = Histogram(
+    "cms_coalesce_batch_size", "Updates merged into each outbound send", buckets=COUNT_BUCKETS
+)
+FANOUT_SECONDS = Histogram(
+    "cms_fanout_seconds", "Time to queue an update for every local socket on its document",
+    buckets=LATENCY_BUCKETS,
+)
+
+# Persistence
+PERSIST_SECONDS = Histogram(
+    "cms_persist_seconds", "Time to write a batch of updates", buckets=LATENCY_BUCKETS
+)
+PERSIST_BATCH_SIZE = Histogram(
+    "cms_persist_batch_size", "Updates written per batch", buckets=COUNT_BUCKETS
+)
+WRITE_BEHIND_DEPTH = Gauge("cms_write_behind_depth", "Updates waiting in memory to be written")
+SNAPSHOT_SECONDS = Histogram(
+    "cms_snapshot_seconds", "Time to fold an update tail into a snapshot", buckets=LATENCY_BUCKETS
+)
+SNAPSHOTS = Counter("cms_snapshots", "Snapshots requested, by why they were due", ["reason"])
+COMPACTION_BACKLOG = Gauge("cms_compaction_backlog", "Documents waiting for a snapshot")
+REPLAY_UPDATES = Histogram(
+    "cms_replay_updates", "Pending updates replayed when loading a document", buckets=COUNT_BUCKETS
+)
+REPLAY_BYTES = Histogram(
+    "cms_replay_bytes", "Bytes of pending updates replayed when loading a document", buckets=SIZE_BUCKETS
+)
+LOAD_SECONDS = Histogram(
+    "cms_document_load_seconds", "Time to load a document from storage", buckets=LATENCY_BUCKETS
+)
+
+# Replication
+PUBLISH_SECONDS = Histogram(
+    "cms_publish_seconds", "Time to publish a batch to the other nodes", ["transport"],
+    buckets=LATENCY_BUCKETS,
+)
+PUBLISH_FAILURES = Counter("cms_publish_failures", "Batches that could not be published")
+REPLICATION_MESSAGE_FAILURES = Counter(
+    "cms_replication_message_failures", "Messages from other nodes whose handling raised"
+)
+RELAY_FALLBACKS = Counter(
+    "cms_relay_fallbacks", "Batches for another node's document that no owner received, persisted here"
+)
+# Sampled updates only (TRACE_SAMPLE_RATE); path is "local" (same node) or "remote"
+PROPAGATION_SECONDS = Histogram(
+    "cms_update_propagation_seconds",
+    "Time from an update reaching its origin node to its being written to a peer's socket",
+    ["path"],
+    buckets=LATENCY_BUCKETS,
+)
+
+# Process
+LOOP_LAG_SECONDS = Histogram(
+    "cms_event_loop_lag_seconds", "How late the event loop ran a timer", buckets=LAG_BUCKETS
+)
+DB_POOL_CHECKED_OUT = Gauge("cms_db_pool_checked_out", "Database connections in use")
+DB_POOL_SIZE = Gauge("cms_db_pool_size", "Database connections the pool keeps open")
+DB_POOL_OVERFLOW = Gauge("cms_db_pool_overflow", "Database connections open beyond the pool size")
+DB_POOL_CHECKOUTS = Counter("cms_db_pool_checkouts", "Database connections handed out by the pool")
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    pool = engine.sync_engine.pool
+    DB_POOL_CHECKED_OUT.set_function(pool.checkedout)
+    DB_POOL_SIZE.set_function(pool.size)
+    DB_POOL_OVERFLOW.set_function(lambda: max(pool.overflow(), 0))
+    event.listen(engine.sync_engine, "checkout", lambda *_: DB_POOL_CHECKOUTS.inc())
+
+
+def instrument_loop(monitor: LoopMonitor) -> None:
+    monitor.on_lag = LOOP_LAG_SECONDS.observe
+
+
+def render() -> bytes:
+    return generate_latest()
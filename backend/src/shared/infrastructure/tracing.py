@@ -0,0 +1,114 @@
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Protocol
+
+from shared.config import settings
+from shared.infrastructure.metrics import PROPAGATION_SECONDS
+
+
+@dataclass(frozen=True)
+class TraceContext:
+    """Follows one sampled update through the pipeline, across nodes.
+
+    ``origin_ns`` is the wall clock when the update reached its origin node.
+    Latencies measured from it on another node include the clock skew between
+    the two.
+    """
+
+    trace_id: bytes  # 16 bytes
+    span_id: bytes  # 8 bytes; the parent of every stage span
+    origin_ns: int
+    # Set once the context has been decoded off the update bus
+    remote: bool = field(default=False, compare=False)
+
+
+class Tracer(Protocol):
+    def record(
+        self, context: TraceContext, name: str, start_ns: int, end_ns: int, attributes: dict[str, Any]
+    ) -> None: ...
+
+
+class NoopTracer:
+    def record(self, context, name, start_ns, end_ns, attributes) -> None:
+        pass
+
+
+class OtelTracer:
+    """Exports stage spans through the OpenTelemetry API.
+
+    Only the API is used; the SDK, exporter and service name come from the
+    deployment (e.g. opentelemetry-instrument and the OTEL_* variables).
+    Every stage span is a child of the trace's remote root, so stages recorded
+    on different nodes land in one trace.
+    """
+
+    def __init__(self, name: str = "cms.collaboration"):
+        try:
+            from opentelemetry import trace
+        except ImportError as exc:
+            raise RuntimeError("TRACE_EXPORTER=otel needs the opentelemetry-api package") from exc
+        self._trace = trace
+        self._tracer = trace.get_tracer(name)
+
+    def record(self, context, name, start_ns, end_ns, attributes) -> None:
+        trace = self._trace
+        parent = trace.NonRecordingSpan(
+            trace.SpanContext(
+                trace_id=int.from_bytes(context.trace_id, "big"),
+                span_id=int.from_bytes(context.span_id, "big"),
+                is_remote=True,
+                trace_flags=trace.TraceFlags(trace.TraceFlags.SAMPLED),
+            )
+        )
+        span = self._tracer.start_span(
+            name,
+            context=trace.set_span_in_context(parent),
+            start_time=start_ns,
+            attributes=attributes,
+        )
+        span.end(end_time=end_ns)
+
+
+def create_tracer(kind: str) -> Tracer:
+    if kind == "otel":
+        return OtelTracer()
+    if kind == "none":
+        return NoopTracer()
+    raise ValueError(f"Unknown trace exporter: {kind}")
+
+
+class UpdateTracing:
+    """Samples client updates and records the stages they pass through.
+
+    An unsampled update carries no context, so with a ``sample_rate`` of zero
+    the whole cost is one comparison per update. Each stage is a span on the
+    update's trace; the time from an update's arrival to its being written to
+    a peer's socket also goes to the propagation histogram.
+    """
+
+    def __init__(self, tracer: Tracer, sample_rate: float):
+        self.tracer = tracer
+        self.sample_rate = sample_rate
+
+    def sample(self) -> TraceContext | None:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        return TraceContext(os.urandom(16), os.urandom(8), time.time_ns())
+
+    def stage(
+        self, context: TraceContext, name: str, start_ns: int, end_ns: int | None = None, **attributes
+    ) -> None:
+        end_ns = time.time_ns() if end_ns is None else end_ns
+        self.tracer.record(context, name, start_ns, end_ns, attributes)
+
+    def delivered(self, context: TraceContext, queued_ns: int) -> None:
+        """An update was written to a peer's socket, queued_ns after it was queued for it."""
+        now = time.time_ns()
+        path = "remote" if context.remote else "local"
+        self.stage(context, "update.send", queued_ns, now, path=path)
+        PROPAGATION_SECONDS.labels(path).observe(max(now - context.origin_ns, 0) / 1e9)
+
+
+update_tracing = UpdateTracing(create_tracer(settings.TRACE_EXPORTER), settings.TRACE_SAMPLE_RATE)
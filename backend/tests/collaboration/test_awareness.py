@@ -0,0 +1,94 @@
+import asyncio
+from uuid import uuid4
+
+from collaboration.application.awareness import AwarenessBroker
+from collaboration.infrastructure.sync_protocol import AwarenessEntry
+
+
+class Recorder:
+    def __init__(self):
+        self.batches = []
+
+    async def __call__(self, document_id, entries):
+        self.batches.append(entries)
+
+
+def _cursor(client_id, clock, position):
+    return AwarenessEntry(client_id, clock, f'{{"cursor":{position}}}')
+
+
+async def test_rapid_updates_are_merged_per_client():
+    deliver = Recorder()
+    broker = AwarenessBroker(deliver, interval=0.05, timeout=30)
+    document_id = uuid4()
+
+    for clock in range(1, 21):
+        broker.update(document_id, [_cursor(1, clock, clock)], connection_id=1)
+        broker.update(document_id, [_cursor(2, clock, clock)], connection_id=2)
+        await asyncio.sleep(0.005)
+    await asyncio.sleep(0.1)
+
+    # ~100ms of typing at 200 Hz goes out as a handful of broadcasts
+    assert 2 <= len(deliver.batches) <= 4
+    last = {entry.client_id: entry for entry in deliver.batches[-1]}
+    assert last[1].clock == 20 and last[2].clock == 20
+    assert broker.stats.entries_coalesced > 0
+    await broker.stop()
+
+
+async def test_stale_clocks_are_ignored():
+    deliver = Recorder()
+    broker = AwarenessBroker(deliver, interval=0, timeout=30)
+    document_id = uuid4()
+
+    broker.update(document_id, [_cursor(1, 5, 50)], connection_id=1)
+    broker.update(document_id, [_cursor(1, 4, 40)], connection_id=1)
+    await asyncio.sleep(0.01)
+
+    assert broker.states(document_id) == [_cursor(1, 5, 50)]
+    assert [e.clock for batch in deliver.batches for e in batch] == [5]
+    await broker.stop()
+
+
+async def test_disconnect_broadcasts_removal():
+    deliver = Recorder()
+    broker = AwarenessBroker(deliver, interval=0, timeout=30)
+    document_id = uuid4()
+
+    broker.update(document_id, [_cursor(1, 1, 0)], connection_id=7)
+    broker.apply_remote(document_id, [_cursor(2, 3, 0)])
+    await asyncio.sleep(0.01)
+    broker.disconnect(document_id, connection_id=7)
+    await asyncio.sleep(0.01)
+
+    assert deliver.batches[-1] == [AwarenessEntry(1, 2, "null")]
+    assert broker.states(document_id) == [_cursor(2, 3, 0)]
+    await broker.stop()
+
+
+async def test_remote_updates_are_not_rebroadcast():
+    deliver = Recorder()
+    broker = AwarenessBroker(deliver, interval=0, timeout=30)
+    document_id = uuid4()
+
+    broker.apply_remote(document_id, [_cursor(9, 1, 0)])
+    await asyncio.sleep(0.01)
+
+    assert deliver.batches == []
+    assert broker.states(document_id) == [_cursor(9, 1, 0)]
+    await broker.stop()
+
+
+async def test_silent_clients_expire():
+    deliver = Recorder()
+    broker = AwarenessBroker(deliver, interval=0, timeout=0.05)
+    document_id = uuid4()
+
+    broker.update(document_id, [_cursor(1, 1, 0)], connection_id=1)
+    broker.apply_remote(document_id, [_cursor(2, 1, 0)])
+    await asyncio.sleep(0.12)
+
+    assert broker.states(document_id) == []
+    assert deliver.batches[-1] == [AwarenessEntry(1, 2, "null")]
+    assert broker.stats.expired == 1
+    await broker.stop()
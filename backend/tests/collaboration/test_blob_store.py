@@ -0,0 +1,29 @@
+from collaboration.infrastructure.blob_store import LocalBlobStore, blob_key
+
+
+async def test_put_then_get_round_trips(tmp_path):
+    store = LocalBlobStore(tmp_path)
+    data = b"snapshot bytes" * 1000
+
+    key = await store.put(data)
+
+    assert key == blob_key(data)
+    assert store.path_of(key).parent.name == key[:2]
+    assert await store.get(key) == data
+
+
+async def test_identical_blobs_are_stored_once(tmp_path):
+    store = LocalBlobStore(tmp_path)
+
+    first = await store.put(b"same state")
+    written_at = store.path_of(first).stat().st_mtime_ns
+    second = await store.put(b"same state")
+
+    assert first == second
+    assert store.path_of(first).stat().st_mtime_ns == written_at
+    assert [p.name for p in tmp_path.rglob("*") if p.is_file()] == [first]
+
+
+async def test_empty_blob(tmp_path):
+    store = LocalBlobStore(tmp_path)
+    assert await store.get(await store.put(b"")) == b""
@@ -0,0 +1,110 @@
+import asyncio
+from uuid import uuid4
+
+from collaboration.application.catch_up import GapFiller
+from collaboration.application.doc_registry import DocRegistry
+from collaboration.application.services import load_document, load_missing, persist_updates
+from collaboration.domain.entities import CrdtUpdate
+from collaboration.infrastructure.memory_storage_repository import MemoryCrdtStorageRepository
+from collaboration.infrastructure.yjs_adapter import create_doc, encode_state_as_update, get_text
+
+
+def _update(text: str) -> bytes:
+    local = create_doc()
+    with local.transaction():
+        local["content"] += text
+    return encode_state_as_update(local)
+
+
+class FakeStorage:
+    def __init__(self, updates: dict[int, bytes]):
+        self.updates = updates
+        self.calls = []
+
+    async def __call__(self, document_id, since_seq):
+        self.calls.append(since_seq)
+        return None, [
+            CrdtUpdate(document_id, data, update_seq=seq, user_id=uuid4())
+            for seq, data in sorted(self.updates.items())
+            if seq > since_seq
+        ]
+
+
+async def _setup(storage, grace=0.01):
+    registry = DocRegistry(max_bytes=1_000_000, max_docs=10)
+    document_id = uuid4()
+
+    async def loader(_):
+        return create_doc(), 0
+
+    live = await registry.acquire(document_id, loader)
+    delivered = []
+
+    async def deliver(doc_id, data):
+        delivered.append(data)
+
+    return registry, document_id, live, delivered, GapFiller(registry, storage, deliver, grace)
+
+
+async def test_open_gap_is_filled_from_storage():
+    storage = FakeStorage({1: _update("lost"), 2: _update("seen")})
+    registry, document_id, live, delivered, filler = await _setup(storage)
+
+    await registry.apply_update(document_id, storage.updates[2])
+    live.mark_applied(2, 2)
+    filler.check(document_id)
+    await asyncio.sleep(0.05)
+
+    assert storage.calls == [0]
+    assert live.seq == 2 and not live.has_gap
+    assert "lost" in get_text(live.doc)
+    assert len(delivered) == 1
+    assert filler.stats.updates_recovered == 2
+
+
+async def test_gap_closed_within_grace_is_not_fetched():
+    storage = FakeStorage({1: _update("late"), 2: _update("early")})
+    registry, document_id, live, delivered, filler = await _setup(storage, grace=0.05)
+
+    live.mark_applied(2, 2)
+    filler.check(document_id)
+    live.mark_applied(1, 1)
+    await asyncio.sleep(0.1)
+
+    assert storage.calls == []
+    assert delivered == []
+
+
+async def test_idle_doc_catches_up_on_edits_made_elsewhere():
+    # Two nodes share storage; node A's doc stays cached after its last socket leaves
+    repo = MemoryCrdtStorageRepository()
+    document_id, user_id = uuid4(), uuid4()
+    await persist_updates(repo, document_id, [(user_id, _update("first "))])
+
+    async def loader(doc_id):
+        return await load_document(repo, doc_id)
+
+    async def fetch_missing(doc_id, since_seq):
+        return await load_missing(repo, doc_id, since_seq)
+
+    async def deliver(doc_id, data):
+        pass
+
+    registry_a = DocRegistry(max_bytes=1_000_000, max_docs=10)
+    filler_a = GapFiller(registry_a, fetch_missing, deliver, grace=0.01)
+    await registry_a.acquire(document_id, loader)
+    registry_a.release(document_id)
+
+    # Node B edits while nobody on A has the document open
+    registry_b = DocRegistry(max_bytes=1_000_000, max_docs=10)
+    live_b = await registry_b.acquire(document_id, loader)
+    edit = _update("from-b")
+    await registry_b.apply_update(document_id, edit)
+    await persist_updates(repo, document_id, [(user_id, edit)])
+
+    live_a = await registry_a.acquire(document_id, loader)
+    await filler_a.refresh(document_id)
+
+    assert "from-b" in get_text(live_a.doc)
+    assert live_a.seq == 2 and not live_a.stale
+    assert get_text(live_a.doc) == get_text(live_b.doc)
@@ -0,0 +1,77 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from collaboration.infrastructure.cluster import ClusterMembership
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+async def _nodes(server, count, lease_ttl=10.0):
+    nodes = [
+        ClusterMembership(FakeAsyncRedis(server=server), uuid4(), f"10.0.0.{n}:8000", lease_ttl)
+        for n in range(count)
+    ]
+    for node in nodes:
+        await node.refresh()
+    for node in nodes:
+        await node.refresh()  # now everyone sees everyone
+    return nodes
+
+
+def _owned_by(nodes, owner):
+    return next(d for d in iter(uuid4, None) if nodes[0].ring.owner(d) == owner.node_id)
+
+
+async def test_nodes_share_one_ring(server):
+    nodes = await _nodes(server, 3)
+
+    assert all(node.ring.nodes == {n.node_id for n in nodes} for node in nodes)
+    assert await nodes[0].address_of(nodes[2].node_id) == "10.0.0.2:8000"
+
+
+async def test_only_the_ring_owner_takes_a_free_lease(server):
+    first, second = await _nodes(server, 2)
+    document_id = _owned_by([first, second], second)
+
+    assert await first.hold(document_id) == second.node_id
+    assert await second.hold(document_id) == second.node_id
+    assert await first.owner(document_id) == second.node_id
+
+
+async def test_a_held_lease_outranks_the_ring(server):
+    first, second = await _nodes(server, 2)
+    document_id = _owned_by([first, second], second)
+
+    # Relayed updates let a non-owner take a free lease
+    assert await first.hold(document_id, claim=True) == first.node_id
+    assert await second.hold(document_id) == first.node_id
+    assert await second.owner(document_id) == first.node_id
+
+
+async def test_lease_of_a_departed_node_is_taken_over(server):
+    first, second = await _nodes(server, 2)
+    document_id = _owned_by([first, second], second)
+    await second.hold(document_id)
+
+    await second.stop()
+    await first.refresh()
+
+    assert await first.owner(document_id) == first.node_id
+    assert await first.hold(document_id) == first.node_id
+
+
+async def test_idle_lease_lapses(server):
+    (node,) = await _nodes(server, 1, lease_ttl=0.05)
+    document_id = uuid4()
+    redis = FakeAsyncRedis(server=server)
+
+    await node.hold(document_id)
+    assert await redis.exists(f"doc:{document_id}:owner")
+    await asyncio.sleep(0.1)
+    assert not await redis.exists(f"doc:{document_id}:owner")
@@ -0,0 +1,110 @@
+import asyncio
+from uuid import uuid4
+
+from prometheus_client import REGISTRY
+
+from collaboration.application.coalescer import UpdateCoalescer
+from collaboration.infrastructure.yjs_adapter import (
+    apply_update,
+    create_doc,
+    encode_state_as_update,
+    get_text,
+)
+from shared.infrastructure.tracing import TraceContext
+
+
+def _sample(name: str) -> float:
+    return REGISTRY.get_sample_value(name) or 0.0
+
+
+class Recorder:
+    def __init__(self):
+        self.sent = []
+        self.traces = []
+
+    async def __call__(self, document_id, update, exclude=None, trace=None):
+        self.sent.append((update, exclude))
+        self.traces.append(trace)
+
+
+def _keystrokes(text: str) -> list[bytes]:
+    local = create_doc()
+    updates = []
+    for char in text:
+        before = local.get_state()
+        with local.transaction():
+            local["content"] += char
+        updates.append(local.get_update(before))
+    return updates
+
+
+async def test_zero_window_sends_each_update_past_its_sender():
+    deliver = Recorder()
+    coalescer = UpdateCoalescer(deliver, window=0)
+    sender = object()
+
+    await coalescer.add(uuid4(), b"a", origin=sender)
+    await coalescer.add(uuid4(), b"b", origin=sender)
+
+    assert deliver.sent == [(b"a", sender), (b"b", sender)]
+    assert coalescer.stats.batching_ratio == 1.0
+
+
+async def test_burst_goes_out_as_one_merged_update():
+    deliver = Recorder()
+    coalescer = UpdateCoalescer(deliver, window=0.02)
+    document_id = uuid4()
+
+    for update in _keystrokes("hello"):
+        await coalescer.add(document_id, update, origin=object())
+    await asyncio.sleep(0.05)
+
+    assert len(deliver.sent) == 1
+    merged, exclude = deliver.sent[0]
+    assert exclude is None
+    replica = create_doc()
+    apply_update(replica, merged)
+    assert get_text(replica) == "hello"
+    assert coalescer.stats.batching_ratio == 5.0
+    assert coalescer.stats.max_delay_seconds >= 0.02
+
+
+async def test_merged_update_carries_the_first_sampled_trace():
+    deliver = Recorder()
+    coalescer = UpdateCoalescer(deliver, window=0.02)
+    document_id = uuid4()
+    first, second = (TraceContext(bytes(16), bytes([n]) * 8, n) for n in (1, 2))
+
+    for update, trace in zip(_keystrokes("abc"), (None, first, second)):
+        await coalescer.add(document_id, update, trace=trace)
+    await asyncio.sleep(0.05)
+
+    assert deliver.traces == [first]
+
+
+async def test_stop_delivers_held_updates():
+    deliver = Recorder()
+    coalescer = UpdateCoalescer(deliver, window=10)
+    update = encode_state_as_update(create_doc())
+
+    await coalescer.add(uuid4(), update)
+    await coalescer.stop()
+
+    assert deliver.sent == [(update, None)]
+
+
+
+async def test_batches_are_exported_as_metrics():
+    coalescer = UpdateCoalescer(Recorder(), window=0.02)
+    document_id = uuid4()
+    batches = _sample("cms_coalesce_batch_size_count")
+    updates = _sample("cms_coalesce_batch_size_sum")
+    held = _sample("cms_coalesce_delay_seconds_sum")
+
+    for update in _keystrokes("abc"):
+        await coalescer.add(document_id, update)
+    await asyncio.sleep(0.05)
+
+    assert _sample("cms_coalesce_batch_size_count") - batches == 1
+    assert _sample("cms_coalesce_batch_size_sum") - updates == 3
+    assert _sample("cms_coalesce_delay_seconds_sum") - held >= 0.02
@@ -0,0 +1,82 @@
+import asyncio
+from uuid import uuid4
+
+from collaboration.application.compaction import CompactionScheduler
+
+
+class SlowCompact:
+    def __init__(self, delay: float = 0.01, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+
+    async def __call__(self, document_id):
+        self.calls.append(document_id)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("boom")
+        finally:
+            self.active -= 1
+
+
+async def test_duplicate_requests_are_deduplicated():
+    compact = SlowCompact()
+    scheduler = CompactionScheduler(compact, max_concurrency=2)
+    document_id = uuid4()
+
+    for _ in range(5):
+        scheduler.request(document_id)
+    assert scheduler.backlog == 1
+    await scheduler.join()
+
+    assert compact.calls == [document_id]
+    await scheduler.stop()
+
+
+async def test_request_during_run_schedules_one_follow_up():
+    compact = SlowCompact(delay=0.02)
+    scheduler = CompactionScheduler(compact, max_concurrency=1)
+    document_id = uuid4()
+
+    scheduler.request(document_id)
+    await asyncio.sleep(0.005)  # now running
+    scheduler.request(document_id)
+    scheduler.request(document_id)
+    await scheduler.join()
+    await scheduler.join()
+
+    assert compact.calls == [document_id, document_id]
+    await scheduler.stop()
+
+
+async def test_concurrency_is_bounded():
+    compact = SlowCompact()
+    scheduler = CompactionScheduler(compact, max_concurrency=2)
+
+    for _ in range(6):
+        scheduler.request(uuid4())
+    await scheduler.join()
+
+    assert len(compact.calls) == 6
+    assert compact.peak == 2
+    assert scheduler.stats.runs == 6
+    assert scheduler.stats.max_run_seconds >= 0.01
+    await scheduler.stop()
+
+
+async def test_failures_are_counted_and_do_not_stop_workers():
+    compact = SlowCompact(fail=True)
+    scheduler = CompactionScheduler(compact, max_concurrency=1)
+
+    scheduler.request(uuid4())
+    scheduler.request(uuid4())
+    await scheduler.join()
+
+    assert scheduler.stats.failures == 2
+    assert scheduler.backlog == 0
+    await scheduler.stop()
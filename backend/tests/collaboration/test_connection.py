@@ -0,0 +1,94 @@
+import asyncio
+
+from collaboration.infrastructure.sync_protocol import decode_message
+from collaboration.interfaces.connection import ClientConnection
+
+
+class SlowSocket:
+    def __init__(self):
+        self.sent = []
+        self.gate = asyncio.Event()
+
+    async def send_bytes(self, data: bytes) -> None:
+        await self.gate.wait()
+        self.sent.append(data)
+
+
+async def _settle():
+    await asyncio.sleep(0.01)
+
+
+async def test_messages_go_out_in_order():
+    socket = SlowSocket()
+    socket.gate.set()
+    client = ClientConnection(socket.send_bytes, max_queue=10, resync=lambda sv: None)
+    client.start()
+
+    for n in range(5):
+        await client.send_update(bytes([n]))
+    await _settle()
+
+    assert [decode_message(m).payload for m in socket.sent] == [bytes([n]) for n in range(5)]
+    assert client.stats.sent == 5
+    await client.close()
+
+
+async def test_stalled_client_does_not_block_the_sender():
+    client = ClientConnection(SlowSocket().send_bytes, max_queue=3, resync=lambda sv: None)
+    client.start()
+
+    # Never awaits the stalled socket
+    await asyncio.wait_for(
+        asyncio.gather(*(client.send_update(b"u") for _ in range(100))), timeout=1
+    )
+    assert client.depth <= 3
+    await client.close()
+
+
+async def test_overflow_drops_pending_and_resyncs_from_last_state_vector():
+    socket = SlowSocket()
+    resyncs = []
+
+    async def resync(state_vector):
+        resyncs.append(state_vector)
+        return b"resync"
+
+    client = ClientConnection(socket.send_bytes, max_queue=3, resync=resync)
+    client.state_vector = b"sv"
+    client.start()
+    await _settle()  # the writer is now parked on the stalled socket
+
+    for n in range(4):
+        await client.send_update(bytes([n]))
+    await client.send_update(b"after")
+    socket.gate.set()
+    await _settle()
+
+    assert resyncs == [b"sv"]
+    assert socket.sent[0] == b"resync"
+    assert decode_message(socket.sent[-1]).payload == b"after"
+    assert client.stats.overflows == 1
+    assert client.stats.dropped == 4
+    await client.close()
+
+
+async def test_failed_resync_aborts_the_socket():
+    socket, aborted = SlowSocket(), asyncio.Event()
+
+    async def resync(state_vector):
+        raise ValueError("malformed state vector")
+
+    async def abort():
+        aborted.set()
+
+    client = ClientConnection(socket.send_bytes, max_queue=1, resync=resync, abort=abort)
+    client.start()
+    await _settle()
+    for _ in range(3):
+        await client.send_update(b"u")
+    socket.gate.set()
+    await asyncio.wait_for(aborted.wait(), timeout=1)
+
+    await client.send_update(b"after")
+    assert client.depth == 0
+    await client.close()
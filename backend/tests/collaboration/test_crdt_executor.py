@@ -0,0 +1,47 @@
+import threading
+
+from collaboration.infrastructure.crdt_executor import CrdtExecutor
+from collaboration.infrastructure.yjs_adapter import (
+    apply_update,
+    create_doc,
+    encode_state_as_update,
+    get_text,
+)
+
+
+def _update(text: str) -> bytes:
+    doc = create_doc()
+    with doc.transaction():
+        doc["content"] += text
+    return encode_state_as_update(doc)
+
+
+async def test_small_work_stays_on_the_loop_and_large_work_does_not():
+    executor = CrdtExecutor(inline_max_bytes=100, threads=1)
+
+    assert await executor.run(10, threading.get_ident) == threading.get_ident()
+    assert await executor.run(1000, threading.get_ident) != threading.get_ident()
+    assert (executor.stats.inline, executor.stats.threaded) == (1, 1)
+    executor.shutdown()
+
+
+async def test_large_merges_run_in_a_worker_process():
+    executor = CrdtExecutor(inline_max_bytes=0, threads=1, processes=1)
+    first, second = _update("Hello " * 20), _update("world " * 20)
+
+    merged = await executor.merge([first, second])
+
+    doc = create_doc()
+    apply_update(doc, merged)
+    assert sorted(get_text(doc).split()) == sorted(("Hello " * 20 + "world " * 20).split())
+    assert executor.stats.processed == 1
+    executor.shutdown()
+
+
+async def test_merges_fall_back_to_threads_without_processes():
+    executor = CrdtExecutor(inline_max_bytes=0, threads=1)
+
+    await executor.merge([_update("a"), _update("b")])
+
+    assert (executor.stats.threaded, executor.stats.processed) == (1, 0)
+    executor.shutdown()
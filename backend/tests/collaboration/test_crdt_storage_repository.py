@@ -0,0 +1,114 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from auth.application.services import register_user
+from auth.infrastructure.user_repository import DbUserRepository
+from collaboration.domain.entities import CrdtSnapshot, CrdtUpdate
+from collaboration.infrastructure.blob_store import LocalBlobStore
+from collaboration.infrastructure.crdt_executor import CrdtExecutor
+from collaboration.infrastructure.crdt_storage_repository import DbCrdtStorageRepository
+from collaboration.infrastructure.models import CrdtSnapshotModel, CrdtUpdateModel
+from collaboration.infrastructure.storage_codec import MAGIC
+from documents.application.services import create_document
+from documents.infrastructure.document_repository import DbDocumentRepository
+
+
+@pytest.fixture
+async def user(db):
+    return await register_user(
+        DbUserRepository(db),
+        username="alice",
+        email="alice@example.com",
+        first_name="Alice",
+        last_name="Smith",
+        password="secret123",
+    )
+
+
+@pytest.fixture
+async def doc(db, user):
+    return await create_document(DbDocumentRepository(db), title="Test Doc", owner_id=user.id)
+
+
+@pytest.fixture
+def crdt_repo(db):
+    return DbCrdtStorageRepository(db)
+
+
+async def test_concurrent_writers_get_distinct_seqs(test_engine, doc):
+    session_factory = async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def allocate() -> int:
+        async with session_factory() as session:
+            seq = await DbCrdtStorageRepository(session).get_next_seq(doc.id)
+            await session.commit()
+            return seq
+
+    seqs = await asyncio.gather(*(allocate() for _ in range(10)))
+    assert sorted(seqs) == list(range(1, 11))
+
+
+async def test_blobs_are_stored_compressed(crdt_repo, doc, user, db):
+    snapshot = b"long-form chapter text " * 500
+
+    await crdt_repo.save_snapshot(CrdtSnapshot(doc.id, snapshot, b"\x00", update_seq=1))
+
+    stored = (await db.scalars(select(CrdtSnapshotModel.snapshot))).one()
+    assert stored.startswith(MAGIC) and len(stored) < len(snapshot) / 10
+    assert (await crdt_repo.get_latest_snapshot(doc.id)).snapshot == snapshot
+
+
+async def test_large_blobs_are_coded_off_the_event_loop(db, doc, user):
+    executor = CrdtExecutor(inline_max_bytes=4096, threads=1)
+    repo = DbCrdtStorageRepository(db, blob_store=None, executor=executor)
+    snapshot = b"long-form chapter text " * 500
+
+    await repo.save_snapshot(CrdtSnapshot(doc.id, snapshot, b"\x00", update_seq=1))
+    await repo.save_updates([CrdtUpdate(doc.id, b"small", update_seq=2, user_id=user.id)])
+    assert executor.stats.threaded == 1
+
+    assert (await repo.get_latest_snapshot(doc.id)).snapshot == snapshot
+    assert [u.update_data for u in await repo.get_updates_since(doc.id, 1)] == [b"small"]
+    # Sized by what the snapshot decodes to, not its compressed bytes
+    assert executor.stats.threaded == 2
+    executor.shutdown()
+
+
+async def test_rows_written_before_the_codec_stay_readable(crdt_repo, doc, user, db):
+    db.add(CrdtUpdateModel(document_id=doc.id, update_data=b"raw yjs", update_seq=1, user_id=user.id))
+    await db.commit()
+
+    assert [u.update_data for u in await crdt_repo.get_updates_since(doc.id, 0)] == [b"raw yjs"]
+
+
+async def test_large_snapshots_go_to_the_blob_store(db, doc, tmp_path):
+    store = LocalBlobStore(tmp_path)
+    repo = DbCrdtStorageRepository(db, blob_store=store, blob_threshold=1024)
+    large, small = b"x" * 4096, b"y" * 100
+
+    await repo.save_snapshot(CrdtSnapshot(doc.id, small, b"\x00", update_seq=1))
+    await repo.save_snapshot(CrdtSnapshot(doc.id, large, b"\x00", update_seq=2))
+
+    rows = (await db.execute(
+        select(CrdtSnapshotModel.snapshot, CrdtSnapshotModel.snapshot_ref)
+        .order_by(CrdtSnapshotModel.update_seq)
+    )).all()
+    assert rows[0].snapshot is not None and rows[0].snapshot_ref is None
+    assert rows[1].snapshot is None and store.path_of(rows[1].snapshot_ref).exists()
+    assert (await repo.get_latest_snapshot(doc.id)).snapshot == large
+
+
+async def test_identical_snapshots_share_one_blob(db, user, tmp_path):
+    repo = DbCrdtStorageRepository(db, blob_store=LocalBlobStore(tmp_path), blob_threshold=0)
+    fork = await create_document(DbDocumentRepository(db), title="Fork", owner_id=user.id)
+    original = await create_document(DbDocumentRepository(db), title="Original", owner_id=user.id)
+
+    for document in (original, fork):
+        await repo.save_snapshot(CrdtSnapshot(document.id, b"shared state", b"\x00", update_seq=1))
+
+    refs = (await db.scalars(select(CrdtSnapshotModel.snapshot_ref))).all()
+    assert len(refs) == 2 and refs[0] == refs[1]
+    assert len([p for p in tmp_path.rglob("*") if p.is_file()]) == 1
@@ -0,0 +1,166 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from collaboration.application.doc_registry import DocRegistry, LiveDoc
+from collaboration.infrastructure.crdt_executor import CrdtExecutor
+from collaboration.infrastructure.yjs_adapter import create_doc, encode_state_as_update, get_text
+
+
+def _update(text: str) -> bytes:
+    local = create_doc()
+    with local.transaction():
+        local["content"] += text
+    return encode_state_as_update(local)
+
+
+class CountingLoader:
+    def __init__(self, delay: float = 0):
+        self.calls = 0
+        self.delay = delay
+
+    async def __call__(self, document_id):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return create_doc(), 0
+
+
+async def test_concurrent_acquires_load_once():
+    registry = DocRegistry(max_bytes=1_000_000, max_docs=10)
+    loader = CountingLoader(delay=0.01)
+    document_id = uuid4()
+
+    lives = await asyncio.gather(*(registry.acquire(document_id, loader) for _ in range(30)))
+
+    assert loader.calls == 1
+    assert all(live is lives[0] for live in lives)
+    assert lives[0].refs == 30
+
+
+async def test_hot_document_served_from_memory():
+    registry = DocRegistry(max_bytes=1_000_000, max_docs=10)
+    loader = CountingLoader()
+    document_id = uuid4()
+
+    await registry.acquire(document_id, loader)
+    await registry.apply_update(document_id, _update("Hello"))
+    live = await registry.acquire(document_id, loader)
+
+    assert loader.calls == 1
+    assert get_text(live.doc) == "Hello"
+
+
+async def test_failed_load_is_not_cached():
+    registry = DocRegistry(max_bytes=1_000_000, max_docs=10)
+    document_id = uuid4()
+
+    async def failing(_):
+        raise RuntimeError("db down")
+
+    with pytest.raises(RuntimeError):
+        await registry.acquire(document_id, failing)
+
+    loader = CountingLoader()
+    await registry.acquire(document_id, loader)
+    assert loader.calls == 1
+
+
+async def test_follower_takes_over_a_cancelled_load():
+    registry = DocRegistry(max_bytes=1_000_000, max_docs=10)
+    loader = CountingLoader(delay=0.05)
+    document_id = uuid4()
+
+    leader = asyncio.create_task(registry.acquire(document_id, loader))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(registry.acquire(document_id, loader))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    live = await asyncio.wait_for(follower, timeout=1)
+    assert leader.cancelled()
+    assert loader.calls == 2
+    assert live.refs == 1
+
+
+async def test_evicts_least_recently_used_idle_doc():
+    registry = DocRegistry(max_bytes=1_000_000, max_docs=2)
+    loader = CountingLoader()
+    first, second, third = uuid4(), uuid4(), uuid4()
+
+    for document_id in (first, second):
+        await registry.acquire(document_id, loader)
+        registry.release(document_id)
+    await registry.acquire(first, loader)  # touch: second is now least recently used
+    await registry.acquire(third, loader)
+
+    assert first in registry
+    assert second not in registry
+    assert third in registry
+
+
+async def test_byte_budget_never_evicts_open_docs():
+    registry = DocRegistry(max_bytes=1, max_docs=10)
+    loader = CountingLoader()
+    document_id = uuid4()
+
+    await registry.acquire(document_id, loader)
+    await registry.apply_update(document_id, _update("over budget"))
+    assert document_id in registry
+
+    registry.release(document_id)
+    assert document_id not in registry
+    assert registry.total_bytes == 0
+
+
+async def test_apply_update_to_unloaded_doc_is_ignored():
+    registry = DocRegistry(max_bytes=1_000_000, max_docs=10)
+    assert await registry.apply_update(uuid4(), _update("x")) is False
+
+
+def test_seq_watermark_waits_for_gaps_to_fill():
+    live = LiveDoc(uuid4(), create_doc(), size=0, seq=10)
+
+    live.mark_applied(12, 13)
+    assert live.seq == 10
+    assert live.has_gap
+
+    live.mark_applied(11, 11)
+    assert live.seq == 13
+    assert not live.has_gap
+
+
+def test_mark_applied_through_skips_pruned_range():
+    live = LiveDoc(uuid4(), create_doc(), size=0, seq=3)
+    live.mark_applied(9, 9)
+    live.mark_applied(12, 12)
+
+    live.mark_applied_through(10)
+
+    assert live.seq == 10
+    assert live.ahead == {12}
+
+
+def test_mark_applied_through_closes_gap():
+    live = LiveDoc(uuid4(), create_doc(), size=0, seq=3)
+    live.mark_applied(6, 7)
+
+    live.mark_applied_through(5)
+
+    assert live.seq == 7
+    assert not live.has_gap
+
+
+async def test_offloaded_updates_are_applied_one_at_a_time():
+    executor = CrdtExecutor(inline_max_bytes=50, threads=4)
+    registry = DocRegistry(max_bytes=10_000_000, max_docs=10, executor=executor)
+    document_id = uuid4()
+    live = await registry.acquire(document_id, CountingLoader())
+    texts = ["x" * 200 if n % 2 else "y" for n in range(20)]
+
+    await asyncio.gather(*(registry.apply_update(document_id, _update(t)) for t in texts))
+
+    assert sorted(get_text(live.doc)) == sorted("".join(texts))
+    assert not live.lock.locked()
+    assert executor.stats.threaded >= 10
+    executor.shutdown()
@@ -0,0 +1,64 @@
+from uuid import uuid4
+
+import pytest
+
+from collaboration.infrastructure.envelope import (
+    AwarenessEnvelope,
+    RelayEnvelope,
+    UpdateEnvelope,
+    decode_envelope,
+    encode_envelope,
+)
+from shared.infrastructure.tracing import TraceContext
+
+
+def test_round_trip():
+    envelope = UpdateEnvelope(uuid4(), origin_connection=7, first_seq=41, last_seq=42, payload=b"yjs")
+    assert decode_envelope(encode_envelope(envelope)) == envelope
+
+
+def test_traced_round_trip():
+    trace = TraceContext(b"t" * 16, b"s" * 8, origin_ns=1_700_000_000_000_000_000)
+    envelope = UpdateEnvelope(uuid4(), 7, 41, 42, b"yjs", trace)
+
+    decoded = decode_envelope(encode_envelope(envelope))
+
+    assert decoded == envelope
+    assert decoded.trace.remote
+
+
+@pytest.mark.parametrize("trace", [None, TraceContext(b"t" * 16, b"s" * 8, origin_ns=1)])
+def test_relayed_round_trip(trace):
+    envelope = UpdateEnvelope(uuid4(), 7, 41, 42, b"yjs", trace, relayed_by=uuid4())
+    assert decode_envelope(encode_envelope(envelope)) == envelope
+
+
+def test_awareness_round_trip():
+    envelope = AwarenessEnvelope(uuid4(), payload=b"presence")
+    assert decode_envelope(encode_envelope(envelope)) == envelope
+
+
+def test_header_is_compact():
+    envelope = UpdateEnvelope(uuid4(), origin_connection=1, first_seq=1, last_seq=1, payload=b"")
+    assert len(encode_envelope(envelope)) == 30
+
+
+def test_rejects_truncated_and_unknown_versions():
+    data = encode_envelope(UpdateEnvelope(uuid4(), 1, 1, 1, b"x"))
+    with pytest.raises(ValueError):
+        decode_envelope(data[:10])
+    with pytest.raises(ValueError):
+        decode_envelope(data[:20])
+    with pytest.raises(ValueError):
+        decode_envelope(b"\x09" + data[1:])
+
+
+def test_rejects_unknown_kind():
+    data = encode_envelope(AwarenessEnvelope(uuid4(), b""))
+    with pytest.raises(ValueError):
+        decode_envelope(data[:1] + b"\x07" + data[2:])
+
+
+def test_relay_round_trip():
+    envelope = RelayEnvelope(uuid4(), uuid4(), origin_connection=3, user_id=uuid4(), payload=b"u")
+    assert decode_envelope(encode_envelope(envelope)) == envelope
@@ -0,0 +1,31 @@
+from collections import Counter
+from uuid import uuid4
+
+from collaboration.application.ownership import HashRing
+
+
+def test_empty_ring_has_no_owner():
+    assert HashRing().owner(uuid4()) is None
+
+
+def test_documents_spread_evenly():
+    nodes = [uuid4() for _ in range(4)]
+    ring = HashRing(nodes)
+
+    counts = Counter(ring.owner(uuid4()) for _ in range(20_000))
+
+    assert set(counts) == set(nodes)
+    assert all(3_500 < count < 6_500 for count in counts.values())
+
+
+def test_adding_a_node_only_moves_its_share():
+    nodes = [uuid4() for _ in range(4)]
+    documents = [uuid4() for _ in range(5_000)]
+    before = HashRing(nodes)
+    newcomer = uuid4()
+    after = HashRing([*nodes, newcomer])
+
+    moved = [d for d in documents if before.owner(d) != after.owner(d)]
+
+    assert all(after.owner(d) == newcomer for d in moved)
+    assert len(moved) < len(documents) * 0.3
@@ -0,0 +1,86 @@
+"""Check the storage queries are served by the composite indexes and pruned to one partition."""
+
+import re
+
+import pytest
+from sqlalchemy import event
+
+from auth.application.services import register_user
+from auth.infrastructure.user_repository import DbUserRepository
+from collaboration.domain.entities import CrdtSnapshot, CrdtUpdate
+from collaboration.infrastructure.crdt_storage_repository import DbCrdtStorageRepository
+from documents.application.services import create_document
+from documents.infrastructure.document_repository import DbDocumentRepository
+
+
+@pytest.fixture
+async def doc(db):
+    user = await register_user(
+        DbUserRepository(db),
+        username="alice",
+        email="alice@example.com",
+        first_name="Alice",
+        last_name="Smith",
+        password="secret123",
+    )
+    return await create_document(DbDocumentRepository(db), title="Test Doc", owner_id=user.id)
+
+
+@pytest.fixture
+async def crdt_repo(db, doc):
+    repo = DbCrdtStorageRepository(db)
+    seq = await repo.get_next_seq(doc.id)
+    await repo.save_update(CrdtUpdate(doc.id, b"u", update_seq=seq, user_id=doc.owner_id))
+    await repo.save_snapshot(CrdtSnapshot(doc.id, b"s", b"v", update_seq=seq))
+    return repo
+
+
+async def _explain(test_engine, call) -> list[str]:
+    """Run a repository call, then EXPLAIN every read/delete statement it issued."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "DELETE")):
+            statements.append((statement, parameters))
+
+    event.listen(test_engine.sync_engine, "before_cursor_execute", capture)
+    try:
+        await call()
+    finally:
+        event.remove(test_engine.sync_engine, "before_cursor_execute", capture)
+
+    plans = []
+    async with test_engine.connect() as conn:
+        # The tables are tiny, so stop the planner preferring a sequential scan
+        await conn.exec_driver_sql("SET enable_seqscan = off")
+        for statement, parameters in statements:
+            result = await conn.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+            plans.append("\n".join(row[0] for row in result))
+    return plans
+
+
+def _partitions(plan: str) -> set[str]:
+    return set(re.findall(r"document_updates_p\d+", plan))
+
+
+async def test_get_updates_since_prunes_to_one_partition(test_engine, crdt_repo, doc):
+    [plan] = await _explain(test_engine, lambda: crdt_repo.get_updates_since(doc.id, 0))
+    assert len(_partitions(plan)) == 1
+    assert "Seq Scan" not in plan
+
+
+async def test_delete_updates_before_prunes_to_one_partition(test_engine, crdt_repo, doc):
+    [plan] = await _explain(test_engine, lambda: crdt_repo.delete_updates_before(doc.id, 1))
+    assert len(_partitions(plan)) == 1
+    assert "Seq Scan" not in plan
+
+
+async def test_get_latest_snapshot_uses_composite_index(test_engine, crdt_repo, doc):
+    [plan] = await _explain(test_engine, lambda: crdt_repo.get_latest_snapshot(doc.id))
+    assert "ix_document_snapshots_document_seq" in plan
+    assert "Sort" not in plan
+
+
+async def test_get_current_seq_is_a_primary_key_lookup(test_engine, crdt_repo, doc):
+    [plan] = await _explain(test_engine, lambda: crdt_repo.get_current_seq(doc.id))
+    assert "document_update_seqs_pkey" in plan
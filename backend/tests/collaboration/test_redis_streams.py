@@ -0,0 +1,83 @@
+import asyncio
+from uuid import uuid4
+
+from fakeredis import FakeAsyncRedis, FakeServer
+from redis.exceptions import ConnectionError
+
+from collaboration.infrastructure.redis_streams import RedisStreamTransport
+
+
+class FlakyRedis:
+    """Delegates to a real client, but drops the connection on the next few reads."""
+
+    def __init__(self, redis, failures=0):
+        self._redis = redis
+        self.failures = failures
+
+    def __getattr__(self, name):
+        return getattr(self._redis, name)
+
+    async def xread(self, *args, **kwargs):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("connection reset")
+        return await self._redis.xread(*args, **kwargs)
+
+
+async def _collect(transport, document_id):
+    received = []
+
+    async def callback(data):
+        received.append(data)
+
+    task = await transport.subscribe(document_id, callback)
+    return received, task
+
+
+async def _stop(task):
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+
+async def test_subscriber_only_sees_entries_after_it_joined():
+    server = FakeServer()
+    publisher = RedisStreamTransport(FakeAsyncRedis(server=server), maxlen=100)
+    document_id = uuid4()
+    await publisher.publish(document_id, [b"old"])
+
+    received, task = await _collect(
+        RedisStreamTransport(FakeAsyncRedis(server=server), maxlen=100), document_id
+    )
+    await publisher.publish(document_id, [b"a", b"b"])
+    await asyncio.sleep(0.05)
+
+    assert received == [b"a", b"b"]
+    await _stop(task)
+
+
+async def test_resumes_from_last_seen_entry_after_a_dropped_connection():
+    server = FakeServer()
+    publisher = RedisStreamTransport(FakeAsyncRedis(server=server), maxlen=100)
+    flaky = FlakyRedis(FakeAsyncRedis(server=server))
+    document_id = uuid4()
+    received, task = await _collect(RedisStreamTransport(flaky, maxlen=100), document_id)
+
+    await publisher.publish(document_id, [b"before"])
+    await asyncio.sleep(0.05)
+    flaky.failures = 2
+    await publisher.publish(document_id, [b"during-1", b"during-2"])
+    await asyncio.sleep(0.5)
+
+    assert received == [b"before", b"during-1", b"during-2"]
+    await _stop(task)
+
+
+async def test_streams_are_capped():
+    redis = FakeAsyncRedis()
+    transport = RedisStreamTransport(redis, maxlen=10)
+    document_id = uuid4()
+
+    await transport.publish(document_id, [b"u"] * 1000)
+
+    # Approximate trimming drops whole radix-tree nodes, not single entries
+    assert await redis.xlen(f"doc:{document_id}:stream") <= 200
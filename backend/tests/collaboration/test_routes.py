@@ -0,0 +1,26 @@
+import pytest
+
+from collaboration.interfaces import ws_handler
+from shared.config import settings
+
+
+@pytest.mark.anyio
+async def test_owner_lookup_without_ownership_points_at_any_node(client, auth_headers):
+    document_id = "00000000-0000-0000-0000-000000000001"
+
+    response = await client.get(
+        f"/api/collaboration/documents/{document_id}/owner", headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"document_id": document_id, "address": settings.NODE_ADDRESS}
+    assert str(ws_handler._hub.node_id) not in response.text
+
+
+@pytest.mark.anyio
+async def test_owner_lookup_requires_auth(client):
+    document_id = "00000000-0000-0000-0000-000000000001"
+
+    response = await client.get(f"/api/collaboration/documents/{document_id}/owner")
+
+    assert response.status_code == 401
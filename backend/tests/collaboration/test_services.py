@@ -1,12 +1,17 @@
 import pytest
+from prometheus_client import REGISTRY
 
 from auth.application.services import register_user
 from auth.infrastructure.user_repository import DbUserRepository
 from collaboration.application.services import (
     create_snapshot,
+    load_document,
     load_document_state,
+    load_missing,
     persist_update,
+    persist_updates,
 )
+from collaboration.application.snapshot_policy import SnapshotPolicy
 from collaboration.infrastructure.crdt_storage_repository import DbCrdtStorageRepository
 from collaboration.infrastructure.yjs_adapter import create_doc, encode_state_as_update, get_text
 from documents.application.services import create_document
@@ -105,3 +110,115 @@ async def test_snapshot_then_more_updates(crdt_repo, doc, user):
 
     loaded = await load_document_state(crdt_repo, doc.id)
     assert get_text(loaded) == "Before After"
+
+
+async def test_persist_updates_batch(crdt_repo, doc, user):
+    local = create_doc()
+    batch = []
+    for word in ("One", " Two", " Three"):
+        with local.transaction():
+            local["content"] += word
+        batch.append((user.id, encode_state_as_update(local)))
+
+    saved = await persist_updates(crdt_repo, doc.id, batch)
+    assert [u.update_seq for u in saved] == [1, 2, 3]
+    assert all(u.id is not None for u in saved)
+
+    loaded = await load_document_state(crdt_repo, doc.id)
+    assert get_text(loaded) == "One Two Three"
+
+
+async def test_load_replays_tail_in_chunks(crdt_repo, doc, user, monkeypatch):
+    monkeypatch.setattr("collaboration.application.services.REPLAY_CHUNK_SIZE", 2)
+    local = create_doc()
+    for word in ("One ", "Two ", "Three ", "Four ", "Five"):
+        before = local.get_state()
+        with local.transaction():
+            local["content"] += word
+        await persist_update(crdt_repo, doc.id, user.id, local.get_update(before))
+
+    loaded, seq = await load_document(crdt_repo, doc.id)
+
+    assert get_text(loaded) == "One Two Three Four Five"
+    assert seq == 5
+
+
+async def test_load_reports_replayed_tail_to_policy(crdt_repo, doc, user):
+    for text in ("a", "b"):
+        local = create_doc()
+        with local.transaction():
+            local["content"] += text
+        await persist_update(crdt_repo, doc.id, user.id, encode_state_as_update(local))
+    policy = SnapshotPolicy(
+        replay_budget=1.0, max_pending_bytes=10**9, max_pending_updates=10**9,
+        idle_backoff=3600, max_backoff=1,
+    )
+
+    await load_document(crdt_repo, doc.id, policy)
+
+    assert policy.estimated_replay(doc.id) > 0
+    await create_snapshot(crdt_repo, doc.id)
+    await load_document(crdt_repo, doc.id, policy)
+    assert policy.estimated_replay(doc.id) == 0
+
+
+async def test_persisting_and_loading_are_measured(crdt_repo, doc, user):
+    def count(name):
+        return REGISTRY.get_sample_value(f"{name}_count") or 0
+
+    persists, loads = count("cms_persist_seconds"), count("cms_document_load_seconds")
+    local = create_doc()
+    with local.transaction():
+        local["content"] += "measured"
+    await persist_updates(crdt_repo, doc.id, [(user.id, encode_state_as_update(local))] * 2)
+    await load_document(crdt_repo, doc.id)
+
+    assert count("cms_persist_seconds") == persists + 1
+    assert count("cms_document_load_seconds") == loads + 1
+    assert REGISTRY.get_sample_value("cms_persist_batch_size_sum") >= 2
+
+
+async def test_persist_update_does_not_snapshot_inline(crdt_repo, doc, user):
+    local = create_doc()
+    with local.transaction():
+        local["content"] += "a"
+    await persist_update(crdt_repo, doc.id, user.id, encode_state_as_update(local))
+
+    assert await crdt_repo.get_latest_snapshot(doc.id) is None
+
+
+async def test_incremental_snapshot_keeps_deletions(crdt_repo, doc, user):
+    local = create_doc()
+    with local.transaction():
+        local["content"] += "Hello brave world"
+    await persist_update(crdt_repo, doc.id, user.id, encode_state_as_update(local))
+    await create_snapshot(crdt_repo, doc.id)
+
+    state_before = local.get_state()
+    with local.transaction():
+        del local["content"][5:11]
+    await persist_update(crdt_repo, doc.id, user.id, local.get_update(state_before))
+    snapshot = await create_snapshot(crdt_repo, doc.id)
+
+    assert snapshot.update_seq == 2
+    assert await crdt_repo.get_updates_since(doc.id, 0) == []
+    loaded = await load_document_state(crdt_repo, doc.id)
+    assert get_text(loaded) == "Hello world"
+
+
+async def test_load_missing_skips_to_snapshot_past_watermark(crdt_repo, doc, user):
+    for text in ("a", "b", "c"):
+        local = create_doc()
+        with local.transaction():
+            local["content"] += text
+        await persist_update(crdt_repo, doc.id, user.id, encode_state_as_update(local))
+        if text == "b":
+            await create_snapshot(crdt_repo, doc.id)
+
+    snapshot, updates = await load_missing(crdt_repo, doc.id, since_seq=1)
+    assert snapshot is not None and snapshot.update_seq == 2
+    assert [u.update_seq for u in updates] == [3]
+
+    snapshot, updates = await load_missing(crdt_repo, doc.id, since_seq=2)
+    assert snapshot is None
+    assert [u.update_seq for u in updates] == [3]
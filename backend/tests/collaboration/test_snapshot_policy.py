@@ -0,0 +1,89 @@
+from uuid import uuid4
+
+from collaboration.application import snapshot_policy
+from collaboration.application.snapshot_policy import SnapshotPolicy, SnapshotReason
+from collaboration.domain.entities import CrdtUpdate
+
+
+def _policy(**overrides) -> SnapshotPolicy:
+    options = dict(
+        replay_budget=0.010,
+        max_pending_bytes=1_000_000,
+        max_pending_updates=1_000,
+        idle_backoff=60,
+        max_backoff=8,
+    )
+    return SnapshotPolicy(**(options | overrides))
+
+
+def _updates(count: int, size: int) -> list[CrdtUpdate]:
+    return [CrdtUpdate(uuid4(), b"x" * size, update_seq=i, user_id=uuid4()) for i in range(count)]
+
+
+def test_small_edits_do_not_snapshot_where_a_paste_does():
+    policy, doc = _policy(), uuid4()
+    # 10 ms at 1 µs/byte is 10 KB of tail
+    policy.loaded(doc, 1, 1000, seconds=0.001)
+
+    assert policy.record(doc, _updates(50, 20)) is None
+    assert policy.record(doc, _updates(1, 20_000)) == SnapshotReason.REPLAY_BUDGET
+    assert policy.reasons[SnapshotReason.REPLAY_BUDGET] == 1
+
+
+def test_tail_starts_over_once_a_snapshot_is_due():
+    policy, doc = _policy(), uuid4()
+    policy.loaded(doc, 1, 1000, seconds=0.001)
+
+    assert policy.record(doc, _updates(1, 20_000)) is not None
+    assert policy.estimated_replay(doc) == 0
+    assert policy.record(doc, _updates(1, 100)) is None
+
+
+def test_unmeasured_documents_use_the_process_wide_rate():
+    policy = _policy()
+    policy.loaded(uuid4(), 1, 1000, seconds=0.001)
+    policy.loaded(uuid4(), 1, 1000, seconds=0.001)
+
+    fresh = uuid4()
+    policy.record(fresh, _updates(1, 1000))
+
+    default = 1000 / snapshot_policy.DEFAULT_REPLAY_BYTES_PER_SECOND
+    assert default < policy.estimated_replay(fresh) < 1000 * 1e-6
+
+
+def test_hard_caps_fire_with_their_own_reason():
+    policy = _policy(replay_budget=1e9, max_pending_updates=10, max_pending_bytes=5_000)
+
+    assert policy.record(uuid4(), _updates(10, 1)) == SnapshotReason.PENDING_UPDATES
+    assert policy.record(uuid4(), _updates(1, 5_000)) == SnapshotReason.PENDING_BYTES
+
+
+def test_budget_backs_off_for_rarely_opened_documents(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(snapshot_policy.time, "monotonic", lambda: now[0])
+    policy, doc = _policy(), uuid4()
+    policy.opened(doc)
+
+    # One long session is not idleness
+    now[0] += 3600
+    assert policy.budget(doc) == 0.010
+
+    policy.opened(doc)  # reopened after an hour
+    assert policy.budget(doc) == 0.080  # capped at max_backoff
+    for _ in range(10):  # then opened every few seconds
+        now[0] += 10
+        policy.opened(doc)
+    assert policy.budget(doc) == 0.010
+
+
+def test_other_nodes_updates_count_toward_the_tail():
+    policy, doc = _policy(), uuid4()
+    policy.loaded(doc, 1, 1000, seconds=0.001)
+
+    policy.observe(doc, nbytes=8_000, updates=30)
+    assert policy.record(doc, _updates(1, 2_000)) == SnapshotReason.REPLAY_BUDGET
+
+    # When another node's update crosses the limit, that node snapshots; this one starts over
+    policy.observe(doc, nbytes=20_000, updates=1)
+    assert policy.estimated_replay(doc) == 0
+    assert policy.reasons[SnapshotReason.REPLAY_BUDGET] == 1
@@ -0,0 +1,66 @@
+import asyncio
+import sqlite3
+from uuid import uuid4
+
+import pytest
+
+from collaboration.application.services import create_snapshot, persist_updates
+from collaboration.domain.entities import CrdtUpdate
+from collaboration.infrastructure.crdt_executor import CrdtExecutor
+from collaboration.infrastructure.sqlite_storage_repository import SqliteCrdtStorageRepository
+from collaboration.infrastructure.storage import create_repository
+
+
+async def test_updates_survive_reopening_the_file(tmp_path):
+    path = str(tmp_path / "crdt.sqlite3")
+    document_id, user_id = uuid4(), uuid4()
+    repo = SqliteCrdtStorageRepository(path, blob_store=None)
+    await repo.save_update(CrdtUpdate(document_id, b"chapter one " * 50, 1, user_id))
+    await repo.get_next_seq(document_id)
+    repo.close()
+
+    reopened = SqliteCrdtStorageRepository(path, blob_store=None)
+    updates = await reopened.get_updates_since(document_id, 0)
+    reopened.close()
+
+    assert [u.update_data for u in updates] == [b"chapter one " * 50]
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        stored = conn.execute("SELECT update_data FROM document_updates").fetchone()[0]
+    assert len(stored) < 600  # compressed like on PostgreSQL
+
+
+class _HeldExecutor(CrdtExecutor):
+    """Holds the first call until released, as a large encode on a busy thread pool would."""
+
+    def __init__(self):
+        super().__init__(inline_max_bytes=0, threads=1)
+        self.entered, self.released = asyncio.Event(), asyncio.Event()
+
+    async def run(self, size, fn, *args):
+        if not self.entered.is_set():
+            self.entered.set()
+            await self.released.wait()
+        return fn(*args)
+
+
+async def test_snapshot_never_covers_a_seq_still_being_written(tmp_path):
+    executor = _HeldExecutor()
+    repo = SqliteCrdtStorageRepository(str(tmp_path / "crdt.sqlite3"), blob_store=None, executor=executor)
+    document_id, user_id = uuid4(), uuid4()
+    persisting = asyncio.create_task(persist_updates(repo, document_id, [(user_id, b"edit")]))
+    await executor.entered.wait()
+
+    # Compacting now must leave the seq being encoded to the next snapshot
+    snapshot = await create_snapshot(repo, document_id, executor=executor)
+    executor.released.set()
+    await persisting
+
+    assert snapshot.update_seq == 0
+    assert [u.update_seq for u in await repo.get_updates_since(document_id, 0)] == [1]
+    repo.close()
+
+
+def test_unknown_storage_is_rejected():
+    with pytest.raises(ValueError):
+        create_repository("mongodb", sqlite_path="")
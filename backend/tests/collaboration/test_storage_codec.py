@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from collaboration.infrastructure.storage_codec import MAGIC, StorageCodec, train_dictionary
+from collaboration.infrastructure.yjs_adapter import create_doc, encode_state_as_update
+
+
+def _document(paragraphs: int) -> bytes:
+    doc = create_doc()
+    with doc.transaction():
+        for n in range(paragraphs):
+            doc["content"] += f"Paragraph {n}: the quick brown fox jumps over the lazy dog.\n"
+    return encode_state_as_update(doc)
+
+
+def _edits(count: int) -> list[bytes]:
+    """Words typed at random places in a growing document, one update each."""
+    rng = random.Random(7)
+    doc = create_doc()
+    updates = []
+    for _ in range(count):
+        before = doc.get_state()
+        with doc.transaction():
+            text = doc["content"]
+            text.insert(rng.randint(0, len(text)), rng.choice(["lorem ", "ipsum ", "dolor "]))
+        updates.append(doc.get_update(before))
+    return updates
+
+
+def test_large_blobs_are_compressed():
+    codec = StorageCodec()
+    snapshot = _document(500)
+
+    blob = codec.encode(snapshot)
+
+    assert blob.startswith(MAGIC)
+    assert len(blob) < len(snapshot) / 3
+    assert codec.decode(blob) == snapshot
+    assert codec.decoded_size(blob) == len(snapshot)
+
+
+def test_small_blobs_round_trip_uncompressed():
+    codec = StorageCodec()
+    assert codec.decode(codec.encode(b"\x00\x00")) == b"\x00\x00"
+
+
+def test_legacy_raw_rows_stay_readable():
+    snapshot = _document(10)
+    assert StorageCodec().decode(snapshot) == snapshot
+
+
+def test_dictionary_helps_small_updates_and_old_ones_stay_readable():
+    samples = _edits(2_000)
+    old, new = StorageCodec(), StorageCodec(dictionaries=[train_dictionary(samples[:1_000], 4096)])
+    updates = samples[1_000:1_100]
+
+    old_blobs = [old.encode(u) for u in updates]
+    new_blobs = [new.encode(u) for u in updates]
+
+    assert sum(map(len, new_blobs)) < sum(map(len, old_blobs))
+    assert [new.decode(b) for b in old_blobs + new_blobs] == updates + updates
+
+
+def test_missing_dictionary_is_an_error():
+    samples = _edits(1_000)
+    with_dict = StorageCodec(dictionaries=[train_dictionary(samples, 4096)])
+    blob = with_dict.encode(samples[-1] * 4)
+
+    with pytest.raises(ValueError):
+        StorageCodec().decode(blob)
+
+
+def test_unknown_format_version_is_an_error():
+    blob = StorageCodec().encode(_document(50))
+    with pytest.raises(ValueError):
+        StorageCodec().decode(MAGIC + b"\x09" + blob[len(MAGIC) + 1 :])
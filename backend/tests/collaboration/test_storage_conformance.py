@@ -0,0 +1,153 @@
+"""Behaviour every CrdtStorageRepository must share, run against each implementation."""
+
+import asyncio
+from uuid import uuid4
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from auth.application.services import register_user
+from auth.infrastructure.user_repository import DbUserRepository
+from collaboration.application.services import create_snapshot, load_document, persist_updates
+from collaboration.domain.entities import CrdtSnapshot, CrdtUpdate
+from collaboration.infrastructure.crdt_storage_repository import DbCrdtStorageRepository
+from collaboration.infrastructure.memory_storage_repository import MemoryCrdtStorageRepository
+from collaboration.infrastructure.sqlite_storage_repository import SqliteCrdtStorageRepository
+from collaboration.infrastructure.yjs_adapter import create_doc, encode_state_as_update, get_text
+from documents.application.services import create_document
+from documents.infrastructure.document_repository import DbDocumentRepository
+from shared.exceptions import ConflictError
+
+
+@pytest.fixture(params=["postgres", "sqlite", "memory"])
+def repo(request, tmp_path):
+    if request.param == "postgres":
+        yield DbCrdtStorageRepository(request.getfixturevalue("db"), blob_store=None)
+    elif request.param == "sqlite":
+        repo = SqliteCrdtStorageRepository(str(tmp_path / "crdt.sqlite3"), blob_store=None)
+        yield repo
+        repo.close()
+    else:
+        yield MemoryCrdtStorageRepository()
+
+
+@pytest.fixture
+async def storage(repo):
+    """(repository, a document id it can store under, a user id)"""
+    if not isinstance(repo, DbCrdtStorageRepository):
+        return repo, uuid4(), uuid4()
+    user = await register_user(
+        DbUserRepository(repo.session), username="alice", email="alice@example.com",
+        first_name="Alice", last_name="Smith", password="secret123",
+    )
+    doc = await create_document(DbDocumentRepository(repo.session), title="Doc", owner_id=user.id)
+    return repo, doc.id, user.id
+
+
+def _update(document_id, user_id, seq, data=None):
+    return CrdtUpdate(document_id, data or bytes([seq]) * 10, update_seq=seq, user_id=user_id)
+
+
+def _edit(text: str) -> bytes:
+    doc = create_doc()
+    doc["content"] += text
+    return encode_state_as_update(doc)
+
+
+async def test_next_seq_reserves_blocks(storage):
+    repo, document_id, _ = storage
+    assert await repo.get_current_seq(document_id) == 0
+    assert await repo.get_next_seq(document_id) == 1
+    assert await repo.get_next_seq(document_id, count=5) == 2
+    assert await repo.get_next_seq(document_id) == 7
+    assert await repo.get_current_seq(document_id) == 7
+
+
+async def test_append_numbers_updates_after_reserved_seqs(storage):
+    repo, document_id, user_id = storage
+    await repo.get_next_seq(document_id, count=2)
+
+    saved = await repo.append_updates(document_id, [(user_id, b"a"), (user_id, b"b")])
+
+    assert [(u.update_seq, u.update_data) for u in saved] == [(3, b"a"), (4, b"b")]
+    assert [u.update_seq for u in await repo.get_updates_since(document_id, 0)] == [3, 4]
+    assert await repo.get_current_seq(document_id) == 4
+
+
+async def test_concurrent_seq_reservations_never_overlap(storage):
+    repo, document_id, _ = storage
+    if isinstance(repo, DbCrdtStorageRepository):
+        pytest.skip("one session; covered with separate sessions in test_crdt_storage_repository")
+
+    firsts = await asyncio.gather(*(repo.get_next_seq(document_id, count=3) for _ in range(10)))
+
+    assert sorted(firsts) == list(range(1, 31, 3))
+
+
+async def test_saved_updates_read_back_in_seq_order(storage):
+    repo, document_id, user_id = storage
+
+    saved = await repo.save_updates([_update(document_id, user_id, seq) for seq in (3, 4)])
+    await repo.save_update(_update(document_id, user_id, 1))
+    await repo.save_update(_update(document_id, user_id, 2))
+
+    assert all(u.id is not None and u.created_at is not None for u in saved)
+    updates = await repo.get_updates_since(document_id, 0)
+    assert [u.update_seq for u in updates] == [1, 2, 3, 4]
+    assert updates[2].update_data == bytes([3]) * 10 and updates[2].user_id == user_id
+    assert [u.update_seq for u in await repo.get_updates_since(document_id, 2)] == [3, 4]
+
+
+async def test_duplicate_seq_is_rejected(storage):
+    repo, document_id, user_id = storage
+    await repo.save_update(_update(document_id, user_id, 1, b"a"))
+
+    with pytest.raises((ConflictError, IntegrityError)):
+        await repo.save_update(_update(document_id, user_id, 1, b"b"))
+
+
+async def test_stream_updates_since_yields_bounded_chunks(storage):
+    repo, document_id, user_id = storage
+    await repo.save_updates([_update(document_id, user_id, seq) for seq in range(1, 8)])
+
+    chunks = [chunk async for chunk in repo.stream_updates_since(document_id, 2, chunk_size=2)]
+
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [seq for chunk in chunks for seq, _ in chunk] == [3, 4, 5, 6, 7]
+    assert chunks[0][0][1] == bytes([3]) * 10
+
+
+async def test_latest_snapshot_and_pruning(storage):
+    repo, document_id, user_id = storage
+    assert await repo.get_latest_snapshot(document_id) is None
+    await repo.save_updates([_update(document_id, user_id, seq) for seq in range(1, 6)])
+
+    for seq in (2, 4):
+        await repo.save_snapshot(CrdtSnapshot(document_id, bytes([seq]) * 50, b"\x00", update_seq=seq))
+    await repo.delete_updates_before(document_id, 4)
+
+    latest = await repo.get_latest_snapshot(document_id)
+    assert (latest.update_seq, latest.snapshot) == (4, bytes([4]) * 50)
+    assert [u.update_seq for u in await repo.get_updates_since(document_id, 0)] == [5]
+
+
+async def test_documents_do_not_share_state(storage):
+    repo, document_id, user_id = storage
+    other = uuid4()
+    await repo.save_update(_update(document_id, user_id, 1))
+
+    assert await repo.get_updates_since(other, 0) == []
+    assert await repo.get_current_seq(other) == 0
+    assert await repo.get_latest_snapshot(other) is None
+
+
+async def test_document_survives_persist_compact_and_reload(storage):
+    repo, document_id, user_id = storage
+    await persist_updates(repo, document_id, [(user_id, _edit("Hello "))])
+    await create_snapshot(repo, document_id)
+    await persist_updates(repo, document_id, [(user_id, _edit("world"))])
+
+    doc, seq = await load_document(repo, document_id)
+
+    assert sorted(get_text(doc)) == sorted("Hello world")
+    assert seq == 2
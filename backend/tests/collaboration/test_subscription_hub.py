@@ -0,0 +1,322 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from fakeredis import FakeAsyncRedis, FakeServer
+
+from collaboration.infrastructure.envelope import RelayEnvelope, UpdateEnvelope
+from collaboration.infrastructure.local_transport import LocalTransport
+from collaboration.infrastructure.redis_pubsub import RedisPubSubTransport
+from collaboration.infrastructure.replication import create_transport
+from collaboration.infrastructure.subscription_hub import SubscriptionHub
+from shared.infrastructure.tracing import TraceContext
+
+
+class FakeSocket:
+    def __init__(self):
+        self.received = []
+        self.awareness = []
+        self.traces = []
+
+    async def send_update(self, update: bytes, trace=None) -> None:
+        self.received.append(update)
+        self.traces.append(trace)
+
+    async def send_awareness(self, update: bytes) -> None:
+        self.awareness.append(update)
+
+
+@pytest.fixture
+def server():
+    return FakeServer()
+
+
+@pytest.fixture(params=["pubsub", "streams", "local"])
+def transport(request, server):
+    """A fresh connection to the shared fake Redis per node, or one shared in-process transport."""
+    if request.param == "local":
+        local = create_transport("local", FakeAsyncRedis(server=server), stream_maxlen=100)
+        return lambda: local
+    return lambda: create_transport(request.param, FakeAsyncRedis(server=server), stream_maxlen=100)
+
+
+async def _settle():
+    await asyncio.sleep(0.05)
+
+
+def _envelope(hub, seq, payload):
+    return UpdateEnvelope(hub.node_id, 1, seq, seq, payload)
+
+
+async def test_local_peers_get_each_update_once(transport):
+    hub = SubscriptionHub(transport())
+    document_id = uuid4()
+    sender, peers = FakeSocket(), [FakeSocket() for _ in range(3)]
+    for socket in (sender, *peers):
+        await hub.join(document_id, socket)
+
+    await hub.fan_out(document_id, b"update", exclude=sender)
+    await hub.publish(document_id, [_envelope(hub, 1, b"update")])
+    await _settle()
+
+    assert sender.received == []
+    assert all(peer.received == [b"update"] for peer in peers)
+
+
+async def test_remote_updates_reach_every_local_socket(transport):
+    remote_applied = []
+
+    async def on_remote(document_id, envelope):
+        remote_applied.append(envelope)
+
+    local = SubscriptionHub(transport(), on_remote=on_remote)
+    remote = SubscriptionHub(transport())
+    document_id = uuid4()
+    sockets = [FakeSocket() for _ in range(3)]
+    for socket in sockets:
+        await local.join(document_id, socket)
+    remote_sender = FakeSocket()
+    await remote.join(document_id, remote_sender)
+
+    await remote.publish(document_id, [_envelope(remote, 5, b"from-remote")])
+    await _settle()
+
+    assert all(socket.received == [b"from-remote"] for socket in sockets)
+    assert [(e.origin_node, e.first_seq) for e in remote_applied] == [(remote.node_id, 5)]
+    assert remote_sender.received == []
+
+
+async def test_failed_message_does_not_end_the_subscription(transport):
+    async def on_remote(document_id, envelope):
+        if envelope.payload == b"malformed":
+            raise ValueError("not a Yjs update")
+
+    local = SubscriptionHub(transport(), on_remote=on_remote)
+    remote = SubscriptionHub(transport())
+    document_id = uuid4()
+    socket = FakeSocket()
+    await local.join(document_id, socket)
+    await remote.join(document_id, FakeSocket())
+
+    await remote.publish(document_id, [_envelope(remote, 1, b"malformed")])
+    await remote.publish(document_id, [_envelope(remote, 2, b"good")])
+    await _settle()
+
+    assert socket.received == [b"good"]
+
+
+async def test_trace_context_crosses_nodes(transport):
+    local = SubscriptionHub(transport())
+    remote = SubscriptionHub(transport())
+    document_id = uuid4()
+    socket = FakeSocket()
+    await local.join(document_id, socket)
+    await remote.join(document_id, FakeSocket())
+    trace = TraceContext(b"t" * 16, b"s" * 8, origin_ns=123)
+
+    envelope = UpdateEnvelope(remote.node_id, 1, 1, 1, b"traced", trace)
+    await remote.publish(document_id, [envelope])
+    await _settle()
+
+    assert socket.traces == [trace]
+    assert socket.traces[0].remote
+
+
+async def test_one_redis_subscription_per_document(server):
+    redis = FakeAsyncRedis(server=server)
+    hub = SubscriptionHub(RedisPubSubTransport(redis))
+    document_id = uuid4()
+    channel = f"doc:{document_id}:updates"
+    first, second = FakeSocket(), FakeSocket()
+
+    await hub.join(document_id, first)
+    await hub.join(document_id, second)
+    assert (await redis.pubsub_numsub(channel))[0][1] == 1
+
+    await hub.leave(document_id, first)
+    assert (await redis.pubsub_numsub(channel))[0][1] == 1
+
+    await hub.leave(document_id, second)
+    await _settle()
+    assert (await redis.pubsub_numsub(channel))[0][1] == 0
+    assert hub.subscriber_count(document_id) == 0
+
+
+class _FlakyTransport(LocalTransport):
+    """Fails the first subscribe, as Redis being down would."""
+
+    def __init__(self):
+        super().__init__()
+        self.failures = 1
+
+    async def subscribe(self, document_id, callback):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("redis is down")
+        return await super().subscribe(document_id, callback)
+
+
+async def test_failed_subscribe_leaves_no_subscriber_behind():
+    hub = SubscriptionHub(_FlakyTransport())
+    document_id = uuid4()
+
+    with pytest.raises(ConnectionError):
+        await hub.join(document_id, FakeSocket())
+    assert hub.subscriber_count(document_id) == 0
+
+    socket = FakeSocket()
+    await hub.join(document_id, socket)
+    await hub.leave(document_id, socket)
+    assert hub.subscriber_count(document_id) == 0
+
+
+class _StallingTransport(LocalTransport):
+    """Holds subscribes to one document until released, as a slow Redis round trip would."""
+
+    def __init__(self, stalled):
+        super().__init__()
+        self.stalled, self.released = stalled, asyncio.Event()
+
+    async def subscribe(self, document_id, callback):
+        if document_id == self.stalled:
+            await self.released.wait()
+        return await super().subscribe(document_id, callback)
+
+
+async def test_slow_subscribe_holds_up_only_its_own_document():
+    slow, fast = uuid4(), uuid4()
+    transport = _StallingTransport(slow)
+    hub = SubscriptionHub(transport)
+
+    joining = asyncio.create_task(hub.join(slow, FakeSocket()))
+    await asyncio.wait_for(hub.join(fast, FakeSocket()), timeout=1)
+    assert not joining.done()
+
+    transport.released.set()
+    await joining
+    assert hub.subscriber_count(slow) == hub.subscriber_count(fast) == 1
+    assert hub._locks == {}
+
+
+async def test_awareness_crosses_nodes_without_echo(transport):
+    remote_seen = []
+
+    async def on_remote_awareness(document_id, update):
+        remote_seen.append(update)
+
+    first = SubscriptionHub(transport(), on_remote_awareness=on_remote_awareness)
+    second = SubscriptionHub(transport())
+    document_id = uuid4()
+    local, remote = FakeSocket(), FakeSocket()
+    await first.join(document_id, local)
+    await second.join(document_id, remote)
+
+    await second.publish_awareness(document_id, b"cursor")
+    await _settle()
+
+    assert local.awareness == [b"cursor"]
+    assert remote.awareness == []
+    assert remote_seen == [b"cursor"]
+    assert local.received == remote.received == []
+
+
+async def test_relayed_updates_reach_only_the_owners_inbox(transport):
+    relayed = []
+
+    async def on_relay(envelope):
+        relayed.append(envelope)
+
+    owner = SubscriptionHub(transport(), on_relay=on_relay)
+    bystander = SubscriptionHub(transport(), on_relay=on_relay)
+    relayer = SubscriptionHub(transport())
+    await owner.open_inbox()
+    await bystander.open_inbox()
+    envelope = RelayEnvelope(relayer.node_id, uuid4(), 1, uuid4(), b"update")
+
+    await relayer.relay(owner.node_id, [envelope])
+    await _settle()
+
+    assert relayed == [envelope]
+    await owner.close_inbox()
+    await bystander.close_inbox()
+
+
+@pytest.mark.parametrize("kind", ["pubsub", "local"])
+async def test_relay_reports_an_inbox_nobody_reads(server, kind):
+    transport = create_transport(kind, FakeAsyncRedis(server=server), stream_maxlen=100)
+    owner = SubscriptionHub(transport)
+    relayer = SubscriptionHub(transport)
+    envelope = RelayEnvelope(relayer.node_id, uuid4(), 1, uuid4(), b"update")
+
+    assert not await relayer.relay(owner.node_id, [envelope])
+    await owner.open_inbox()
+    assert await relayer.relay(owner.node_id, [envelope])
+    await owner.close_inbox()
+
+
+async def test_local_transport_hands_over_envelope_objects():
+    transport = LocalTransport()
+    hub = SubscriptionHub(transport)
+    document_id = uuid4()
+    received = []
+
+    async def record(message):
+        received.append(message)
+
+    task = await transport.subscribe(document_id, record)
+    envelope = _envelope(hub, 1, b"update")
+    await hub.publish(document_id, [envelope])
+    await _settle()
+
+    assert received == [envelope]
+    assert received[0] is envelope
+    task.cancel()
+
+
+async def test_local_transport_unsubscribes_on_cancel():
+    transport = LocalTransport()
+    document_id = uuid4()
+    received = []
+
+    async def record(message):
+        received.append(message)
+
+    task = await transport.subscribe(document_id, record)
+    await transport.publish(document_id, [b"first", b"second"])
+    await _settle()
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await transport.publish(document_id, [b"third"])
+    await _settle()
+
+    assert received == [b"first", b"second"]
+    assert transport._queues == {}
+
+
+async def test_owner_republish_skips_the_relaying_nodes_sockets(transport):
+    remote_applied = []
+
+    async def on_remote(document_id, envelope):
+        remote_applied.append(envelope.first_seq)
+
+    owner = SubscriptionHub(transport())
+    relayer = SubscriptionHub(transport(), on_remote=on_remote)
+    bystander = SubscriptionHub(transport())
+    document_id = uuid4()
+    author, relayer_peer, owner_socket, bystander_socket = (FakeSocket() for _ in range(4))
+    await relayer.join(document_id, author)
+    await relayer.join(document_id, relayer_peer)
+    await owner.join(document_id, owner_socket)
+    await bystander.join(document_id, bystander_socket)
+
+    # The relayer's peer got the update from the relayer itself when it arrived
+    await relayer.fan_out(document_id, b"edit", exclude=author)
+    envelope = UpdateEnvelope(owner.node_id, 1, 1, 1, b"edit", relayed_by=relayer.node_id)
+    await owner.publish(document_id, [envelope])
+    await _settle()
+
+    assert author.received == []
+    assert relayer_peer.received == [b"edit"]
+    assert bystander_socket.received == [b"edit"]
+    assert owner_socket.received == []
+    assert remote_applied == [1]
@@ -0,0 +1,87 @@
+import pytest
+from pycrdt import Awareness, Doc, YSyncMessageType
+
+from collaboration.infrastructure.sync_protocol import (
+    EMPTY_UPDATE,
+    AwarenessEntry,
+    awareness_message,
+    decode_message,
+    encode_awareness_update,
+    sync_step1,
+    sync_step2,
+    update_message,
+)
+from collaboration.infrastructure.yjs_adapter import (
+    apply_update,
+    create_doc,
+    encode_state_as_update,
+    get_text,
+)
+
+
+def test_step1_carries_state_vector():
+    doc = create_doc()
+    with doc.transaction():
+        doc["content"] += "Hello"
+
+    message = decode_message(sync_step1(doc))
+
+    assert message.kind == YSyncMessageType.SYNC_STEP1
+    assert message.payload == doc.get_state()
+
+
+def test_step2_sends_only_what_the_client_is_missing():
+    server = create_doc()
+    with server.transaction():
+        server["content"] += "x" * 10_000
+    client = create_doc()
+    apply_update(client, encode_state_as_update(server))
+    with server.transaction():
+        server["content"] += "!"
+
+    reply = decode_message(sync_step2(server, client.get_state()))
+
+    assert reply.kind == YSyncMessageType.SYNC_STEP2
+    assert len(reply.payload) < 100
+    apply_update(client, reply.payload)
+    assert get_text(client) == get_text(server)
+
+
+def test_step2_for_up_to_date_client_is_empty():
+    doc = create_doc()
+    with doc.transaction():
+        doc["content"] += "same"
+
+    assert decode_message(sync_step2(doc, doc.get_state())).payload == EMPTY_UPDATE
+
+
+def test_update_message_round_trip():
+    message = decode_message(update_message(b"update"))
+    assert message.kind == YSyncMessageType.SYNC_UPDATE
+    assert message.payload == b"update"
+
+
+def test_awareness_message_round_trip():
+    entries = [AwarenessEntry(1, 3, '{"user":{"name":"Alice"}}'), AwarenessEntry(300, 9, "null")]
+
+    assert decode_message(awareness_message(encode_awareness_update(entries))) == entries
+
+
+def test_awareness_message_matches_pycrdt_encoding():
+    awareness = Awareness(Doc())
+    awareness.set_local_state({"cursor": 4})
+    update = awareness.encode_awareness_update([awareness.client_id])
+
+    assert decode_message(awareness_message(update)) == [
+        AwarenessEntry(awareness.client_id, 1, '{"cursor":4}')
+    ]
+
+
+def test_unknown_messages_are_skipped():
+    assert decode_message(b"\x03\x00") is None
+
+
+@pytest.mark.parametrize("data", [b"", b"\x00", b"\x00\x07\x01", b"\x00\x00\x05ab"])
+def test_malformed_messages_raise(data):
+    with pytest.raises(ValueError):
+        decode_message(data)
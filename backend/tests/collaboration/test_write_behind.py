@@ -0,0 +1,117 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from collaboration.application.write_behind import WriteBehindBuffer
+
+
+class RecordingFlush:
+    def __init__(self, fail_times: int = 0):
+        self.batches = []
+        self.fail_times = fail_times
+
+    async def __call__(self, document_id, batch):
+        if self.fail_times:
+            self.fail_times -= 1
+            raise RuntimeError("db down")
+        self.batches.append((document_id, [p.update_data for p in batch]))
+
+
+async def test_flushes_after_window():
+    flush = RecordingFlush()
+    buffer = WriteBehindBuffer(flush, window=0.01, max_batch=100)
+    document_id, user_id = uuid4(), uuid4()
+
+    for i in range(3):
+        await buffer.enqueue(document_id, user_id, bytes([i]))
+    assert flush.batches == []
+    assert buffer.queue_depth == 3
+
+    await asyncio.sleep(0.05)
+    assert flush.batches == [(document_id, [b"\x00", b"\x01", b"\x02"])]
+    assert buffer.queue_depth == 0
+    assert buffer.stats.flushes == 1
+    assert buffer.stats.max_wait_seconds >= 0.01
+
+
+async def test_flushes_when_batch_is_full():
+    flush = RecordingFlush()
+    buffer = WriteBehindBuffer(flush, window=60, max_batch=2)
+    document_id, user_id = uuid4(), uuid4()
+
+    await buffer.enqueue(document_id, user_id, b"a")
+    await buffer.enqueue(document_id, user_id, b"b")
+
+    assert flush.batches == [(document_id, [b"a", b"b"])]
+    assert buffer.depth(document_id) == 0
+
+
+async def test_flush_all_drains_every_document():
+    flush = RecordingFlush()
+    buffer = WriteBehindBuffer(flush, window=60, max_batch=100)
+    first, second, user_id = uuid4(), uuid4(), uuid4()
+
+    await buffer.enqueue(first, user_id, b"a")
+    await buffer.enqueue(second, user_id, b"b")
+    await buffer.flush_all()
+
+    assert sorted(flush.batches) == sorted([(first, [b"a"]), (second, [b"b"])])
+    assert buffer.queue_depth == 0
+
+
+async def test_failed_flush_keeps_updates_in_order():
+    flush = RecordingFlush(fail_times=1)
+    buffer = WriteBehindBuffer(flush, window=60, max_batch=100)
+    document_id, user_id = uuid4(), uuid4()
+
+    await buffer.enqueue(document_id, user_id, b"a")
+    with pytest.raises(RuntimeError):
+        await buffer.flush(document_id)
+    await buffer.enqueue(document_id, user_id, b"b")
+    await buffer.flush(document_id)
+
+    assert flush.batches == [(document_id, [b"a", b"b"])]
+    assert buffer.stats.failed_flushes == 1
+
+
+async def test_flush_or_retry_persists_the_batch_after_a_failure():
+    # As on disconnect: the last socket leaves and the database is briefly down
+    flush = RecordingFlush(fail_times=1)
+    buffer = WriteBehindBuffer(flush, window=0.01, max_batch=100)
+    document_id, user_id = uuid4(), uuid4()
+
+    await buffer.enqueue(document_id, user_id, b"a")
+    await buffer.flush_or_retry(document_id)
+    assert buffer.depth(document_id) == 1
+
+    await asyncio.sleep(0.05)
+    assert flush.batches == [(document_id, [b"a"])]
+    assert buffer.queue_depth == 0
+
+
+async def test_flush_all_carries_on_past_a_failing_document():
+    flush = RecordingFlush(fail_times=1)
+    buffer = WriteBehindBuffer(flush, window=60, max_batch=100)
+    first, second, user_id = uuid4(), uuid4(), uuid4()
+
+    await buffer.enqueue(first, user_id, b"a")
+    await buffer.enqueue(second, user_id, b"b")
+    await buffer.flush_all()
+
+    assert flush.batches == [(second, [b"b"])]
+    assert buffer.depth(first) == 1
+
+
+async def test_stop_writes_everything_and_then_takes_nothing():
+    flush = RecordingFlush()
+    buffer = WriteBehindBuffer(flush, window=0.05, max_batch=100)
+    document_id, user_id = uuid4(), uuid4()
+    await buffer.enqueue(document_id, user_id, b"a")
+
+    await buffer.stop()
+    await buffer.enqueue(document_id, user_id, b"late")
+    await asyncio.sleep(0.1)  # past the window the cancelled timer would have fired at
+
+    assert flush.batches == [(document_id, [b"a"])]
+    assert buffer.queue_depth == 0
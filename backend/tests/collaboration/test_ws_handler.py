@@ -0,0 +1,53 @@
+import time
+from uuid import uuid4
+
+import jwt
+import pytest
+from pycrdt import YMessageType, YSyncMessageType, write_message
+from starlette.testclient import TestClient
+
+from collaboration.infrastructure.local_transport import LocalTransport
+from collaboration.infrastructure.sync_protocol import decode_message, sync_step1
+from collaboration.infrastructure.yjs_adapter import create_doc
+from collaboration.interfaces import ws_handler
+from main import app
+from shared.config import settings
+
+
+@pytest.fixture
+def endpoint(monkeypatch):
+    """The WebSocket endpoint on an in-process transport, serving empty documents."""
+    monkeypatch.setattr(ws_handler._hub, "_transport", LocalTransport())
+
+    async def load(document_id):
+        return create_doc(), 0
+
+    monkeypatch.setattr(ws_handler, "_load_document", load)
+    return TestClient(app)
+
+
+def _step1(state_vector: bytes) -> bytes:
+    return bytes((YMessageType.SYNC, YSyncMessageType.SYNC_STEP1)) + write_message(state_vector)
+
+
+def _disconnect(socket, document_id) -> None:
+    """Close and wait for the handler to clean up; the test client cancels it on exit."""
+    socket.close()
+    deadline = time.monotonic() + 5
+    while ws_handler._hub.subscriber_count(document_id) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)  # the socket's writer and final flush go after leaving the hub
+
+
+def test_malformed_state_vector_is_dropped(endpoint):
+    document_id = uuid4()
+    token = jwt.encode({"sub": str(uuid4())}, settings.JWT_SECRET, algorithm=settings.JWT_ALGORITHM)
+    with endpoint.websocket_connect(f"/ws/doc/{document_id}?token={token}") as socket:
+        assert decode_message(socket.receive_bytes()).kind == YSyncMessageType.SYNC_STEP1
+
+        socket.send_bytes(_step1(b"\xff\xff\xff"))
+        socket.send_bytes(sync_step1(create_doc()))
+
+        # Still connected, and answering
+        assert decode_message(socket.receive_bytes()).kind == YSyncMessageType.SYNC_STEP2
+        _disconnect(socket, document_id)
@@ -3,6 +3,7 @@ from collaboration.infrastructure.yjs_adapter import (
     create_doc,
     encode_state_as_update,
     encode_state_vector,
+    encode_state_vector_from_update,
     get_text,
     merge_updates,
 )
@@ -82,3 +83,16 @@ def test_concurrent_edits_merge():
     assert text_a == text_b
     assert "A" in text_a
     assert "B" in text_a
+
+
+def test_state_vector_from_update_matches_doc():
+    doc = create_doc()
+    with doc.transaction():
+        doc["content"] += "test"
+    assert encode_state_vector_from_update(encode_state_as_update(doc)) == encode_state_vector(doc)
+
+
+def test_merge_no_updates_is_empty_doc():
+    doc = create_doc()
+    apply_update(doc, merge_updates([]))
+    assert get_text(doc) == ""
@@ -0,0 +1,29 @@
+import asyncio
+import time
+
+from shared.infrastructure.loop_monitor import LAG_BUCKETS, LoopLagHistogram, LoopMonitor
+
+
+def test_histogram_buckets_by_upper_bound():
+    histogram = LoopLagHistogram()
+    for lag in (0.0005, 0.001, 0.003, 2.0):
+        histogram.observe(lag)
+
+    assert histogram.counts[0] == 2
+    assert histogram.counts[LAG_BUCKETS.index(0.005)] == 1
+    assert histogram.counts[-1] == 1
+    assert histogram.max_seconds == 2.0
+
+
+async def test_monitor_records_a_blocking_call(caplog):
+    monitor = LoopMonitor(interval=0.005, warn_after=0.05)
+    monitor.start()
+    await asyncio.sleep(0.02)
+
+    time.sleep(0.08)  # blocks the loop
+    await asyncio.sleep(0.02)
+    await monitor.stop()
+
+    assert monitor.histogram.max_seconds >= 0.07
+    assert monitor.histogram.samples >= 3
+    assert "Event loop was blocked" in caplog.text
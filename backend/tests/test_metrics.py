@@ -0,0 +1,39 @@
+import pytest
+from prometheus_client import REGISTRY
+
+from shared.infrastructure.loop_monitor import LoopMonitor
+from shared.infrastructure.metrics import instrument_engine, instrument_loop
+
+
+def _sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint_serves_prometheus_text(client):
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    for name in ("cms_ws_connections", "cms_persist_seconds_bucket", "cms_publish_seconds"):
+        assert name in response.text
+
+
+async def test_engine_pool_is_reported(test_engine):
+    instrument_engine(test_engine)
+    checkouts = _sample("cms_db_pool_checkouts_total")
+
+    async with test_engine.connect():
+        assert _sample("cms_db_pool_checked_out") == 1
+    assert _sample("cms_db_pool_checkouts_total") == checkouts + 1
+    assert _sample("cms_db_pool_checked_out") == 0
+
+
+def test_loop_lag_feeds_the_histogram():
+    monitor = LoopMonitor(interval=0.01, warn_after=1)
+    instrument_loop(monitor)
+    before = _sample("cms_event_loop_lag_seconds_count")
+
+    monitor.on_lag(0.02)
+
+    assert _sample("cms_event_loop_lag_seconds_count") == before + 1
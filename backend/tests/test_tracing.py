@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+from prometheus_client import REGISTRY
+
+from collaboration.interfaces.connection import ClientConnection
+from shared.infrastructure import tracing
+from shared.infrastructure.tracing import NoopTracer, TraceContext, UpdateTracing, create_tracer
+
+
+class RecordingTracer:
+    def __init__(self):
+        self.spans = []
+
+    def record(self, context, name, start_ns, end_ns, attributes):
+        self.spans.append((name, start_ns, end_ns, attributes))
+
+
+def _propagations(path: str) -> float:
+    return REGISTRY.get_sample_value("cms_update_propagation_seconds_count", {"path": path}) or 0.0
+
+
+def test_nothing_is_sampled_when_tracing_is_off():
+    assert UpdateTracing(NoopTracer(), sample_rate=0).sample() is None
+
+
+def test_sampled_context_is_fresh_per_update():
+    traces = UpdateTracing(NoopTracer(), sample_rate=1)
+    first, second = traces.sample(), traces.sample()
+
+    assert len(first.trace_id) == 16 and len(first.span_id) == 8
+    assert first.trace_id != second.trace_id
+    assert not first.remote
+
+
+def test_stage_ends_now_unless_given():
+    tracer = RecordingTracer()
+    traces = UpdateTracing(tracer, sample_rate=1)
+    trace = traces.sample()
+
+    traces.stage(trace, "update.persist", trace.origin_ns, batch=3)
+    traces.stage(trace, "update.publish", 10, 20)
+
+    (name, start, end, attributes), publish = tracer.spans
+    assert (name, start, attributes) == ("update.persist", trace.origin_ns, {"batch": 3})
+    assert end >= start
+    assert publish == ("update.publish", 10, 20, {})
+
+
+async def test_socket_write_ends_the_trace(monkeypatch):
+    tracer = RecordingTracer()
+    monkeypatch.setattr(tracing.update_tracing, "tracer", tracer)
+    sent = []
+
+    async def send(data):
+        sent.append(data)
+
+    client = ClientConnection(send, max_queue=10, resync=lambda sv: None)
+    client.start()
+    before = _propagations("remote")
+
+    await client.send_update(b"u", TraceContext(b"t" * 16, b"s" * 8, origin_ns=0, remote=True))
+    await client.send_update(b"untraced")
+    await asyncio.sleep(0.01)
+    await client.close()
+
+    assert len(sent) == 2
+    assert [(name, attributes) for name, *_, attributes in tracer.spans] == [
+        ("update.send", {"path": "remote"})
+    ]
+    assert _propagations("remote") == before + 1
+
+
+def test_unknown_exporter_is_rejected():
+    with pytest.raises(ValueError):
+        create_tracer("zipkin")